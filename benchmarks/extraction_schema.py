@@ -0,0 +1,152 @@
+"""
+Benchmark dos esquemas de extração: completo (FORMAT_PROMPT) x delta
+
+Reproduz as conversas de benchmarks/conversas.json e compara, para cada
+esquema, os tokens de saída e a latência de ponta a ponta.
+
+Modos:
+    offline (padrão): monta a saída de referência de cada turno nos dois
+        esquemas e estima os tokens localmente (tokens.estimate_tokens); a
+        latência é estimada pela vazão informada em --tokens-per-second
+    --live: envia as conversas ao Groq (requer GROQ_API_KEY) e mede os
+        tokens informados pelo provider e o tempo real de cada turno
+
+Uso:
+    python benchmarks/extraction_schema.py
+    python benchmarks/extraction_schema.py --live
+"""
+import argparse
+import json
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src" / "app"))
+
+import config
+from extraction_schema import FULL_FIELDS, SCHEMA_DELTA, SCHEMA_FULL, compact_extracted
+from tokens import estimate_tokens
+
+CONVERSATIONS_FILE = Path(__file__).parent / "conversas.json"
+
+
+def load_conversations(path: Path = CONVERSATIONS_FILE) -> list[dict]:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def reference_output(turn: dict, schema: str) -> str:
+    """Saída que o modelo deveria gerar para o turno no esquema informado"""
+    if schema == SCHEMA_DELTA:
+        return json.dumps(
+            {"resposta": turn["answer"], "d": compact_extracted(turn["dados"])},
+            ensure_ascii=False,
+        )
+
+    dados = {field: None for field in FULL_FIELDS}
+    dados.update(turn["dados"])
+    return json.dumps(
+        {"resposta": turn["answer"], "user_message": turn["user"], "dados_extraidos": dados},
+        ensure_ascii=False,
+        indent=2,
+    )
+
+
+def run_offline(conversations: list[dict], tokens_per_second: float) -> dict:
+    results = {}
+    for schema in (SCHEMA_FULL, SCHEMA_DELTA):
+        output_tokens = [
+            estimate_tokens(reference_output(turn, schema))
+            for conversation in conversations
+            for turn in conversation["turns"]
+        ]
+        results[schema] = {
+            "turns": len(output_tokens),
+            "output_tokens": output_tokens,
+            "latency_s": [tokens / tokens_per_second for tokens in output_tokens],
+        }
+    return results
+
+
+def run_live(conversations: list[dict]) -> dict:
+    from agent import FinancialAgent
+    from data import DataManager
+    from llm import LLMManager
+    from metrics import default_registry
+
+    # Sem caches: cada turno precisa ir de fato ao provider
+    config.LLM_CACHE_ENABLED = False
+    config.SEMANTIC_CACHE_ENABLED = False
+    config.LLM_SINGLEFLIGHT_ENABLED = False
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        config.INTERACOES_PATH = Path(tmp)
+        for schema in (SCHEMA_FULL, SCHEMA_DELTA):
+            output_tokens, latencies = [], []
+            for conversation in conversations:
+                agent = FinancialAgent(
+                    data_manager=DataManager(user_file=Path(tmp) / f"{schema}_{conversation['id']}.json"),
+                    llm_manager=LLMManager(),
+                    extraction_mode="inline",
+                    extraction_schema=schema,
+                )
+                history = []
+                for turn in conversation["turns"]:
+                    start = time.perf_counter()
+                    answer = agent.process_message(turn["user"], history)
+                    latencies.append(time.perf_counter() - start)
+
+                    record = default_registry.recent_calls(1)[-1]
+                    output_tokens.append(record["tokens_response"] or 0)
+                    history += [
+                        {"role": "user", "content": turn["user"]},
+                        {"role": "assistant", "content": answer},
+                    ]
+            results[schema] = {
+                "turns": len(output_tokens),
+                "output_tokens": output_tokens,
+                "latency_s": latencies,
+            }
+    return results
+
+
+def report(results: dict) -> str:
+    lines = [f"{'esquema':<8} {'turnos':>6} {'tokens saída':>13} {'média/turno':>12} {'latência p50':>13} {'latência total':>15}"]
+    for schema, data in results.items():
+        tokens = data["output_tokens"]
+        latency = data["latency_s"]
+        lines.append(
+            f"{schema:<8} {data['turns']:>6} {sum(tokens):>13} {statistics.mean(tokens):>12.1f}"
+            f" {statistics.median(latency):>12.2f}s {sum(latency):>14.2f}s"
+        )
+
+    full, delta = results[SCHEMA_FULL], results[SCHEMA_DELTA]
+    saved = 1 - sum(delta["output_tokens"]) / sum(full["output_tokens"])
+    faster = 1 - sum(delta["latency_s"]) / sum(full["latency_s"])
+    lines.append(f"\ndelta: {saved:.0%} menos tokens de saída, {faster:.0%} menos latência total")
+    return "\n".join(lines)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--live", action="store_true", help="Chama o Groq em vez de estimar")
+    parser.add_argument(
+        "--tokens-per-second", type=float, default=250.0,
+        help="Vazão de geração usada para estimar a latência no modo offline",
+    )
+    parser.add_argument("--conversations", type=Path, default=CONVERSATIONS_FILE)
+    args = parser.parse_args()
+
+    conversations = load_conversations(args.conversations)
+    if args.live:
+        results = run_live(conversations)
+    else:
+        results = run_offline(conversations, args.tokens_per_second)
+    print(report(results))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Benchmark dos armazenamentos do DataManager: JSON x SQLite (WAL)
+
+Mede, para cada armazenamento, num diretório temporário:
+    latência por turno: o que o agente grava a cada turno (update_user +
+        save_user + save_interaction), em uma thread
+    vazão com gravadores concorrentes: --writers threads, cada uma com o
+        seu perfil, fazendo --turns turnos; inclui o fechamento (lotes
+        pendentes e fsync finais)
+
+Uso:
+    python benchmarks/storage.py
+    python benchmarks/storage.py --turns 500 --writers 8
+"""
+import argparse
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src" / "app"))
+
+from data import DataManager
+from interaction_log import InteractionLog
+from storage import STORAGE_JSON, STORAGE_SQLITE, JsonStorage, SqliteStorage, Storage
+
+BACKENDS = (STORAGE_JSON, STORAGE_SQLITE)
+
+
+class _SharedJsonStorage(JsonStorage):
+    """JsonStorage com um arquivo de perfil por usuário e um log comum"""
+
+    def __init__(self, path: Path, interactions: InteractionLog):
+        self.path = path
+        self.interactions = interactions
+
+    def _for(self, user_id: str) -> JsonStorage:
+        return JsonStorage(self.path / f"{user_id}.json", self.interactions)
+
+    def key(self, user_id: str) -> tuple:
+        return self._for(user_id).key(user_id)
+
+    def load_user(self, user_id: str):
+        return self._for(user_id).load_user(user_id)
+
+    def save_user(self, user_id: str, user: dict) -> None:
+        self._for(user_id).save_user(user_id, user)
+
+    def close(self) -> None:
+        self.interactions.close()
+
+
+def make_storage(backend: str, path: Path) -> Storage:
+    if backend == STORAGE_SQLITE:
+        return SqliteStorage(path / "agente.db")
+    return _SharedJsonStorage(path, InteractionLog(path / "interacoes"))
+
+
+def run_turns(manager: DataManager, turns: int, latencies: list = None) -> None:
+    user = manager.load_user()
+    for turn in range(turns):
+        start = time.perf_counter()
+        extracted = {"renda_mensal": 1000.0 + turn, "idade": 30 + turn % 40}
+        manager.update_user(user, extracted)
+        manager.save_user(user)
+        manager.save_interaction(f"mensagem {turn}", f"resposta {turn}", extracted)
+        if latencies is not None:
+            latencies.append(time.perf_counter() - start)
+
+
+def bench_latency(backend: str, turns: int) -> list[float]:
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = make_storage(backend, Path(tmp))
+        manager = DataManager(user_file=Path(tmp) / "latencia.json", storage=storage)
+        latencies = []
+        run_turns(manager, turns, latencies)
+        storage.close()
+        return latencies
+
+
+def bench_throughput(backend: str, turns: int, writers: int) -> float:
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = make_storage(backend, Path(tmp))
+        managers = [
+            DataManager(user_file=Path(tmp) / f"usuario{i}.json", storage=storage)
+            for i in range(writers)
+        ]
+        threads = [threading.Thread(target=run_turns, args=(m, turns)) for m in managers]
+
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        storage.close()
+        return turns * writers / (time.perf_counter() - start)
+
+
+def report(results: dict) -> str:
+    lines = [
+        f"{'backend':<8} {'p50 turno':>12} {'p95 turno':>12} {'máx turno':>12} {'turnos/s':>12}",
+    ]
+    for backend, data in results.items():
+        latency = sorted(data["latency_s"])
+        p95 = latency[int(len(latency) * 0.95) - 1]
+        lines.append(
+            f"{backend:<8} {statistics.median(latency) * 1000:>10.3f}ms {p95 * 1000:>10.3f}ms"
+            f" {latency[-1] * 1000:>10.3f}ms {data['turns_per_s']:>12.0f}"
+        )
+    return "\n".join(lines)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=200, help="Turnos por gravador")
+    parser.add_argument("--writers", type=int, default=4, help="Gravadores concorrentes")
+    parser.add_argument("--backend", choices=BACKENDS, action="append", help="Padrão: todos")
+    args = parser.parse_args()
+
+    results = {}
+    for backend in args.backend or BACKENDS:
+        results[backend] = {
+            "latency_s": bench_latency(backend, args.turns),
+            "turns_per_s": bench_throughput(backend, args.turns, args.writers),
+        }
+    print(f"{args.turns} turnos, {args.writers} gravadores concorrentes\n")
+    print(report(results))
+
+
+if __name__ == "__main__":
+    main()
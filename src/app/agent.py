@@ -1,25 +1,46 @@
 """
 Lógica principal do agente financeiro
 """
-from typing import Any, Optional
+import asyncio
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, AsyncIterator, Iterator, Optional
 
 from data import DataManager
 from validation import DataValidator
 from llm import LLMManager
+from extraction_schema import DELTA_KEYS_DOC, SCHEMA_DELTA, normalize_answer
+from metrics import (
+    EXTRACTION_JOBS,
+    EXTRACTION_LAG,
+    HISTORY_SUMMARIES,
+    HISTORY_SUMMARY_STALENESS,
+    TURN_DEADLINE_FALLBACKS,
+    TURN_DURATION,
+)
+from resilience import Deadline
+from prompt_prefix import PrefixTracker
+from routing import ROUTE_EXTRACTION, ROUTE_SIMULATION, ROUTE_SUMMARY, classify_message
+from tools import ToolSet
+from calculations import CALCULATION_TOOLS
+from semantic_cache import SemanticCache
+from summaries import RollingSummary
+from compaction import CompactionWorker, compaction_worker
+from tokens import (
+    MESSAGE_OVERHEAD,
+    estimate_message_tokens,
+    estimate_tokens,
+    max_input_tokens,
+    truncate_to_tokens,
+)
 from exceptions import AgentException
+import config
 
 
 HISTORY_ALLOWED_KEYS = {"role", "content"}
 
-FORMAT_PROMPT = """
-Você DEVE responder SEMPRE em JSON válido.
-Nunca escreva texto fora do JSON.
-
-Formato obrigatório:
-{
-  "resposta": string,
-  "user_message": string,
-  "dados_extraidos": {
+EXTRACTED_DATA_SCHEMA = """{
     "nome": string | null,
     "renda_mensal": number | null,
     "perfil_investidor": string | null,
@@ -36,12 +57,79 @@ Formato obrigatório:
         "prazo": string | null
       }
     ] | null
-  }
+  }"""
+
+FORMAT_PROMPT = f"""
+Você DEVE responder SEMPRE em JSON válido.
+Nunca escreva texto fora do JSON.
+
+Formato obrigatório:
+{{
+  "resposta": string,
+  "user_message": string,
+  "dados_extraidos": {EXTRACTED_DATA_SCHEMA}
+}}
+Importante: jamais responda em formato diferente do JSON acima.
+NUNCA ADICIONE TEXTO FORA DO JSON.
+"""
+
+# Formato da chamada de resposta quando a extração roda em segundo plano
+ANSWER_FORMAT_PROMPT = """
+Você DEVE responder SEMPRE em JSON válido.
+Nunca escreva texto fora do JSON.
+
+Formato obrigatório:
+{
+  "resposta": string
 }
 Importante: jamais responda em formato diferente do JSON acima.
 NUNCA ADICIONE TEXTO FORA DO JSON.
 """
 
+EXTRACTION_PROMPT = f"""
+Você extrai os dados financeiros que o usuário informou sobre si mesmo.
+Analise somente a mensagem do usuário; a mensagem anterior da assistente,
+se houver, serve apenas de contexto para respostas curtas como "32" ou "sim".
+
+Responda SOMENTE em JSON válido, no formato:
+{{
+  "dados_extraidos": {EXTRACTED_DATA_SCHEMA}
+}}
+Use null para tudo que não foi informado nesta mensagem. Não invente valores.
+Retorne null para dados irreais: idade fora de 0 a 100 anos, valores
+negativos, renda ou valor de meta que não sejam positivos.
+"""
+# Esquema delta: só os dados novos do turno, com chaves curtas (extraction_schema.py)
+DELTA_FORMAT_PROMPT = f"""
+Você DEVE responder SEMPRE em JSON válido.
+Nunca escreva texto fora do JSON.
+
+Formato obrigatório:
+{{
+  "resposta": string,
+  "d": {{}}
+}}
+Em "d" coloque SOMENTE os dados do usuário informados ou alterados nesta
+mensagem, com as chaves curtas abaixo. Omita os demais campos (nunca
+escreva null). Sem dados novos, use "d": {{}}.
+{DELTA_KEYS_DOC}
+Importante: jamais responda em formato diferente do JSON acima.
+NUNCA ADICIONE TEXTO FORA DO JSON.
+"""
+
+DELTA_EXTRACTION_PROMPT = f"""
+Você extrai os dados financeiros que o usuário informou sobre si mesmo.
+Analise somente a mensagem do usuário; a mensagem anterior da assistente,
+se houver, serve apenas de contexto para respostas curtas como "32" ou "sim".
+
+Responda SOMENTE em JSON válido, no formato {{"d": {{}}}}, colocando em "d"
+apenas os dados informados nesta mensagem, com as chaves curtas abaixo.
+Omita os demais campos (nunca escreva null).
+{DELTA_KEYS_DOC}
+Não invente valores. Omita dados irreais: idade fora de 0 a 100 anos,
+valores negativos, renda ou valor de meta que não sejam positivos.
+"""
+
 SYSTEM_PROMPT = """
 Você é BIA, uma assistente financeira educacional amigável e profissional.
 
@@ -95,10 +183,15 @@ INSTRUÇÕES:
 
 SIMULAÇÕES FINANCEIRAS:
 Você pode fazer cálculos financeiros quando solicitado. Exemplos:
-- Parcelamento com/sem juros (use fórmula Price se houver juros)
+- Parcelamento com/sem juros (tabela Price ou SAC)
 - Comparação à vista vs parcelado
 - Projeção de reserva de emergência
-- Juros compostos
+- Juros compostos e quanto guardar por mês para uma meta
+
+Quando as ferramentas de cálculo estiverem disponíveis, use-as para obter os
+números: escolha a ferramenta, informe os parâmetros e use exatamente os
+valores retornados, sem refazer as contas. Se faltar um parâmetro essencial,
+pergunte ao usuário.
 
 Ao fazer cálculos, mostre:
 1. O resultado principal em destaque
@@ -118,8 +211,43 @@ Retorne null para dados claramente irreais ou inválidos:
 Se o usuário informar dados fora desses limites, não extraia o valor (use null).
 """
 
+# Seções do SYSTEM_PROMPT que podem sair quando o prompt estoura o orçamento
+OPTIONAL_SYSTEM_SECTIONS = (
+    "ESTRATÉGIA DE COLETA",
+    "SUGESTÕES PROATIVAS",
+    "Exemplos de sugestões",
+)
+
+COMPACT_SYSTEM_PROMPT = "\n\n".join(
+    section
+    for section in SYSTEM_PROMPT.split("\n\n")
+    if not section.strip().startswith(OPTIONAL_SYSTEM_SECTIONS)
+)
+
 INSTRUCTIONS = 'INFORMAÇÕES DISPONÍVEIS DO USUÁRIO:\n{context}'
 
+# Ordem fixa dos fatos no prompt (pelo rótulo antes de ":")
+FACT_ORDER = (
+    "Nome",
+    "Idade",
+    "Profissão",
+    "Renda mensal",
+    "Patrimônio total",
+    "Reserva de emergência",
+    "Perfil de investidor",
+    "Objetivo principal",
+    "Meta",
+)
+
+PROMPT_LAYOUT_STABLE = "stable"
+PROMPT_LAYOUT_LEGACY = "legacy"
+
+EXTRACTION_INLINE = "inline"
+EXTRACTION_BACKGROUND = "background"
+
+COMPACTION_INLINE = "inline"
+COMPACTION_BACKGROUND = "background"
+
 EXAMPLES = """
 Consigo parcelar uma compra de R$ 3.000?
 Vale mais pagar à vista ou parcelar?
@@ -127,6 +255,11 @@ Como funcionam os juros do cartão de crédito?
 Quais investimentos existem para quem ganha um salário mínimo?
 """
 
+DEGRADED_NOTICE = (
+    "⚠️ Estou com instabilidade para gerar respostas agora. "
+    "Tente novamente em alguns instantes."
+)
+
 SQUASH_INSTRUCTIONS ="""
 Você é um assistente que resume conversas.
 Resuma a conversa abaixo de forma concisa, mantendo os pontos principais
@@ -138,6 +271,55 @@ Responda em formato JSON:
 }
 """
 
+_FORMAT_PROMPT_TOKENS = estimate_tokens(FORMAT_PROMPT) + MESSAGE_OVERHEAD
+_ANSWER_FORMAT_PROMPT_TOKENS = estimate_tokens(ANSWER_FORMAT_PROMPT) + MESSAGE_OVERHEAD
+_DELTA_FORMAT_PROMPT_TOKENS = estimate_tokens(DELTA_FORMAT_PROMPT) + MESSAGE_OVERHEAD
+_EXTRACTION_PROMPT_TOKENS = estimate_tokens(EXTRACTION_PROMPT) + MESSAGE_OVERHEAD
+_DELTA_EXTRACTION_PROMPT_TOKENS = estimate_tokens(DELTA_EXTRACTION_PROMPT) + MESSAGE_OVERHEAD
+_SYSTEM_PROMPT_TOKENS = estimate_tokens(SYSTEM_PROMPT) + MESSAGE_OVERHEAD
+_COMPACT_SYSTEM_PROMPT_TOKENS = estimate_tokens(COMPACT_SYSTEM_PROMPT) + MESSAGE_OVERHEAD
+
+
+class FactsBlock:
+    """Fatos do perfil em ordem fixa e a mensagem de contexto já montada"""
+
+    __slots__ = ("source", "version", "facts", "message", "tokens")
+
+    def __init__(self, facts, source: Optional[dict] = None, version: Optional[int] = None):
+        """
+        Args:
+            facts: Fatos confirmados do usuário (em qualquer ordem)
+            source: Perfil de onde os fatos saíram
+            version: "versao" do perfil quando os fatos foram renderizados
+        """
+        self.source = source
+        self.version = version
+        self.facts = order_facts(facts)
+        context = "\n".join(f"- {f}" for f in self.facts)
+        self.message = {
+            "role": "system",
+            "content": INSTRUCTIONS.format(context=context)
+        } if context else None
+        self.tokens = estimate_message_tokens(self.message) if self.message else 0
+
+    def matches(self, usuario: dict) -> bool:
+        """Se o bloco ainda vale para o perfil (mesmo dicionário, mesma versão)"""
+        return (
+            self.source is usuario
+            and self.version is not None
+            and usuario.get("versao") == self.version
+        )
+
+
+def order_facts(facts) -> list[str]:
+    """Ordena os fatos de forma determinística (independe da ordem do set)"""
+    def key(fact: str):
+        label = fact.split(":", 1)[0]
+        rank = FACT_ORDER.index(label) if label in FACT_ORDER else len(FACT_ORDER)
+        return rank, fact
+
+    return sorted((f for f in facts if f), key=key)
+
 
 class FinancialAgent:
     """Agente Financeiro Inteligente"""
@@ -146,7 +328,15 @@ class FinancialAgent:
         self,
         data_manager: Optional[DataManager] = None,
         validator: Optional[DataValidator] = None,
-        llm_manager: Optional[LLMManager] = None
+        llm_manager: Optional[LLMManager] = None,
+        semantic_cache: Optional[SemanticCache] = None,
+        extraction_mode: str = config.EXTRACTION_MODE,
+        extraction_schema: str = config.EXTRACTION_SCHEMA,
+        tools: Optional[ToolSet] = None,
+        summaries: Optional[RollingSummary] = None,
+        compaction_mode: str = config.COMPACTION_MODE,
+        compaction: Optional[CompactionWorker] = None,
+        session_id: Optional[str] = None
     ):
         """
         Inicializa o agente financeiro.
@@ -155,10 +345,45 @@ class FinancialAgent:
             data_manager: Gerenciador de dados
             validator: Validador de dados
             llm_manager: Gerenciador de LLM
+            semantic_cache: Cache de perguntas parecidas
+                (padrão: definido por config.SEMANTIC_CACHE_*)
+            extraction_mode: "inline" (dados na mesma chamada da resposta)
+                ou "background" (extração separada, depois da resposta)
+            extraction_schema: "full" (todos os campos) ou "delta" (só os
+                campos alterados, com chaves curtas)
+            tools: Ferramentas oferecidas ao LLM nas simulações (padrão:
+                calculations.CALCULATION_TOOLS se config.CALC_TOOLS_ENABLED)
+            summaries: Resumos já feitos do histórico (padrão: definido por
+                config.SUMMARY_CACHE_*)
+            compaction_mode: "inline" (resume o histórico antes da resposta)
+                ou "background" (responde com o último resumo pronto e
+                resume em segundo plano)
+            compaction: Fila das compactações em segundo plano (padrão: a
+                compartilhada pelo processo)
+            session_id: Identifica a conversa na fila de compactação
         """
         self.data_manager = data_manager or DataManager()
         self.validator = validator or DataValidator()
         self.llm_manager = llm_manager or LLMManager()
+        if semantic_cache is None and config.SEMANTIC_CACHE_ENABLED:
+            semantic_cache = SemanticCache()
+        self.semantic_cache = semantic_cache
+        self.prefix_tracker = PrefixTracker()
+        self.last_prompt_report: dict = {}
+        self.extraction_mode = extraction_mode
+        self.extraction_schema = extraction_schema
+        if tools is None and config.CALC_TOOLS_ENABLED:
+            tools = CALCULATION_TOOLS
+        self.tools = tools
+        self.summaries = summaries or RollingSummary(seed=SQUASH_INSTRUCTIONS)
+        self.compaction_mode = compaction_mode
+        self.compaction = compaction or compaction_worker()
+        self.session_id = session_id or uuid.uuid4().hex
+        # Fatos renderizados da última versão do perfil vista
+        self._facts_block: Optional[FactsBlock] = None
+        # Um único worker: as extrações atualizam self.user em ordem
+        self._extraction_executor: Optional[ThreadPoolExecutor] = None
+        self._pending_extractions: set[Future] = set()
 
         self.user = self.data_manager.load_user()
 
@@ -173,37 +398,123 @@ class FinancialAgent:
         self,
         user_message: str,
         history: list[dict],
-        facts: set[str]
+        facts,
+        max_tokens: Optional[int] = None
     ) -> list[dict]:
-        """Constrói prompt estruturado para o LLM"""
-        context = "\n".join(f"- {f}" for f in facts if f)
+        """
+        Constrói prompt estruturado para o LLM dentro do orçamento de tokens.
+
+        Se a estimativa passar do orçamento, corta nesta ordem: mensagens mais
+        antigas do histórico, seções opcionais do SYSTEM_PROMPT e, por fim,
+        o meio da mensagem do usuário. O resultado da estimativa e a medida
+        de estabilidade do prefixo ficam em `self.last_prompt_report`.
+
+        No layout "stable" (config.PROMPT_LAYOUT) as instruções fixas vêm
+        primeiro, idênticas entre turnos, seguidas dos fatos, do histórico e
+        da mensagem do usuário; assim o cache de prefixo do provider
+        reaproveita a parte estática.
+
+        Args:
+            user_message: Mensagem do usuário
+            history: Histórico (já compactado)
+            facts: Fatos confirmados do usuário (os de _extract_facts reaproveitam
+                o bloco de contexto já montado)
+            max_tokens: Orçamento de tokens de entrada (padrão: o do modelo)
+
+        Returns:
+            Lista de mensagens do prompt
+        """
+        if max_tokens is None:
+            max_tokens = max_input_tokens(self._model_name())
+
+        facts_block = self._facts_block_for(facts)
+        context_message = facts_block.message
+
+        history = list(history)
+        history_tokens = [estimate_message_tokens(m) for m in history]
+        system_prompt = SYSTEM_PROMPT
+        if self.background_extraction:
+            format_prompt, format_tokens = ANSWER_FORMAT_PROMPT, _ANSWER_FORMAT_PROMPT_TOKENS
+        elif self.extraction_schema == SCHEMA_DELTA:
+            format_prompt, format_tokens = DELTA_FORMAT_PROMPT, _DELTA_FORMAT_PROMPT_TOKENS
+        else:
+            format_prompt, format_tokens = FORMAT_PROMPT, _FORMAT_PROMPT_TOKENS
+
+        total = (
+            format_tokens
+            + _SYSTEM_PROMPT_TOKENS
+            + facts_block.tokens
+            + sum(history_tokens)
+            + estimate_tokens(user_message) + MESSAGE_OVERHEAD
+        )
+
+        dropped_history = 0
+        while total > max_tokens and history:
+            history.pop(0)
+            total -= history_tokens.pop(0)
+            dropped_history += 1
+
+        if total > max_tokens:
+            system_prompt = COMPACT_SYSTEM_PROMPT
+            total -= _SYSTEM_PROMPT_TOKENS - _COMPACT_SYSTEM_PROMPT_TOKENS
+
+        truncated = False
+        if total > max_tokens:
+            user_tokens = estimate_tokens(user_message)
+            user_message = truncate_to_tokens(user_message, user_tokens - (total - max_tokens))
+            total -= user_tokens - estimate_tokens(user_message)
+            truncated = True
 
         messages = [
-            {"role": "system", "content": FORMAT_PROMPT},
-            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "system", "content": format_prompt},
+            {"role": "system", "content": system_prompt},
             *history,
             {"role": "user", "content": user_message},
         ]
-        if context:
-            messages.insert(1, {
-                "role": "system",
-                "content": INSTRUCTIONS.format(context=context)
-            })
-
+        if context_message:
+            position = 1 if config.PROMPT_LAYOUT == PROMPT_LAYOUT_LEGACY else 2
+            messages.insert(position, context_message)
+
+        self.last_prompt_report = {
+            "estimated_tokens": total,
+            "max_tokens": max_tokens,
+            "dropped_history": dropped_history,
+            "compact_system_prompt": system_prompt is COMPACT_SYSTEM_PROMPT,
+            "truncated_user_message": truncated,
+            **self.prefix_tracker.observe(messages),
+        }
         return messages
 
+    @property
+    def background_extraction(self) -> bool:
+        return self.extraction_mode == EXTRACTION_BACKGROUND
+
+    @property
+    def background_compaction(self) -> bool:
+        return self.compaction_mode == COMPACTION_BACKGROUND
+
+    def _model_name(self) -> str:
+        provider = getattr(self.llm_manager, "provider", None)
+        return getattr(provider, "model", config.GROQ_MODEL_NAME)
+
     def _squash_history(
             self,
             history: list[dict],
             max_messages: int = 5,
-            keep_last: int = 2
+            keep_last: int = 2,
+            deadline: Optional[Deadline] = None
     ) -> list[dict]:
         """
         Compacta o histórico de conversa quando ultrapassa um limite definido.
 
         Estratégia:
         - Mantém as últimas `keep_last` mensagens intactas
-        - Envia mensagens antigas ao LLM para gerar um resumo
+        - Reaproveita o resumo do maior prefixo já resumido (self.summaries)
+        - Só chama o LLM quando `config.SUMMARY_FOLD_BATCH` mensagens
+          envelheceram desde esse resumo, mandando apenas elas e o resumo
+          anterior; até lá, elas seguem no prompt como estão
+        - No modo de compactação em segundo plano, o resumo novo é feito
+          fora do turno e o turno usa o último resumo pronto
         - Preserva o formato compatível com ChatInterface / OpenAI / Groq
 
         Args:
@@ -211,6 +522,10 @@ class FinancialAgent:
                 {"role": "user" | "assistant", "content": str}
             max_messages (int): Quantidade máxima de mensagens antes da compactação
             keep_last (int): Quantidade de mensagens recentes a preservar sem compactar
+            deadline (Deadline): Prazo do turno. O resumo só usa o tempo que
+                sobra além da reserva da resposta; sem esse tempo (ou se o
+                resumo falhar) fica o último resumo já feito ou, sem ele, o
+                histórico é truncado
 
         Returns:
             list[dict]: Histórico compactado, pronto para envio ao LLM
@@ -218,24 +533,178 @@ class FinancialAgent:
         if len(history) <= max_messages:
             return history
 
-        older_messages = history[:-keep_last]
-        recent_messages = history[-keep_last:]
+        older, recent = history[:-keep_last], history[-keep_last:]
+        covered, previous = self.summaries.lookup(older)
+        pending = older[covered:]
+        if previous is not None and len(pending) < config.SUMMARY_FOLD_BATCH:
+            return self._reuse_summary(previous, pending, recent)
+        if self.background_compaction:
+            return self._schedule_compaction(history, older, recent, previous, pending)
+
+        summary_deadline = self._summary_deadline(deadline)
+        if summary_deadline is False:
+            return self._squash_fallback(history, max_messages, previous, pending + recent)
+
+        summary = self.llm_manager.generate_answer(
+            self._summary_prompt(pending, previous), route=ROUTE_SUMMARY, deadline=summary_deadline
+        )
+        summary = self._summary_text(summary)
+        if summary is None:
+            return self._squash_fallback(history, max_messages, previous, pending + recent)
+        return self._store_summary(older, recent, previous, summary)
+
+    async def _asquash_history(
+            self,
+            history: list[dict],
+            max_messages: int = 5,
+            keep_last: int = 2,
+            deadline: Optional[Deadline] = None
+    ) -> list[dict]:
+        """Versão assíncrona de _squash_history"""
+        if len(history) <= max_messages:
+            return history
+
+        older, recent = history[:-keep_last], history[-keep_last:]
+        covered, previous = self.summaries.lookup(older)
+        pending = older[covered:]
+        if previous is not None and len(pending) < config.SUMMARY_FOLD_BATCH:
+            return self._reuse_summary(previous, pending, recent)
+        if self.background_compaction:
+            return self._schedule_compaction(history, older, recent, previous, pending)
+
+        summary_deadline = self._summary_deadline(deadline)
+        if summary_deadline is False:
+            return self._squash_fallback(history, max_messages, previous, pending + recent)
+
+        summary = await self.llm_manager.agenerate_answer(
+            self._summary_prompt(pending, previous), route=ROUTE_SUMMARY, deadline=summary_deadline
+        )
+        summary = self._summary_text(summary)
+        if summary is None:
+            return self._squash_fallback(history, max_messages, previous, pending + recent)
+        return self._store_summary(older, recent, previous, summary)
+
+    def _reuse_summary(self, previous: str, pending: list[dict], recent: list[dict]) -> list[dict]:
+        """Compacta com o resumo já pronto, mantendo as mensagens que ele não cobre"""
+        HISTORY_SUMMARIES.inc(result="reused")
+        HISTORY_SUMMARY_STALENESS.observe(len(pending))
+        return self._compact_history(previous, pending + recent)
+
+    def _schedule_compaction(
+            self,
+            history: list[dict],
+            older: list[dict],
+            recent: list[dict],
+            previous: Optional[str],
+            pending: list[dict]
+    ) -> list[dict]:
+        """
+        Agenda o resumo das mensagens pendentes e compacta o turno atual com
+        o último resumo pronto (ou, sem nenhum, mantém o histórico inteiro).
+        """
+        future = self.compaction.submit(
+            self.session_id, self._fold_in_background, older, pending, previous
+        )
+        if future is not None:
+            self._track_background(future)
+
+        HISTORY_SUMMARIES.inc(result="stale")
+        HISTORY_SUMMARY_STALENESS.observe(len(pending))
+        if previous is None:
+            return history
+        return self._compact_history(previous, pending + recent)
+
+    def _fold_in_background(self, older: list[dict], pending: list[dict], previous: Optional[str]) -> None:
+        """Resume as mensagens pendentes e guarda o resumo para o próximo turno"""
+        answer = self.llm_manager.generate_answer(
+            self._summary_prompt(pending, previous), route=ROUTE_SUMMARY
+        )
+        summary = self._summary_text(answer)
+        if summary is None:
+            raise AgentException("Resumo do histórico indisponível")
+        self.summaries.store(older, summary)
+        HISTORY_SUMMARIES.inc(result="folded" if previous is not None else "full")
+
+    def _summary_deadline(self, deadline: Optional[Deadline]):
+        """
+        Prazo da chamada de resumo dentro do prazo do turno.
+
+        Returns:
+            Deadline do resumo, None sem prazo de turno ou False quando não
+            sobra tempo para resumir sem invadir a reserva da resposta
+        """
+        if deadline is None:
+            return None
+        budget = min(config.TURN_SQUASH_TIMEOUT, deadline.remaining() - config.TURN_ANSWER_RESERVE)
+        if budget < config.TURN_SQUASH_MIN:
+            return False
+        return deadline.cap(budget)
+
+    def _summary_text(self, answer: dict) -> Optional[str]:
+        """Texto do resumo devolvido pelo LLM (None se a chamada falhou)"""
+        summary = answer.get('resposta')
+        if answer.get('degraded') or answer.get('error') or not isinstance(summary, str):
+            return None
+        return summary.strip() or None
+
+    def _store_summary(
+            self,
+            older: list[dict],
+            recent: list[dict],
+            previous: Optional[str],
+            summary: str
+    ) -> list[dict]:
+        """Guarda o novo resumo das mensagens antigas e compacta o histórico com ele"""
+        self.summaries.store(older, summary)
+        HISTORY_SUMMARIES.inc(result="folded" if previous is not None else "full")
+        return self._compact_history(summary, recent)
+
+    def _squash_fallback(
+            self,
+            history: list[dict],
+            max_messages: int,
+            previous: Optional[str],
+            unsummarized: list[dict]
+    ) -> list[dict]:
+        """
+        Compactação sem chamar o LLM: o último resumo já feito com as
+        mensagens que ele não cobre ou, sem resumo, só as mais recentes.
+        """
+        if previous is not None:
+            TURN_DEADLINE_FALLBACKS.inc(stage="squash", action="stale_summary")
+            return self._compact_history(previous, unsummarized)
+        TURN_DEADLINE_FALLBACKS.inc(stage="squash", action="truncate")
+        return history[-max_messages:]
+
+    def _summary_prompt(self, older_messages: list[dict], previous: Optional[str] = None) -> list[dict]:
+        """
+        Monta o prompt que pede ao LLM o resumo das mensagens antigas.
 
+        Com `previous`, pede só a atualização do resumo anterior com as
+        mensagens que ele ainda não cobre.
+        """
         conversation_text = self._format_messages_as_text(older_messages)
+        if previous is None:
+            content = f"Resuma esta conversa:\n\n{conversation_text}"
+        else:
+            content = (
+                f"Resumo da conversa até aqui:\n{previous}\n\n"
+                f"Atualize o resumo com as mensagens seguintes:\n\n{conversation_text}"
+            )
 
-        summary_prompt = [
+        return [
             {
                 "role": "system",
                 "content": SQUASH_INSTRUCTIONS,
             },
             {
                 "role": "user",
-                "content": f"Resuma esta conversa:\n\n{conversation_text}"
+                "content": content
             }
         ]
 
-        summary = self.llm_manager.generate_answer(summary_prompt)
-
+    def _compact_history(self, summary: str, recent_messages: list[dict]) -> list[dict]:
+        """Substitui as mensagens antigas pelo resumo gerado"""
         compacted = [
             {
                 "role": "system",
@@ -250,20 +719,7 @@ class FinancialAgent:
         lines = []
         for message in messages:
             role = message.get("role", "unknown")
-            content = message.get("content")
-
-            if not content:
-                continue
-
-            if isinstance(content, list):
-                text_parts = [
-                    item.get("text", "")
-                    for item in content
-                    if isinstance(item, dict) and item.get("type") == "text"
-                ]
-                text = " ".join(text_parts).strip()
-            else:
-                text = str(content).strip()
+            text = self._message_text(message)
 
             if text:
                 role_label = "Usuário" if role == "user" else "Assistente"
@@ -271,16 +727,51 @@ class FinancialAgent:
 
         return "\n".join(lines)
 
-    def _extract_facts(self, usuario: dict[str, Any]) -> set[str]:
+    def _message_text(self, message: dict) -> str:
+        """Texto de uma mensagem, inclusive no formato multimodal (lista de partes)"""
+        content = message.get("content")
+
+        if not content:
+            return ""
+
+        if isinstance(content, list):
+            text_parts = [
+                item.get("text", "")
+                for item in content
+                if isinstance(item, dict) and item.get("type") == "text"
+            ]
+            return " ".join(text_parts).strip()
+        return str(content).strip()
+
+    def _extract_facts(self, usuario: dict[str, Any]) -> list[str]:
         """
         Extrai fatos confirmados do perfil do usuário para uso no LLM.
 
+        O resultado fica guardado junto com a mensagem de contexto pronta e
+        só é refeito quando a "versao" do perfil muda (DataManager.update_user),
+        então o bloco de fatos sai idêntico, byte a byte, entre turnos.
+
         Args:
             usuario: Dicionário com dados do usuário
 
         Returns:
-            Set de fatos confirmados
+            Fatos confirmados, em ordem fixa (order_facts)
         """
+        block = self._facts_block
+        if block is None or not block.matches(usuario):
+            block = FactsBlock(self._render_facts(usuario), usuario, usuario.get("versao") if usuario else None)
+            self._facts_block = block
+        return block.facts
+
+    def _facts_block_for(self, facts) -> FactsBlock:
+        """Bloco de contexto dos fatos, reaproveitando o de _extract_facts"""
+        block = self._facts_block
+        if block is not None and block.facts is facts:
+            return block
+        return FactsBlock(facts)
+
+    def _render_facts(self, usuario: dict[str, Any]) -> set[str]:
+        """Formata os fatos confirmados do perfil (sem ordem)"""
         if not usuario:
             return set()
 
@@ -344,29 +835,23 @@ class FinancialAgent:
         Raises:
             AgentException: Se houver erro no processamento
         """
+        deadline = Deadline(config.TURN_TIMEOUT)
         try:
-            history = self._sanitize_history(history)
-            history = self._squash_history(history)
             facts = self._extract_facts(self.user)
-            messages_prompt = self._make_prompt(
-                user_message=user_message,
-                history=history,
-                facts=facts
-            )
+            scope = self._semantic_scope(facts, history)
+            cached = self._semantic_lookup(user_message, scope)
+            if cached is not None:
+                return cached['resposta']
+
+            messages_prompt = self._prepare_prompt(user_message, history, facts, deadline)
             llm_answer = self.llm_manager.generate_answer(
-                messages_prompt=messages_prompt
+                messages_prompt=messages_prompt,
+                deadline=deadline,
+                **self._answer_options(user_message)
             )
-            if 'dados_extraidos' in llm_answer:
-                self.data_manager.save_interaction(
-                    user_message=user_message,
-                    answer=llm_answer['resposta'],
-                    extracted_data=llm_answer['dados_extraidos'],
-                )
-                self.user = self.data_manager.update_user(
-                    user=self.user,
-                    extracted_data=llm_answer['dados_extraidos']
-                )
-                self.data_manager.save_user(user=self.user)
+            if llm_answer.get('degraded'):
+                return self.degraded_answer()
+            self._finish_turn(user_message, history, llm_answer, scope, deadline)
 
             return llm_answer['resposta']
         except AgentException:
@@ -374,6 +859,353 @@ class FinancialAgent:
         except Exception as e:
             # em produção seria melhor tratar os erros e fazer logs
             raise
+        finally:
+            TURN_DURATION.observe(deadline.elapsed())
+
+    def stream_message(
+            self,
+            user_message: str,
+            history: list[dict]
+        ) -> Iterator[str]:
+        """
+        Processa mensagem do usuário produzindo a resposta aos poucos.
+
+        Os dados extraídos só são persistidos quando o stream termina (ou,
+        no modo de extração em segundo plano, depois dele).
+
+        Args:
+            user_message: Mensagem do usuário
+            history: Histórico da conversa
+
+        Yields:
+            Texto da resposta acumulado até o momento
+
+        Raises:
+            AgentException: Se houver erro no processamento
+        """
+        deadline = Deadline(config.TURN_TIMEOUT)
+        try:
+            facts = self._extract_facts(self.user)
+            scope = self._semantic_scope(facts, history)
+            cached = self._semantic_lookup(user_message, scope)
+            if cached is not None:
+                yield cached['resposta']
+                return
+
+            messages_prompt = self._prepare_prompt(user_message, history, facts, deadline)
+
+            llm_answer = {}
+            for llm_answer in self.llm_manager.stream_answer(
+                messages_prompt=messages_prompt,
+                deadline=deadline,
+                **self._answer_options(user_message)
+            ):
+                if llm_answer.get('degraded'):
+                    yield self.degraded_answer()
+                    return
+                yield llm_answer['resposta']
+
+            self._finish_turn(user_message, history, llm_answer, scope, deadline)
+        finally:
+            TURN_DURATION.observe(deadline.elapsed())
+
+    async def aprocess_message(
+            self,
+            user_message: str,
+            history: list[dict]
+        ) -> str:
+        """
+        Versão assíncrona de process_message.
+
+        As chamadas ao LLM são aguardadas sem bloquear o event loop e a
+        persistência roda em uma thread auxiliar.
+
+        Args:
+            user_message: Mensagem do usuário
+            history: Histórico da conversa
+
+        Returns:
+            Resposta do agente
+
+        Raises:
+            AgentException: Se houver erro no processamento
+        """
+        deadline = Deadline(config.TURN_TIMEOUT)
+        try:
+            facts = self._extract_facts(self.user)
+            scope = self._semantic_scope(facts, history)
+            cached = self._semantic_lookup(user_message, scope)
+            if cached is not None:
+                return cached['resposta']
+
+            history = await self._asquash_history(self._sanitize_history(history), deadline=deadline)
+            messages_prompt = self._make_prompt(
+                user_message=user_message,
+                history=history,
+                facts=facts
+            )
+            llm_answer = await self.llm_manager.agenerate_answer(
+                messages_prompt=messages_prompt,
+                deadline=deadline,
+                **self._answer_options(user_message)
+            )
+            if llm_answer.get('degraded'):
+                return self.degraded_answer()
+            await self._afinish_turn(user_message, history, llm_answer, scope, deadline)
+
+            return llm_answer['resposta']
+        finally:
+            TURN_DURATION.observe(deadline.elapsed())
+
+    async def astream_message(
+            self,
+            user_message: str,
+            history: list[dict]
+        ) -> AsyncIterator[str]:
+        """Versão assíncrona de stream_message"""
+        deadline = Deadline(config.TURN_TIMEOUT)
+        try:
+            facts = self._extract_facts(self.user)
+            scope = self._semantic_scope(facts, history)
+            cached = self._semantic_lookup(user_message, scope)
+            if cached is not None:
+                yield cached['resposta']
+                return
+
+            history = await self._asquash_history(self._sanitize_history(history), deadline=deadline)
+            messages_prompt = self._make_prompt(
+                user_message=user_message,
+                history=history,
+                facts=facts
+            )
+
+            llm_answer = {}
+            async for llm_answer in self.llm_manager.astream_answer(
+                messages_prompt=messages_prompt,
+                deadline=deadline,
+                **self._answer_options(user_message)
+            ):
+                if llm_answer.get('degraded'):
+                    yield self.degraded_answer()
+                    return
+                yield llm_answer['resposta']
+
+            await self._afinish_turn(user_message, history, llm_answer, scope, deadline)
+        finally:
+            TURN_DURATION.observe(deadline.elapsed())
+
+    def _answer_options(self, user_message: str) -> dict:
+        """
+        Rota da chamada de resposta e, nas simulações, as ferramentas de
+        cálculo (os números vêm de calculations.py, não do modelo).
+        """
+        route = classify_message(user_message)
+        return {
+            "route": route,
+            "tools": self.tools if route == ROUTE_SIMULATION else None,
+        }
+
+    def _prepare_prompt(
+            self,
+            user_message: str,
+            history: list[dict],
+            facts,
+            deadline: Optional[Deadline] = None
+    ) -> list[dict]:
+        """Monta o prompt completo a partir da mensagem e do histórico"""
+        history = self._sanitize_history(history)
+        history = self._squash_history(history, deadline=deadline)
+        return self._make_prompt(
+            user_message=user_message,
+            history=history,
+            facts=facts
+        )
+
+    def _semantic_scope(self, facts, history: list[dict]) -> list[str]:
+        """
+        Escopo do cache semântico: os fatos do usuário e a última resposta
+        da assistente. Perguntas de continuação ("e em 24 meses?") dependem
+        do turno anterior e não podem reaproveitar respostas de outra conversa.
+        """
+        scope = list(facts)
+        previous_answer = self._last_assistant_message(history)
+        if previous_answer:
+            scope.append(f"ultima_resposta: {previous_answer}")
+        return scope
+
+    def _semantic_lookup(self, user_message: str, scope) -> Optional[dict]:
+        """Busca resposta de pergunta parecida já respondida no mesmo escopo"""
+        if self.semantic_cache is None:
+            return None
+        return self.semantic_cache.lookup(user_message, scope)
+
+    def _finish_turn(
+            self,
+            user_message: str,
+            history: list[dict],
+            llm_answer: dict,
+            scope,
+            deadline: Optional[Deadline] = None
+    ) -> None:
+        """
+        Persiste o turno na hora ou agenda a extração em segundo plano.
+
+        Se o prazo do turno já estiver no fim, a gravação também vai para
+        segundo plano para não atrasar a entrega da resposta.
+        """
+        if self.background_extraction:
+            self._schedule_extraction(user_message, history, llm_answer, scope)
+        elif self._save_deferred(deadline):
+            self._submit_background(self._apply_answer, user_message, normalize_answer(llm_answer), scope)
+        else:
+            self._apply_answer(user_message, normalize_answer(llm_answer), scope)
+
+    async def _afinish_turn(
+            self,
+            user_message: str,
+            history: list[dict],
+            llm_answer: dict,
+            scope,
+            deadline: Optional[Deadline] = None
+    ) -> None:
+        """Versão assíncrona de _finish_turn"""
+        if self.background_extraction:
+            self._schedule_extraction(user_message, history, llm_answer, scope)
+        elif self._save_deferred(deadline):
+            self._submit_background(self._apply_answer, user_message, normalize_answer(llm_answer), scope)
+        else:
+            await asyncio.to_thread(self._apply_answer, user_message, normalize_answer(llm_answer), scope)
+
+    def _save_deferred(self, deadline: Optional[Deadline]) -> bool:
+        if deadline is None or deadline.remaining() >= config.TURN_SAVE_MIN:
+            return False
+        TURN_DEADLINE_FALLBACKS.inc(stage="save", action="defer")
+        return True
+
+    def _schedule_extraction(self, user_message: str, history: list[dict], llm_answer: dict, scope) -> Future:
+        """Agenda a extração dos dados do turno, fora do caminho da resposta"""
+        return self._submit_background(
+            self._extract_and_apply,
+            user_message,
+            self._last_assistant_message(history),
+            llm_answer.get('resposta', ''),
+            scope,
+            time.monotonic(),
+        )
+
+    def _submit_background(self, function, *args) -> Future:
+        """
+        Roda trabalho do turno na thread de segundo plano do agente.
+
+        Uma única thread mantém os turnos de um usuário gravados em ordem;
+        wait_extractions aguarda tudo o que foi agendado aqui.
+        """
+        if self._extraction_executor is None:
+            self._extraction_executor = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="extraction"
+            )
+        return self._track_background(self._extraction_executor.submit(function, *args))
+
+    def _track_background(self, future: Future) -> Future:
+        """Inclui o trabalho em segundo plano no que wait_extractions aguarda"""
+        self._pending_extractions.add(future)
+        future.add_done_callback(self._pending_extractions.discard)
+        return future
+
+    def _extract_and_apply(
+        self,
+        user_message: str,
+        previous_answer: Optional[str],
+        answer: str,
+        scope,
+        answered_at: float
+    ) -> None:
+        """Extrai os dados da mensagem com uma chamada curta e persiste o turno"""
+        try:
+            extraction = normalize_answer(self.llm_manager.generate_answer(
+                messages_prompt=self._extraction_prompt(user_message, previous_answer),
+                route=ROUTE_EXTRACTION
+            ))
+            if 'dados_extraidos' not in extraction:
+                EXTRACTION_JOBS.inc(status="empty")
+                return
+
+            self._apply_answer(
+                user_message,
+                {"resposta": answer, "dados_extraidos": extraction['dados_extraidos']},
+                scope,
+            )
+            EXTRACTION_JOBS.inc(status="ok")
+            EXTRACTION_LAG.observe(time.monotonic() - answered_at)
+        except Exception:
+            # A resposta já foi entregue; a falha fica só na métrica
+            EXTRACTION_JOBS.inc(status="error")
+
+    def _extraction_prompt(self, user_message: str, previous_answer: Optional[str]) -> list[dict]:
+        """Monta o prompt curto da extração (sem histórico nem SYSTEM_PROMPT)"""
+        if self.extraction_schema == SCHEMA_DELTA:
+            prompt, prompt_tokens = DELTA_EXTRACTION_PROMPT, _DELTA_EXTRACTION_PROMPT_TOKENS
+        else:
+            prompt, prompt_tokens = EXTRACTION_PROMPT, _EXTRACTION_PROMPT_TOKENS
+
+        budget = config.EXTRACTION_MAX_INPUT_TOKENS - prompt_tokens - MESSAGE_OVERHEAD
+        messages = [{"role": "system", "content": prompt}]
+        if previous_answer:
+            previous_budget = budget // 3
+            messages.append({
+                "role": "assistant",
+                "content": truncate_to_tokens(previous_answer, previous_budget),
+            })
+            budget -= previous_budget + MESSAGE_OVERHEAD
+        messages.append({"role": "user", "content": truncate_to_tokens(user_message, budget)})
+        return messages
+
+    def _last_assistant_message(self, history: list[dict]) -> Optional[str]:
+        for message in reversed(history or []):
+            if isinstance(message, dict) and message.get("role") == "assistant":
+                return self._message_text(message) or None
+        return None
+
+    def wait_extractions(self, timeout: Optional[float] = None) -> bool:
+        """
+        Aguarda o trabalho em segundo plano pendente do agente (extrações,
+        gravações adiadas e compactações do histórico).
+
+        Returns:
+            True se todas terminaram dentro do prazo
+        """
+        pending = list(self._pending_extractions)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for future in pending:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                future.result(timeout=remaining)
+            except Exception:
+                return False
+        return True
+
+    def _apply_answer(self, user_message: str, llm_answer: dict, scope=()) -> None:
+        """Persiste a interação e os dados extraídos da resposta do LLM"""
+        if 'dados_extraidos' not in llm_answer:
+            return
+
+        extracted_data = llm_answer['dados_extraidos'] or {}
+        self.data_manager.save_interaction(
+            user_message=user_message,
+            answer=llm_answer['resposta'],
+            extracted_data=extracted_data,
+        )
+        self.user = self.data_manager.update_user(
+            user=self.user,
+            extracted_data=extracted_data
+        )
+        self.data_manager.save_user(user=self.user)
+
+        # Só respostas que não trouxeram dados novos do usuário são reaproveitáveis
+        if self.semantic_cache is not None and not any(extracted_data.values()):
+            self.semantic_cache.store(
+                user_message, scope, {"resposta": llm_answer['resposta']}
+            )
 
     def welcome_message(self) -> str:
         """Retorna mensagem de boas-vindas"""
@@ -418,6 +1250,20 @@ Como posso ajudar você hoje?"""
         
         return ""
 
+    def degraded_answer(self) -> str:
+        """
+        Resposta montada localmente enquanto o LLM está indisponível
+        (circuit breaker aberto): aviso, resumo do perfil e a próxima
+        informação que falta.
+        """
+        parts = [DEGRADED_NOTICE]
+        if self.user:
+            parts.append(f"Enquanto isso, este é o seu perfil até aqui:\n\n{self.obter_resumo_perfil()}")
+        missing_info = self._get_missing_info_prompt().strip()
+        if missing_info:
+            parts.append(missing_info)
+        return "\n\n".join(parts)
+
     def obter_resumo_perfil(self) -> str:
         """Retorna resumo do perfil do usuário"""
         return self.data_manager.resumo_usuario(self.user)
@@ -0,0 +1,169 @@
+"""
+Cache de respostas do LLM
+"""
+import copy
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+import config
+
+
+def prompt_hash(messages_prompt: list[dict], model: Optional[str] = None) -> str:
+    """
+    Gera um hash canônico do prompt.
+
+    O JSON é serializado com chaves ordenadas e sem espaços, de forma que
+    prompts equivalentes gerem sempre o mesmo hash.
+
+    Args:
+        messages_prompt: Mensagens do prompt
+        model: Nome do modelo que vai responder
+
+    Returns:
+        Hash SHA-256 em hexadecimal
+    """
+    canonical = json.dumps(
+        {"model": model, "messages": messages_prompt},
+        ensure_ascii=False,
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Cache de respostas por correspondência exata do prompt.
+
+    Mantém um nível em memória (LRU) e, opcionalmente, um nível em disco
+    com um arquivo JSON por entrada. As entradas expiram após `ttl` segundos.
+    """
+
+    def __init__(
+        self,
+        max_size: int = config.LLM_CACHE_SIZE,
+        ttl: Optional[float] = config.LLM_CACHE_TTL,
+        disk_path: Optional[Path] = None
+    ):
+        """
+        Args:
+            max_size: Quantidade máxima de entradas em memória
+            ttl: Tempo de vida das entradas em segundos (None ou 0 = sem expiração)
+            disk_path: Diretório do nível em disco (None = desativado)
+        """
+        self.max_size = max_size
+        self.ttl = ttl or None
+        self.disk_path = disk_path
+        self._entries: OrderedDict[str, tuple[Optional[float], dict]] = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        if self.disk_path is not None:
+            self.disk_path.mkdir(parents=True, exist_ok=True)
+
+    def get(self, key: str) -> Optional[dict]:
+        """
+        Busca uma resposta no cache.
+
+        Returns:
+            Cópia da resposta armazenada, ou None se não houver entrada válida
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at is None or expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return copy.deepcopy(value)
+                del self._entries[key]
+
+        value = self._read_disk(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._store(key, value, now)
+        return copy.deepcopy(value)
+
+    def set(self, key: str, value: dict) -> None:
+        """Armazena uma resposta no cache"""
+        value = copy.deepcopy(value)
+        with self._lock:
+            self._store(key, value, time.monotonic())
+        self._write_disk(key, value)
+
+    def clear(self) -> None:
+        """Remove todas as entradas em memória"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """Retorna contadores de uso do cache"""
+        with self._lock:
+            total = self.hits + self.disk_hits + self.misses
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": (self.hits + self.disk_hits) / total if total else 0.0,
+            }
+
+    def _store(self, key: str, value: dict, now: float) -> None:
+        expires_at = now + self.ttl if self.ttl else None
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _disk_file(self, key: str) -> Path:
+        return self.disk_path / key[:2] / f"{key}.json"
+
+    def _read_disk(self, key: str) -> Optional[dict]:
+        if self.disk_path is None:
+            return None
+        filepath = self._disk_file(key)
+        try:
+            with open(filepath, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+
+        # No disco usamos o relógio de parede, que sobrevive a reinícios
+        expires_at = entry.get("expires_at")
+        if expires_at is not None and expires_at <= time.time():
+            filepath.unlink(missing_ok=True)
+            return None
+        return entry.get("value")
+
+    def _write_disk(self, key: str, value: dict) -> None:
+        if self.disk_path is None:
+            return
+        filepath = self._disk_file(key)
+        entry = {
+            "expires_at": time.time() + self.ttl if self.ttl else None,
+            "value": value,
+        }
+        try:
+            filepath.parent.mkdir(exist_ok=True)
+            tmp_file = filepath.with_suffix(".tmp")
+            with open(tmp_file, "w", encoding="utf-8") as f:
+                json.dump(entry, f, ensure_ascii=False)
+            tmp_file.replace(filepath)
+        except OSError:
+            # Falha no disco não impede o uso do nível em memória
+            pass
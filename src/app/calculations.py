@@ -0,0 +1,364 @@
+"""
+Cálculos financeiros determinísticos usados pelo agente como ferramentas
+
+As taxas são sempre mensais e em porcentagem (1.5 = 1,5% ao mês), como o
+usuário costuma informar; os valores em reais saem arredondados em centavos.
+"""
+import math
+from typing import Optional
+
+from exceptions import ValidationError
+from tools import ToolSet
+
+# Limite das projeções mês a mês (50 anos)
+MAX_PROJECTION_MONTHS = 600
+
+
+def price_schedule(valor: float, taxa_mensal: float, parcelas: int) -> dict:
+    """
+    Financiamento pela tabela Price (parcelas fixas).
+
+    Args:
+        valor: Valor financiado
+        taxa_mensal: Juros ao mês, em %
+        parcelas: Número de parcelas
+
+    Returns:
+        Parcela, total pago e total de juros
+    """
+    _positive("valor", valor)
+    _non_negative("taxa_mensal", taxa_mensal)
+    _months("parcelas", parcelas)
+
+    rate = taxa_mensal / 100
+    if rate == 0:
+        installment = valor / parcelas
+    else:
+        installment = valor * rate / (1 - (1 + rate) ** -parcelas)
+    total = installment * parcelas
+    return {
+        "sistema": "price",
+        "valor_financiado": _money(valor),
+        "taxa_mensal": taxa_mensal,
+        "parcelas": parcelas,
+        "parcela": _money(installment),
+        "total_pago": _money(total),
+        "total_juros": _money(total - valor),
+    }
+
+
+def sac_schedule(valor: float, taxa_mensal: float, parcelas: int) -> dict:
+    """
+    Financiamento pelo SAC (amortização constante, parcelas decrescentes).
+
+    Returns:
+        Amortização mensal, primeira e última parcela, total pago e juros
+    """
+    _positive("valor", valor)
+    _non_negative("taxa_mensal", taxa_mensal)
+    _months("parcelas", parcelas)
+
+    rate = taxa_mensal / 100
+    amortization = valor / parcelas
+    # Juros sobre o saldo devedor, que cai uma amortização por mês
+    interest = rate * valor * (parcelas + 1) / 2
+    return {
+        "sistema": "sac",
+        "valor_financiado": _money(valor),
+        "taxa_mensal": taxa_mensal,
+        "parcelas": parcelas,
+        "amortizacao": _money(amortization),
+        "primeira_parcela": _money(amortization + valor * rate),
+        "ultima_parcela": _money(amortization * (1 + rate)),
+        "total_pago": _money(valor + interest),
+        "total_juros": _money(interest),
+    }
+
+
+def compare_cash_vs_installments(
+    preco_a_vista: float,
+    valor_parcela: float,
+    parcelas: int,
+    rendimento_mensal: float = 0.0,
+    primeira_no_ato: bool = False
+) -> dict:
+    """
+    Compara pagar à vista com parcelar trazendo as parcelas a valor presente.
+
+    O dinheiro que não sai à vista rende `rendimento_mensal`; se o valor
+    presente das parcelas for menor que o preço à vista, parcelar compensa.
+
+    Args:
+        preco_a_vista: Preço para pagamento à vista
+        valor_parcela: Valor de cada parcela
+        parcelas: Número de parcelas
+        rendimento_mensal: Rendimento do dinheiro guardado, em % ao mês
+        primeira_no_ato: A primeira parcela é paga na compra
+
+    Returns:
+        Valor presente do parcelado, melhor opção, diferença e a taxa de
+        juros embutida no parcelamento
+    """
+    _positive("preco_a_vista", preco_a_vista)
+    _positive("valor_parcela", valor_parcela)
+    _months("parcelas", parcelas)
+    _non_negative("rendimento_mensal", rendimento_mensal)
+
+    present_value = _installments_present_value(
+        valor_parcela, parcelas, rendimento_mensal / 100, primeira_no_ato
+    )
+    difference = preco_a_vista - present_value
+    if abs(difference) < 0.005:
+        best = "indiferente"
+    else:
+        best = "parcelado" if difference > 0 else "a_vista"
+
+    return {
+        "preco_a_vista": _money(preco_a_vista),
+        "total_parcelado": _money(valor_parcela * parcelas),
+        "valor_presente_parcelado": _money(present_value),
+        "melhor_opcao": best,
+        "diferenca": _money(abs(difference)),
+        "juros_embutidos_mensal": round(
+            _implied_rate(preco_a_vista, valor_parcela, parcelas, primeira_no_ato) * 100, 2
+        ),
+    }
+
+
+def compound_growth(
+    valor_inicial: float,
+    taxa_mensal: float,
+    meses: int,
+    aporte_mensal: float = 0.0
+) -> dict:
+    """
+    Juros compostos com aportes mensais (feitos ao fim de cada mês).
+
+    Returns:
+        Valor final, total investido e rendimento
+    """
+    _non_negative("valor_inicial", valor_inicial)
+    _non_negative("taxa_mensal", taxa_mensal)
+    _months("meses", meses)
+    _non_negative("aporte_mensal", aporte_mensal)
+
+    rate = taxa_mensal / 100
+    growth = (1 + rate) ** meses
+    contributions = aporte_mensal * ((growth - 1) / rate if rate else meses)
+    final = valor_inicial * growth + contributions
+    invested = valor_inicial + aporte_mensal * meses
+    return {
+        "valor_final": _money(final),
+        "total_investido": _money(invested),
+        "rendimento": _money(final - invested),
+        "meses": meses,
+    }
+
+
+def required_monthly_saving(
+    valor_alvo: float,
+    meses: int,
+    taxa_mensal: float = 0.0,
+    valor_inicial: float = 0.0
+) -> dict:
+    """
+    Aporte mensal necessário para chegar a um valor em um prazo.
+
+    Returns:
+        Aporte mensal, total aportado e quanto vem de rendimento
+    """
+    _positive("valor_alvo", valor_alvo)
+    _months("meses", meses)
+    _non_negative("taxa_mensal", taxa_mensal)
+    _non_negative("valor_inicial", valor_inicial)
+
+    rate = taxa_mensal / 100
+    growth = (1 + rate) ** meses
+    missing = valor_alvo - valor_inicial * growth
+    if missing <= 0:
+        saving = 0.0
+    else:
+        saving = missing * rate / (growth - 1) if rate else missing / meses
+    invested = valor_inicial + saving * meses
+    return {
+        "aporte_mensal": _money(saving),
+        "total_aportado": _money(invested),
+        "rendimento": _money(max(valor_alvo, valor_inicial * growth) - invested),
+        "meses": meses,
+    }
+
+
+def emergency_reserve(
+    despesa_mensal: float,
+    meses_cobertura: int = 6,
+    reserva_atual: float = 0.0,
+    aporte_mensal: float = 0.0,
+    taxa_mensal: float = 0.0
+) -> dict:
+    """
+    Meta de reserva de emergência e prazo para atingi-la.
+
+    Returns:
+        Valor da meta, quanto falta e em quantos meses a meta é atingida
+        com o aporte informado (None se não for atingida em 50 anos)
+    """
+    _positive("despesa_mensal", despesa_mensal)
+    _months("meses_cobertura", meses_cobertura)
+    _non_negative("reserva_atual", reserva_atual)
+    _non_negative("aporte_mensal", aporte_mensal)
+    _non_negative("taxa_mensal", taxa_mensal)
+
+    target = despesa_mensal * meses_cobertura
+    missing = max(0.0, target - reserva_atual)
+    return {
+        "meta": _money(target),
+        "reserva_atual": _money(reserva_atual),
+        "falta": _money(missing),
+        "meses_para_atingir": _months_to_reach(
+            target, reserva_atual, aporte_mensal, taxa_mensal / 100
+        ),
+    }
+
+
+def _installments_present_value(
+    installment: float,
+    count: int,
+    rate: float,
+    first_upfront: bool
+) -> float:
+    if rate == 0:
+        return installment * count
+    value = installment * (1 - (1 + rate) ** -count) / rate
+    return value * (1 + rate) if first_upfront else value
+
+
+def _implied_rate(price: float, installment: float, count: int, first_upfront: bool) -> float:
+    """Taxa mensal que iguala o valor presente das parcelas ao preço à vista (bisseção)"""
+    if installment * count <= price:
+        return 0.0
+    low, high = 0.0, 1.0
+    for _ in range(100):
+        mid = (low + high) / 2
+        if _installments_present_value(installment, count, mid, first_upfront) > price:
+            low = mid
+        else:
+            high = mid
+    return (low + high) / 2
+
+
+def _months_to_reach(target: float, balance: float, saving: float, rate: float) -> Optional[int]:
+    months = 0
+    while balance < target:
+        if months >= MAX_PROJECTION_MONTHS or (saving <= 0 and rate <= 0):
+            return None
+        balance = balance * (1 + rate) + saving
+        months += 1
+    return months
+
+
+def _money(value: float) -> float:
+    # + 0.0 evita "-0.0" em diferenças arredondadas para zero
+    return round(value, 2) + 0.0
+
+
+def _positive(name: str, value) -> None:
+    if not _is_number(value) or value <= 0:
+        raise ValidationError(f"{name} deve ser um número positivo")
+
+
+def _non_negative(name: str, value) -> None:
+    if not _is_number(value) or value < 0:
+        raise ValidationError(f"{name} não pode ser negativo")
+
+
+def _months(name: str, value) -> None:
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    if not isinstance(value, int) or isinstance(value, bool) or not 0 < value <= MAX_PROJECTION_MONTHS:
+        raise ValidationError(f"{name} deve ser um número inteiro entre 1 e {MAX_PROJECTION_MONTHS}")
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
+
+def _number(description: str) -> dict:
+    return {"type": "number", "description": description}
+
+
+def _integer(description: str) -> dict:
+    return {"type": "integer", "description": description}
+
+
+CALCULATION_TOOLS = ToolSet()
+
+CALCULATION_TOOLS.add(
+    price_schedule,
+    "tabela_price",
+    "Parcela fixa, total pago e juros de um financiamento pela tabela Price",
+    {
+        "valor": _number("Valor financiado em reais"),
+        "taxa_mensal": _number("Juros ao mês em % (1.5 = 1,5% a.m.)"),
+        "parcelas": _integer("Número de parcelas"),
+    },
+)
+CALCULATION_TOOLS.add(
+    sac_schedule,
+    "tabela_sac",
+    "Primeira e última parcela, total pago e juros de um financiamento pelo SAC",
+    {
+        "valor": _number("Valor financiado em reais"),
+        "taxa_mensal": _number("Juros ao mês em %"),
+        "parcelas": _integer("Número de parcelas"),
+    },
+)
+CALCULATION_TOOLS.add(
+    compare_cash_vs_installments,
+    "comparar_a_vista_parcelado",
+    "Compara pagar à vista com parcelar, trazendo as parcelas a valor presente",
+    {
+        "preco_a_vista": _number("Preço à vista em reais"),
+        "valor_parcela": _number("Valor de cada parcela em reais"),
+        "parcelas": _integer("Número de parcelas"),
+        "rendimento_mensal": _number("Rendimento do dinheiro guardado, em % ao mês (0 se não informado)"),
+        "primeira_no_ato": {"type": "boolean", "description": "A primeira parcela é paga na compra"},
+    },
+    required=("preco_a_vista", "valor_parcela", "parcelas"),
+)
+CALCULATION_TOOLS.add(
+    compound_growth,
+    "juros_compostos",
+    "Valor final de uma aplicação com juros compostos e aportes mensais",
+    {
+        "valor_inicial": _number("Valor aplicado hoje em reais"),
+        "taxa_mensal": _number("Rendimento ao mês em %"),
+        "meses": _integer("Prazo em meses"),
+        "aporte_mensal": _number("Aporte ao fim de cada mês em reais"),
+    },
+    required=("valor_inicial", "taxa_mensal", "meses"),
+)
+CALCULATION_TOOLS.add(
+    required_monthly_saving,
+    "aporte_necessario",
+    "Quanto guardar por mês para atingir um valor em um prazo",
+    {
+        "valor_alvo": _number("Valor a atingir em reais"),
+        "meses": _integer("Prazo em meses"),
+        "taxa_mensal": _number("Rendimento ao mês em % (0 se não informado)"),
+        "valor_inicial": _number("Valor já guardado em reais"),
+    },
+    required=("valor_alvo", "meses"),
+)
+CALCULATION_TOOLS.add(
+    emergency_reserve,
+    "reserva_emergencia",
+    "Meta de reserva de emergência, quanto falta e em quantos meses é atingida",
+    {
+        "despesa_mensal": _number("Despesa (ou renda, se a despesa não for conhecida) mensal em reais"),
+        "meses_cobertura": _integer("Meses de despesa que a reserva cobre (padrão 6)"),
+        "reserva_atual": _number("Reserva já guardada em reais"),
+        "aporte_mensal": _number("Quanto guarda por mês em reais"),
+        "taxa_mensal": _number("Rendimento da reserva ao mês em %"),
+    },
+    required=("despesa_mensal",),
+)
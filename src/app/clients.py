@@ -0,0 +1,173 @@
+"""
+Clientes HTTP compartilhados para os providers de LLM
+"""
+import threading
+from typing import Optional
+
+import httpx
+from groq import AsyncGroq, DefaultAsyncHttpxClient, DefaultHttpxClient, Groq
+
+import config
+
+
+class ClientRegistry:
+    """
+    Registro de clientes Groq compartilhados pelo processo.
+
+    Todos os providers usam o mesmo pool de conexões keep-alive, evitando
+    um novo handshake TCP/TLS a cada GroqProvider criado.
+    """
+
+    def __init__(
+        self,
+        pool_size: int = config.GROQ_POOL_SIZE,
+        keepalive_expiry: float = config.GROQ_KEEPALIVE_EXPIRY
+    ):
+        """
+        Args:
+            pool_size: Máximo de conexões mantidas abertas (keep-alive)
+            keepalive_expiry: Segundos que uma conexão ociosa fica no pool
+        """
+        self.limits = httpx.Limits(
+            max_connections=pool_size,
+            max_keepalive_connections=pool_size,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self._clients: dict[Optional[str], Groq] = {}
+        self._async_clients: dict[Optional[str], AsyncGroq] = {}
+        self._http: Optional[httpx.Client] = None
+        self._async_http: Optional[httpx.AsyncClient] = None
+        self._lock = threading.Lock()
+
+        self.requests = 0
+        self.warmups = 0
+        self.warmup_errors = 0
+
+    def get_client(self, api_key: Optional[str] = None) -> Groq:
+        """Retorna o cliente Groq síncrono compartilhado para a API key"""
+        api_key = api_key or config.GROQ_API_KEY
+        with self._lock:
+            client = self._clients.get(api_key)
+            if client is None:
+                client = Groq(
+                    api_key=api_key,
+                    http_client=self._sync_http(),
+                    max_retries=config.GROQ_MAX_RETRIES,
+                )
+                self._clients[api_key] = client
+            return client
+
+    def get_async_client(self, api_key: Optional[str] = None) -> AsyncGroq:
+        """Retorna o cliente Groq assíncrono compartilhado para a API key"""
+        api_key = api_key or config.GROQ_API_KEY
+        with self._lock:
+            client = self._async_clients.get(api_key)
+            if client is None:
+                if self._async_http is None:
+                    self._async_http = DefaultAsyncHttpxClient(
+                        limits=self.limits,
+                        event_hooks={"request": [self._acount_request]},
+                    )
+                client = AsyncGroq(
+                    api_key=api_key,
+                    http_client=self._async_http,
+                    max_retries=config.GROQ_MAX_RETRIES,
+                )
+                self._async_clients[api_key] = client
+            return client
+
+    def warm_up(self, api_key: Optional[str] = None, url: Optional[str] = None) -> bool:
+        """
+        Abre antecipadamente uma conexão com a API (handshake TCP/TLS).
+
+        Faz um HEAD na URL base, sem autenticação nem consumo de tokens; a
+        conexão fica no pool e é reaproveitada pela primeira requisição real.
+
+        Args:
+            api_key: API key do cliente a aquecer
+            url: URL alternativa (ex.: um servidor local de testes)
+
+        Returns:
+            True se a conexão foi estabelecida
+        """
+        client = self.get_client(api_key)
+        try:
+            self._sync_http().head(url or str(client.base_url), timeout=config.GROQ_WARMUP_TIMEOUT)
+        except httpx.HTTPError:
+            self.warmup_errors += 1
+            return False
+        self.warmups += 1
+        return True
+
+    async def awarm_up(self, api_key: Optional[str] = None, url: Optional[str] = None) -> bool:
+        """
+        Versão assíncrona de warm_up, para o pool do AsyncGroq.
+
+        As conexões do pool assíncrono ficam presas ao event loop que as
+        abriu, então deve ser aguardada no loop que atende as requisições
+        (o do servidor), não numa thread com loop próprio.
+        """
+        client = self.get_async_client(api_key)
+        try:
+            await self._async_http.head(url or str(client.base_url), timeout=config.GROQ_WARMUP_TIMEOUT)
+        except httpx.HTTPError:
+            self.warmup_errors += 1
+            return False
+        self.warmups += 1
+        return True
+
+    def stats(self) -> dict:
+        """Retorna estatísticas dos clientes e dos pools de conexões (síncrono e assíncrono)"""
+        sync_connections = self._pool_connections(self._http)
+        async_connections = self._pool_connections(self._async_http)
+        connections = sync_connections + async_connections
+        return {
+            "clients": len(self._clients) + len(self._async_clients),
+            "pool_size": self.limits.max_keepalive_connections,
+            "requests": self.requests,
+            "warmups": self.warmups,
+            "warmup_errors": self.warmup_errors,
+            "open_connections": len(connections),
+            "idle_connections": sum(1 for c in connections if c.is_idle()),
+            "async_open_connections": len(async_connections),
+        }
+
+    def close(self) -> None:
+        """Fecha o pool síncrono e esquece os clientes registrados"""
+        with self._lock:
+            if self._http is not None:
+                self._http.close()
+            self._http = None
+            self._clients.clear()
+
+    async def aclose(self) -> None:
+        """Fecha o pool assíncrono e esquece os clientes assíncronos"""
+        with self._lock:
+            http, self._async_http = self._async_http, None
+            self._async_clients.clear()
+        if http is not None:
+            await http.aclose()
+
+    def _sync_http(self) -> httpx.Client:
+        if self._http is None:
+            self._http = DefaultHttpxClient(
+                limits=self.limits,
+                event_hooks={"request": [self._count_request]},
+            )
+        return self._http
+
+    def _pool_connections(self, http) -> list:
+        # httpx não expõe o pool publicamente; sem ele, reportamos zero
+        try:
+            return list(http._transport._pool.connections)
+        except AttributeError:
+            return []
+
+    def _count_request(self, request: httpx.Request) -> None:
+        self.requests += 1
+
+    async def _acount_request(self, request: httpx.Request) -> None:
+        self.requests += 1
+
+
+registry = ClientRegistry()
@@ -0,0 +1,90 @@
+"""
+Compactação do histórico em segundo plano
+"""
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Optional
+
+import config
+from metrics import COMPACTION_JOBS, COMPACTION_LAG
+
+
+class CompactionWorker:
+    """
+    Fila limitada de compactações do histórico, fora do caminho da resposta.
+
+    Cada sessão tem no máximo uma compactação pendente: enquanto ela não
+    termina, os turnos seguintes usam o último resumo pronto. Com a fila
+    cheia a compactação é descartada; o turno seguinte tenta de novo.
+    """
+
+    def __init__(
+        self,
+        max_pending: int = config.COMPACTION_QUEUE_SIZE,
+        workers: int = config.COMPACTION_WORKERS
+    ):
+        """
+        Args:
+            max_pending: Compactações aguardando ou em execução, somando
+                todas as sessões
+            workers: Threads que executam as compactações
+        """
+        self.max_pending = max_pending
+        self.workers = workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._sessions: set[str] = set()
+        self._lock = threading.Lock()
+
+    def submit(self, session: str, function: Callable, *args) -> Optional[Future]:
+        """
+        Agenda uma compactação da sessão.
+
+        Returns:
+            Future da compactação, ou None se a sessão já tem uma pendente
+            ou a fila está cheia
+        """
+        with self._lock:
+            if session in self._sessions:
+                COMPACTION_JOBS.inc(status="in_flight")
+                return None
+            if len(self._sessions) >= self.max_pending:
+                COMPACTION_JOBS.inc(status="queue_full")
+                return None
+            self._sessions.add(session)
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix="compaction"
+                )
+            executor = self._executor
+
+        return executor.submit(self._run, session, function, args, time.monotonic())
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._sessions)
+
+    def _run(self, session: str, function: Callable, args: tuple, scheduled_at: float) -> None:
+        try:
+            function(*args)
+            COMPACTION_JOBS.inc(status="ok")
+            COMPACTION_LAG.observe(time.monotonic() - scheduled_at)
+        except Exception:
+            # O turno já foi respondido com o resumo anterior
+            COMPACTION_JOBS.inc(status="error")
+        finally:
+            with self._lock:
+                self._sessions.discard(session)
+
+
+_worker: Optional[CompactionWorker] = None
+_worker_lock = threading.Lock()
+
+
+def compaction_worker() -> CompactionWorker:
+    """Retorna a fila de compactação compartilhada pelo processo"""
+    global _worker
+    with _worker_lock:
+        if _worker is None:
+            _worker = CompactionWorker()
+        return _worker
@@ -76,6 +76,197 @@ LLM_TIMEOUT = int(os.getenv("LLM_TIMEOUT", "60"))
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 GROQ_MODEL_NAME = os.getenv("GROQ_MODEL_NAME", "llama-3.3-70b-versatile")
 GROQ_LLM_TIMEOUT = int(os.getenv("GROQ_LLM_TIMEOUT", LLM_TIMEOUT))
+# Retentativas ficam a cargo do RetryPolicy (resilience.py), não do SDK
+GROQ_MAX_RETRIES = int(os.getenv("GROQ_MAX_RETRIES", "0"))
+GROQ_RETRY_ATTEMPTS = int(os.getenv("GROQ_RETRY_ATTEMPTS", "4"))
+GROQ_RETRY_BASE_DELAY = float(os.getenv("GROQ_RETRY_BASE_DELAY", "0.5"))
+GROQ_RETRY_MAX_DELAY = float(os.getenv("GROQ_RETRY_MAX_DELAY", "8"))
+
+# Cotas do provedor (limitador do lado do cliente)
+GROQ_RPM = float(os.getenv("GROQ_RPM", "30"))
+GROQ_TPM = float(os.getenv("GROQ_TPM", "12000"))
+
+# Circuit breaker: com o provedor fora do ar ou lento, responde na hora com
+# respostas locais em vez de esperar GROQ_LLM_TIMEOUT a cada turno
+LLM_BREAKER_ENABLED = os.getenv("LLM_BREAKER_ENABLED", "true").lower() == "true"
+LLM_BREAKER_WINDOW = float(os.getenv("LLM_BREAKER_WINDOW", "60"))
+LLM_BREAKER_MIN_CALLS = int(os.getenv("LLM_BREAKER_MIN_CALLS", "5"))
+LLM_BREAKER_ERROR_RATE = float(os.getenv("LLM_BREAKER_ERROR_RATE", "0.5"))
+# Chamadas acima deste tempo (segundos) contam como lentas
+LLM_BREAKER_SLOW_CALL = float(os.getenv("LLM_BREAKER_SLOW_CALL", "20"))
+LLM_BREAKER_SLOW_RATE = float(os.getenv("LLM_BREAKER_SLOW_RATE", "0.8"))
+# Tempo aberto antes de deixar passar chamadas de teste (meio aberto)
+LLM_BREAKER_OPEN_SECONDS = float(os.getenv("LLM_BREAKER_OPEN_SECONDS", "30"))
+LLM_BREAKER_HALF_OPEN_CALLS = int(os.getenv("LLM_BREAKER_HALF_OPEN_CALLS", "1"))
+
+# Prazo total de um turno (resumo do histórico + resposta + persistência).
+# As chamadas ao LLM encolhem o timeout para caber no que resta dele
+TURN_TIMEOUT = float(os.getenv("TURN_TIMEOUT", GROQ_LLM_TIMEOUT))
+# Tempo reservado à resposta: o resumo do histórico só usa o que sobra
+TURN_ANSWER_RESERVE = float(os.getenv("TURN_ANSWER_RESERVE", "20"))
+TURN_SQUASH_TIMEOUT = float(os.getenv("TURN_SQUASH_TIMEOUT", "10"))
+# Com menos que isso para o resumo, o histórico é truncado em vez de resumido
+TURN_SQUASH_MIN = float(os.getenv("TURN_SQUASH_MIN", "2"))
+# Com menos que isso no fim do turno, a gravação vai para segundo plano
+TURN_SAVE_MIN = float(os.getenv("TURN_SAVE_MIN", "0.5"))
+
+# Pool de conexões HTTP compartilhado por todos os providers
+GROQ_POOL_SIZE = int(os.getenv("GROQ_POOL_SIZE", "20"))
+GROQ_KEEPALIVE_EXPIRY = float(os.getenv("GROQ_KEEPALIVE_EXPIRY", "30"))
+GROQ_WARMUP = os.getenv("GROQ_WARMUP", "true").lower() == "true"
+GROQ_WARMUP_TIMEOUT = float(os.getenv("GROQ_WARMUP_TIMEOUT", "5"))
+
+# Exibe a resposta à medida que é gerada (streaming de tokens)
+LLM_STREAMING = os.getenv("LLM_STREAMING", "true").lower() == "true"
+
+# Orçamento de tokens de entrada por requisição (prompt completo)
+LLM_MAX_INPUT_TOKENS = int(os.getenv("LLM_MAX_INPUT_TOKENS", "6000"))
+# Sobrescritas por modelo no formato "modelo=tokens,modelo2=tokens"
+MODEL_MAX_INPUT_TOKENS = {
+    model.strip(): int(tokens)
+    for model, tokens in (
+        item.split("=", 1)
+        for item in os.getenv("MODEL_MAX_INPUT_TOKENS", "").split(",")
+        if "=" in item
+    )
+}
+
+# Disposição do prompt: "stable" mantém as instruções fixas como prefixo
+# idêntico entre turnos (cache de prefixo do provider) e os fatos depois;
+# "legacy" insere os fatos entre FORMAT_PROMPT e SYSTEM_PROMPT
+PROMPT_LAYOUT = os.getenv("PROMPT_LAYOUT", "stable").lower()
+
+# Extração de dados do perfil: "inline" pede resposta e dados_extraidos na
+# mesma chamada; "background" pede só a resposta e extrai os dados numa
+# chamada separada, depois que a resposta já foi entregue
+EXTRACTION_MODE = os.getenv("EXTRACTION_MODE", "inline").lower()
+# Esquema dos dados extraídos: "full" (todos os campos, com null) ou
+# "delta" (só os campos alterados no turno, com chaves curtas)
+EXTRACTION_SCHEMA = os.getenv("EXTRACTION_SCHEMA", "full").lower()
+EXTRACTION_MAX_INPUT_TOKENS = int(os.getenv("EXTRACTION_MAX_INPUT_TOKENS", "1500"))
+
+# Roteamento de modelos por tipo de chamada (routing.py)
+LLM_ROUTING_ENABLED = os.getenv("LLM_ROUTING_ENABLED", "true").lower() == "true"
+GROQ_SMALL_MODEL = os.getenv("GROQ_SMALL_MODEL", "llama-3.1-8b-instant")
+
+
+def _parse_mapping(value: str, cast=str) -> dict:
+    """Lê variáveis no formato chave=valor,chave2=valor2"""
+    return {
+        key.strip(): cast(item.strip())
+        for key, item in (
+            pair.split("=", 1) for pair in value.split(",") if "=" in pair
+        )
+    }
+
+
+# Modelo por rota; rotas ausentes usam GROQ_MODEL_NAME
+ROUTE_MODELS = {
+    "summary": GROQ_SMALL_MODEL,
+    "extraction": GROQ_SMALL_MODEL,
+    "greeting": GROQ_SMALL_MODEL,
+    **_parse_mapping(os.getenv("ROUTE_MODELS", "")),
+}
+# Limite de tokens de saída por rota
+ROUTE_MAX_TOKENS = {
+    "summary": 300,
+    "extraction": 300,
+    "greeting": 300,
+    "answer": 1024,
+    "simulation": 1536,
+    **_parse_mapping(os.getenv("ROUTE_MAX_TOKENS", ""), int),
+}
+# Respostas tentam primeiro GROQ_SMALL_MODEL e escalam para o modelo da rota
+# quando o JSON vem inválido ou a resposta não parece confiável
+LLM_CASCADE_ENABLED = os.getenv("LLM_CASCADE_ENABLED", "false").lower() == "true"
+
+# Ferramentas de cálculo (calculations.py) oferecidas ao LLM nas simulações
+CALC_TOOLS_ENABLED = os.getenv("CALC_TOOLS_ENABLED", "true").lower() == "true"
+# Rodadas de chamadas de ferramenta antes de exigir a resposta final
+LLM_TOOLS_MAX_ROUNDS = int(os.getenv("LLM_TOOLS_MAX_ROUNDS", "3"))
+
+# Providers de reserva (hedge/failover), separados por vírgula
+GROQ_FALLBACK_MODELS = [
+    m.strip() for m in os.getenv("GROQ_FALLBACK_MODELS", "").split(",") if m.strip()
+]
+LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "true").lower() == "true"
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "0.9"))
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+LLM_HEDGE_DEFAULT_DELAY = float(os.getenv("LLM_HEDGE_DEFAULT_DELAY", "3"))
+LLM_HEDGE_WORKERS = int(os.getenv("LLM_HEDGE_WORKERS", "32"))
+
+# Prompts idênticos em andamento compartilham uma única chamada ao provider
+LLM_SINGLEFLIGHT_ENABLED = os.getenv("LLM_SINGLEFLIGHT_ENABLED", "true").lower() == "true"
+
+# Cache de respostas (prompt idêntico = mesma resposta, sem custo de tokens)
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", "256"))
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", "3600"))
+LLM_CACHE_DISK = os.getenv("LLM_CACHE_DISK", "false").lower() == "true"
+LLM_CACHE_PATH = DATA_PATH / "cache"
+
+# Cache semântico (perguntas parecidas que independem do perfil do usuário)
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() == "true"
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.8"))
+SEMANTIC_CACHE_SIZE = int(os.getenv("SEMANTIC_CACHE_SIZE", "512"))
+SEMANTIC_CACHE_MIN_TERMS = int(os.getenv("SEMANTIC_CACHE_MIN_TERMS", "3"))
+
+# Resumo incremental do histórico: só as mensagens novas vão ao LLM, e só
+# depois de acumular SUMMARY_FOLD_BATCH delas (até lá ficam no prompt como estão)
+SUMMARY_CACHE_SIZE = int(os.getenv("SUMMARY_CACHE_SIZE", "256"))
+SUMMARY_CACHE_DISK = os.getenv("SUMMARY_CACHE_DISK", "true").lower() == "true"
+SUMMARY_CACHE_PATH = DATA_PATH / "resumos"
+SUMMARY_FOLD_BATCH = int(os.getenv("SUMMARY_FOLD_BATCH", "4"))
+# Compactação do histórico: "inline" resume antes da resposta; "background"
+# responde com o último resumo pronto e resume numa fila em segundo plano
+COMPACTION_MODE = os.getenv("COMPACTION_MODE", "inline").lower()
+COMPACTION_QUEUE_SIZE = int(os.getenv("COMPACTION_QUEUE_SIZE", "64"))
+COMPACTION_WORKERS = int(os.getenv("COMPACTION_WORKERS", "2"))
+
+# Um agente por sessão do navegador, com o perfil em SESSIONS_PATH/<sessão>.json.
+# Sessões além de SESSION_POOL_SIZE ou paradas há SESSION_IDLE_TTL segundos
+# saem da memória (o perfil é gravado antes)
+SESSIONS_PATH = DATA_PATH / "sessoes"
+SESSION_POOL_SIZE = int(os.getenv("SESSION_POOL_SIZE", "100"))
+SESSION_IDLE_TTL = float(os.getenv("SESSION_IDLE_TTL", "1800"))
+SESSION_FLUSH_TIMEOUT = float(os.getenv("SESSION_FLUSH_TIMEOUT", "10"))
+
+# Durabilidade das gravações do perfil e das interações: "sync" grava antes
+# de responder; "write_behind" enfileira em memória e grava a cada
+# PERSISTENCE_FLUSH_INTERVAL segundos e no fim do processo (uma queda do
+# processo perde no máximo esse intervalo)
+PERSISTENCE_MODE = os.getenv("PERSISTENCE_MODE", "sync").lower()
+PERSISTENCE_QUEUE_SIZE = int(os.getenv("PERSISTENCE_QUEUE_SIZE", "1000"))
+PERSISTENCE_FLUSH_INTERVAL = float(os.getenv("PERSISTENCE_FLUSH_INTERVAL", "2"))
+
+# Log de interações em INTERACOES_PATH: segmentos JSONL trocados ao passar de
+# INTERACTION_LOG_SEGMENT_BYTES ou de INTERACTION_LOG_SEGMENT_SECONDS, com fsync
+# a cada INTERACTION_LOG_FSYNC_EVERY registros ou INTERACTION_LOG_FSYNC_INTERVAL
+# segundos. Segmentos fechados são comprimidos e apagados depois de
+# INTERACTION_LOG_RETENTION_DAYS dias (0 guarda para sempre)
+INTERACTION_LOG_SEGMENT_BYTES = int(os.getenv("INTERACTION_LOG_SEGMENT_BYTES", str(8 * 1024 * 1024)))
+INTERACTION_LOG_SEGMENT_SECONDS = float(os.getenv("INTERACTION_LOG_SEGMENT_SECONDS", "86400"))
+INTERACTION_LOG_FSYNC_EVERY = int(os.getenv("INTERACTION_LOG_FSYNC_EVERY", "32"))
+INTERACTION_LOG_FSYNC_INTERVAL = float(os.getenv("INTERACTION_LOG_FSYNC_INTERVAL", "1"))
+INTERACTION_LOG_INDEX_EVERY = int(os.getenv("INTERACTION_LOG_INDEX_EVERY", "64"))
+INTERACTION_LOG_COMPRESS = os.getenv("INTERACTION_LOG_COMPRESS", "true").lower() == "true"
+INTERACTION_LOG_RETENTION_DAYS = float(os.getenv("INTERACTION_LOG_RETENTION_DAYS", "0"))
+
+# Armazenamento do perfil e das interações: "json" (um arquivo por perfil e o
+# log segmentado acima) ou "sqlite" (STORAGE_SQLITE_PATH em modo WAL, com as
+# interações inseridas em lotes de STORAGE_BATCH_SIZE ou a cada
+# STORAGE_BATCH_INTERVAL segundos)
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "json").lower()
+STORAGE_SQLITE_PATH = Path(os.getenv("STORAGE_SQLITE_PATH", str(DATA_PATH / "agente.db")))
+STORAGE_BATCH_SIZE = int(os.getenv("STORAGE_BATCH_SIZE", "32"))
+STORAGE_BATCH_INTERVAL = float(os.getenv("STORAGE_BATCH_INTERVAL", "1"))
+STORAGE_BUSY_TIMEOUT = float(os.getenv("STORAGE_BUSY_TIMEOUT", "5"))
+
+# Métricas do LLM expostas no formato do Prometheus (endpoint /metrics)
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9464"))
+METRICS_RECENT_CALLS = int(os.getenv("METRICS_RECENT_CALLS", "200"))
 
 # Validação de valores
 MIN_RENDA_MENSAL = 0.01
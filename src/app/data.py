@@ -1,6 +1,7 @@
 """
 Gerenciamento de dados do usuário
 """
+import copy
 import json
 from datetime import datetime
 from pathlib import Path
@@ -8,17 +9,50 @@ from typing import Dict, Any, Optional, List
 
 import config
 from exceptions import DataLoadError, DataSaveError
+from interaction_log import InteractionLog
+from persistence import DURABILITY_WRITE_BEHIND, PersistenceQueue, persistence_queue
+from storage import Storage, default_storage
 
 
 class DataManager:
     """Gerenciador de dados do usuário"""
 
-    def __init__(self, user_file: Path = config.USUARIO_FILE):
+    def __init__(
+        self,
+        user_file: Path = config.USUARIO_FILE,
+        persistence: Optional[PersistenceQueue] = None,
+        interactions: Optional[InteractionLog] = None,
+        storage: Optional[Storage] = None,
+        user_id: Optional[str] = None
+    ):
+        """
+        Args:
+            user_file: Arquivo do perfil do usuário (no armazenamento JSON)
+            persistence: Fila write-behind das gravações (padrão: a do
+                processo se config.PERSISTENCE_MODE == "write_behind"; sem
+                fila, grava na hora)
+            interactions: Log das interações do armazenamento JSON (padrão:
+                o do processo em config.INTERACOES_PATH)
+            storage: Onde o perfil e as interações são gravados (padrão:
+                definido por config.STORAGE_BACKEND)
+            user_id: Id do perfil no armazenamento (padrão: nome do arquivo
+                do perfil sem extensão)
+        """
         self.user_file = user_file
+        self.user_id = user_id or Path(user_file).stem
+        # Criado antes da fila: no fim do processo a fila é esvaziada antes
+        # de o armazenamento ser fechado
+        self.storage = storage if storage is not None else default_storage(user_file, interactions)
+        if persistence is None and config.PERSISTENCE_MODE == DURABILITY_WRITE_BEHIND:
+            persistence = persistence_queue()
+        self.persistence = persistence
 
     def save_interaction(self, user_message: str, answer: str, extracted_data: dict) -> None:
         """
-        Salva histórico de interações.
+        Acrescenta a interação ao armazenamento.
+
+        Falhas não interrompem o turno; ficam em
+        interaction_log_records_total{status="error"}.
 
         Args:
             user_message: Mensagem do usuário
@@ -27,22 +61,23 @@ class DataManager:
         """
         try:
             timestamp = datetime.now()
-            filename = f"{timestamp.strftime('%Y-%m-%d_%H%M%S')}.json"
-            filepath = config.INTERACOES_PATH / filename
-
             interacao = {
                 "timestamp": timestamp.isoformat(),
                 "mensagem": user_message,
                 "resposta": answer,
-                "dados_extraidos": extracted_data
+                "dados_extraidos": copy.deepcopy(extracted_data)
             }
-
-            with open(filepath, "w", encoding="utf-8") as f:
-                json.dump(interacao, f, ensure_ascii=False, indent=2)
+            if self.persistence is not None:
+                self.persistence.put("interaction", self._write_interaction, interacao)
+            else:
+                self._write_interaction(interacao)
         except Exception:
             # Não falha se não conseguir salvar histórico
             pass
 
+    def _write_interaction(self, interacao: dict) -> None:
+        self.storage.append_interaction(self.user_id, interacao)
+
     def default_user(self) -> dict:
         """
         Retorna estrutura padrão de dados do usuário.
@@ -67,12 +102,13 @@ class DataManager:
             "reserva_emergencia_atual": None,
             "aceita_risco": False,
             "metas": [],
+            "versao": 0,
             "ultima_atualizacao": None
         }
 
     def load_user(self) -> dict:
         """
-        Carrega dados do usuário do arquivo JSON.
+        Carrega dados do usuário do armazenamento.
 
         Returns:
             Dict com dados do usuário
@@ -81,13 +117,22 @@ class DataManager:
             DataLoadError: Se houver erro ao carregar dados
         """
         try:
-            if not self.user_file.exists():
+            if self.persistence is not None:
+                pending = self.persistence.pending(self._user_key)
+                if pending is not None:
+                    # Versão ainda na fila é mais nova que a do disco
+                    return copy.deepcopy(pending)
+
+            usuario = self.storage.load_user(self.user_id)
+            if usuario is None:
                 usuario = self.default_user()
                 self.save_user(usuario)
                 return usuario
 
-            with open(self.user_file, "r", encoding="utf-8") as f:
-                return json.load(f)
+            if isinstance(usuario, dict):
+                # Perfis gravados antes do contador de versão
+                usuario.setdefault("versao", 0)
+            return usuario
         except json.JSONDecodeError as e:
             raise DataLoadError(f"Erro ao decodificar JSON: {e}")
         except Exception as e:
@@ -95,7 +140,11 @@ class DataManager:
 
     def save_user(self, user: Dict[str, Any]) -> None:
         """
-        Salva dados do usuário no arquivo JSON.
+        Salva dados do usuário no armazenamento.
+
+        Com a fila write-behind, só uma cópia do perfil é enfileirada;
+        salvamentos seguintes do mesmo arquivo substituem os que ainda não
+        foram para o disco.
 
         Args:
             usuario: Dicionário com dados do usuário
@@ -103,18 +152,25 @@ class DataManager:
         Raises:
             DataSaveError: Se houver erro ao salvar dados
         """
-        try:
-            # Atualiza timestamp
-            user["ultima_atualizacao"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        # Atualiza timestamp
+        user["ultima_atualizacao"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
-            # Cria diretório se não existir
-            self.user_file.parent.mkdir(parents=True, exist_ok=True)
+        if self.persistence is not None:
+            self.persistence.put("user", self._write_user, copy.deepcopy(user), key=self._user_key)
+            return
 
-            with open(self.user_file, "w", encoding="utf-8") as f:
-                json.dump(user, f, ensure_ascii=False, indent=2)
+        try:
+            self._write_user(user)
         except Exception as e:
             raise DataSaveError(f"Erro ao salvar usuário: {e}")
 
+    @property
+    def _user_key(self) -> tuple:
+        return ("user",) + self.storage.key(self.user_id)
+
+    def _write_user(self, user: Dict[str, Any]) -> None:
+        self.storage.save_user(self.user_id, user)
+
     def _validate_field(self, field: str, value) -> bool:
         """
         Valida se um valor é aceitável para um campo específico.
@@ -147,7 +203,10 @@ class DataManager:
         - Atualiza apenas campos existentes
         - Evita duplicidade de metas (baseado no campo 'meta')
         - Valida dados antes de salvar
+        - Incrementa "versao" quando algum dado muda (o agente usa a versão
+          para saber quando renderizar os fatos de novo)
         """
+        before = copy.deepcopy(user)
 
         # Campos simples
         for field in (
@@ -203,6 +262,8 @@ class DataManager:
                         if v is not None:
                             existing_goal[k] = v
 
+        if user != before:
+            user["versao"] = (before.get("versao") or 0) + 1
         return user
 
     def resumo_usuario(self, usuario: Dict[str, Any]) -> str:
@@ -31,3 +31,23 @@ class ExtractionError(AgentException):
 class LLMError(AgentException):
     """Erro ao interagir com LLM"""
     pass
+
+
+class RateLimitError(LLMError):
+    """Limite de requisições ou tokens do provedor atingido"""
+    pass
+
+
+class LLMTimeoutError(LLMError):
+    """Prazo da chamada ao LLM esgotado"""
+    pass
+
+
+class DeadlineExceededError(LLMTimeoutError):
+    """Prazo do turno esgotado antes de a chamada ser enviada"""
+    pass
+
+
+class CircuitOpenError(LLMError):
+    """Chamada recusada pelo circuit breaker: provedor indisponível"""
+    pass
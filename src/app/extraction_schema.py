@@ -0,0 +1,115 @@
+"""
+Esquema compacto (delta) dos dados extraídos pelo LLM
+"""
+from typing import Any, Optional
+
+SCHEMA_FULL = "full"
+SCHEMA_DELTA = "delta"
+
+# Chave do delta na resposta do LLM
+DELTA_KEY = "d"
+
+# Chave curta -> (campo em dados_extraidos, descrição para o prompt)
+SHORT_KEYS = {
+    "n": ("nome", "nome (string)"),
+    "i": ("idade", "idade em anos (number)"),
+    "pr": ("profissao", "profissão (string)"),
+    "r": ("renda_mensal", "renda mensal em reais (number)"),
+    "pt": ("patrimonio_total", "patrimônio total em reais (number)"),
+    "re": ("reserva_emergencia_atual", "reserva de emergência atual em reais (number)"),
+    "o": ("objetivo_principal", "objetivo principal (string)"),
+    "p": ("perfil_investidor", "perfil de investidor: conservador, moderado ou arrojado"),
+    "ar": ("aceita_risco", "aceita correr riscos (boolean)"),
+    "m": ("metas", 'metas, lista de {"m": meta, "v": valor necessário, "pz": prazo}'),
+}
+
+GOAL_SHORT_KEYS = {
+    "m": "meta",
+    "v": "valor_necessario",
+    "pz": "prazo",
+}
+
+FULL_FIELDS = tuple(field for field, _ in SHORT_KEYS.values())
+
+DELTA_KEYS_DOC = "\n".join(f"{key}: {doc}" for key, (_, doc) in SHORT_KEYS.items())
+
+
+def expand_delta(delta: Optional[dict]) -> dict:
+    """
+    Converte o delta de chaves curtas no formato completo de dados_extraidos.
+
+    Campos ausentes no delta viram None, que DataManager.update_user já
+    ignora. Chaves desconhecidas são descartadas.
+
+    Args:
+        delta: Dicionário com as chaves curtas (ex.: {"r": 5000})
+
+    Returns:
+        Dicionário com todos os campos de dados_extraidos
+    """
+    expanded: dict[str, Any] = {field: None for field in FULL_FIELDS}
+    if not isinstance(delta, dict):
+        return expanded
+
+    for key, value in delta.items():
+        entry = SHORT_KEYS.get(key)
+        if entry is None:
+            continue
+        field = entry[0]
+        if field == "metas":
+            value = _expand_goals(value)
+        expanded[field] = value
+    return expanded
+
+
+def compact_extracted(extracted: Optional[dict]) -> dict:
+    """Operação inversa de expand_delta: só os campos preenchidos, com chaves curtas"""
+    if not isinstance(extracted, dict):
+        return {}
+
+    delta = {}
+    for key, (field, _) in SHORT_KEYS.items():
+        value = extracted.get(field)
+        if value is None or value == []:
+            continue
+        if field == "metas":
+            value = [
+                {
+                    short: goal[name]
+                    for short, name in GOAL_SHORT_KEYS.items()
+                    if goal.get(name) is not None
+                }
+                for goal in value
+                if isinstance(goal, dict)
+            ]
+        delta[key] = value
+    return delta
+
+
+def normalize_answer(answer: dict) -> dict:
+    """
+    Converte uma resposta no esquema delta para o esquema completo.
+
+    Respostas sem a chave "d" (erros, texto puro) ficam como estão, para
+    que não sejam tratadas como turno sem dados novos.
+    """
+    if DELTA_KEY not in answer:
+        return answer
+
+    normalized = {k: v for k, v in answer.items() if k != DELTA_KEY}
+    normalized["dados_extraidos"] = expand_delta(answer[DELTA_KEY])
+    return normalized
+
+
+def _expand_goals(goals) -> Optional[list]:
+    if not isinstance(goals, list):
+        return None
+    expanded = []
+    for goal in goals:
+        if not isinstance(goal, dict):
+            continue
+        expanded.append({
+            name: goal.get(short, goal.get(name))
+            for short, name in GOAL_SHORT_KEYS.items()
+        })
+    return expanded or None
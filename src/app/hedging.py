@@ -0,0 +1,242 @@
+"""
+Requisições com hedge e failover entre vários providers de LLM
+"""
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Optional
+
+import config
+from exceptions import LLMError
+from resilience import Deadline, deadline_kwargs
+
+
+class LatencyTracker:
+    """Janela deslizante das latências recentes de um provider"""
+
+    def __init__(self, window: int = 200):
+        self._samples: deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    @property
+    def count(self) -> int:
+        return len(self._samples)
+
+    def percentile(self, p: float) -> Optional[float]:
+        """
+        Retorna o percentil `p` (entre 0 e 1) das amostras.
+
+        Returns:
+            Latência em segundos, ou None se não houver amostras
+        """
+        with self._lock:
+            if not self._samples:
+                return None
+            ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, int(p * len(ordered)))
+        return ordered[index]
+
+
+class HedgedCaller:
+    """
+    Chama uma lista ordenada de providers com hedge e failover.
+
+    O primário recebe o prompt primeiro. Se não responder dentro do
+    percentil configurado da sua latência recente, o mesmo prompt é enviado
+    ao próximo provider e vale a primeira resposta que chegar; a outra é
+    cancelada (ou descartada, quando já estiver em execução numa thread).
+    Se um provider falhar, o próximo é acionado imediatamente.
+    """
+
+    def __init__(
+        self,
+        providers: list,
+        percentile: float = config.LLM_HEDGE_PERCENTILE,
+        min_samples: int = config.LLM_HEDGE_MIN_SAMPLES,
+        default_delay: float = config.LLM_HEDGE_DEFAULT_DELAY,
+        hedge: bool = config.LLM_HEDGE_ENABLED,
+        executor: Optional[ThreadPoolExecutor] = None
+    ):
+        """
+        Args:
+            providers: Providers em ordem de preferência
+            percentile: Percentil da latência do primário que dispara o hedge
+            min_samples: Amostras necessárias antes de usar o percentil
+            default_delay: Espera antes do hedge enquanto não há amostras
+            hedge: Se False, apenas faz failover em caso de erro
+            executor: Pool de threads para as chamadas síncronas (criado
+                sob demanda se omitido)
+        """
+        if not providers:
+            raise ValueError("É necessário ao menos um provider")
+
+        self.providers = list(providers)
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.default_delay = default_delay
+        self.hedge = hedge
+        self.trackers = [LatencyTracker() for _ in self.providers]
+        self._executor = executor
+        self._executor_lock = threading.Lock()
+
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.failovers = 0
+
+    def hedge_delay(self, index: int = 0) -> float:
+        """Espera antes de acionar o provider seguinte ao de índice `index`"""
+        tracker = self.trackers[index]
+        if tracker.count < self.min_samples:
+            return self.default_delay
+        return tracker.percentile(self.percentile)
+
+    def call(self, messages_prompt: list[dict], deadline: Optional[Deadline] = None) -> str:
+        """
+        Obtém a resposta do primeiro provider que responder com sucesso.
+
+        Args:
+            messages_prompt: Mensagens do prompt
+            deadline: Prazo do turno, repassado aos providers que o aceitam
+
+        Raises:
+            LLMError: Se todos os providers falharem
+        """
+        pending: dict[Future, int] = {}
+        next_index = 0
+        last_error: Optional[LLMError] = None
+
+        def launch() -> None:
+            nonlocal next_index
+            index = next_index
+            next_index += 1
+            pending[self._submit(index, messages_prompt, deadline)] = index
+
+        launch()
+        while pending:
+            can_hedge = self.hedge and next_index < len(self.providers)
+            timeout = self.hedge_delay(min(pending.values())) if can_hedge else None
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+
+            if not done:
+                self.hedges += 1
+                launch()
+                continue
+
+            for future in done:
+                index = pending.pop(future)
+                try:
+                    answer = future.result()
+                except LLMError as e:
+                    last_error = e
+                    continue
+                self._finish(index, pending)
+                return answer
+
+            # Todos os concluídos falharam: failover para o próximo
+            if next_index < len(self.providers):
+                self.failovers += 1
+                launch()
+
+        raise last_error or LLMError("Nenhum provider disponível.")
+
+    async def acall(self, messages_prompt: list[dict], deadline: Optional[Deadline] = None) -> str:
+        """Versão assíncrona de call; o perdedor é de fato cancelado"""
+        pending: dict[asyncio.Task, int] = {}
+        next_index = 0
+        last_error: Optional[LLMError] = None
+
+        def launch() -> None:
+            nonlocal next_index
+            index = next_index
+            next_index += 1
+            task = asyncio.ensure_future(self._acall_one(index, messages_prompt, deadline))
+            pending[task] = index
+
+        launch()
+        try:
+            while pending:
+                can_hedge = self.hedge and next_index < len(self.providers)
+                timeout = self.hedge_delay(min(pending.values())) if can_hedge else None
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+                if not done:
+                    self.hedges += 1
+                    launch()
+                    continue
+
+                for task in done:
+                    index = pending.pop(task)
+                    try:
+                        answer = task.result()
+                    except LLMError as e:
+                        last_error = e
+                        continue
+                    self._finish(index, pending)
+                    return answer
+
+                if next_index < len(self.providers):
+                    self.failovers += 1
+                    launch()
+        finally:
+            for task in pending:
+                task.cancel()
+
+        raise last_error or LLMError("Nenhum provider disponível.")
+
+    def stats(self) -> dict:
+        """Retorna latências por provider e contadores de hedge/failover"""
+        return {
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "failovers": self.failovers,
+            "providers": [
+                {
+                    "model": getattr(provider, "model", None),
+                    "samples": tracker.count,
+                    "p50": tracker.percentile(0.5),
+                    "p90": tracker.percentile(0.9),
+                    "p99": tracker.percentile(0.99),
+                }
+                for provider, tracker in zip(self.providers, self.trackers)
+            ],
+        }
+
+    def _submit(self, index: int, messages_prompt: list[dict], deadline: Optional[Deadline] = None) -> Future:
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=config.LLM_HEDGE_WORKERS,
+                    thread_name_prefix="llm-hedge",
+                )
+        return self._executor.submit(self._call_one, index, messages_prompt, deadline)
+
+    def _call_one(self, index: int, messages_prompt: list[dict], deadline: Optional[Deadline] = None) -> str:
+        provider = self.providers[index]
+        start = time.monotonic()
+        answer = provider.generate_answer(messages_prompt, **deadline_kwargs(provider, deadline))
+        # Perdedores também alimentam o histograma, mesmo descartados
+        self.trackers[index].record(time.monotonic() - start)
+        return answer
+
+    async def _acall_one(self, index: int, messages_prompt: list[dict], deadline: Optional[Deadline] = None) -> str:
+        provider = self.providers[index]
+        kwargs = deadline_kwargs(provider, deadline)
+        start = time.monotonic()
+        if asyncio.iscoroutinefunction(provider.generate_answer):
+            answer = await provider.generate_answer(messages_prompt, **kwargs)
+        else:
+            answer = await asyncio.to_thread(provider.generate_answer, messages_prompt, **kwargs)
+        self.trackers[index].record(time.monotonic() - start)
+        return answer
+
+    def _finish(self, winner: int, pending: dict) -> None:
+        if winner > 0 and pending:
+            self.hedge_wins += 1
+        for future in pending:
+            future.cancel()
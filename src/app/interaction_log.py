@@ -0,0 +1,351 @@
+"""
+Log de interações em segmentos JSONL, só com acréscimos
+
+Migração dos arquivos antigos (um .json por interação):
+    python src/app/interaction_log.py [origem] [--destino DIR] [--manter]
+"""
+import argparse
+import atexit
+import gzip
+import json
+import os
+import shutil
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Iterator, Optional
+
+import config
+from metrics import INTERACTION_LOG_FSYNCS, INTERACTION_LOG_RECORDS, INTERACTION_LOG_SEGMENTS
+
+SEGMENT_SUFFIX = ".jsonl"
+COMPRESSED_SUFFIX = ".jsonl.gz"
+INDEX_SUFFIX = ".idx"
+
+
+class InteractionLog:
+    """
+    Interações gravadas em segmentos JSONL numerados, um registro por linha.
+
+    - O segmento ativo é trocado ao passar de `segment_bytes` ou de
+      `segment_seconds` segundos aberto
+    - fsync em lote: a cada `fsync_every` registros, `fsync_interval`
+      segundos, na troca de segmento e em close()
+    - Segmentos fechados são comprimidos (gzip) se `compress`, e os que
+      terminaram há mais de `retention_days` dias são apagados
+    - Cada segmento tem um índice esparso (<segmento>.idx) com o timestamp e
+      a posição de um a cada `index_every` registros: scan() pula segmentos
+      e trechos fora do intervalo pedido
+
+    Os registros precisam de "timestamp" (ISO 8601) e são lidos na ordem de
+    gravação; o log supõe um único processo gravando no diretório.
+    """
+
+    def __init__(
+        self,
+        path: Optional[Path] = None,
+        segment_bytes: int = config.INTERACTION_LOG_SEGMENT_BYTES,
+        segment_seconds: float = config.INTERACTION_LOG_SEGMENT_SECONDS,
+        fsync_every: int = config.INTERACTION_LOG_FSYNC_EVERY,
+        fsync_interval: float = config.INTERACTION_LOG_FSYNC_INTERVAL,
+        index_every: int = config.INTERACTION_LOG_INDEX_EVERY,
+        compress: bool = config.INTERACTION_LOG_COMPRESS,
+        retention_days: float = config.INTERACTION_LOG_RETENTION_DAYS
+    ):
+        """
+        Args:
+            path: Diretório dos segmentos (padrão: config.INTERACOES_PATH)
+            segment_bytes: Tamanho a partir do qual o segmento é trocado
+            segment_seconds: Tempo aberto a partir do qual o segmento é trocado
+            fsync_every: Registros entre dois fsync
+            fsync_interval: Segundos entre dois fsync
+            index_every: Registros entre duas entradas do índice
+            compress: Comprime os segmentos fechados
+            retention_days: Dias que um segmento fechado é guardado (0: sempre)
+        """
+        self.path = Path(path if path is not None else config.INTERACOES_PATH)
+        self.segment_bytes = segment_bytes
+        self.segment_seconds = segment_seconds
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self.index_every = index_every
+        self.compress = compress
+        self.retention_days = retention_days
+        self._lock = threading.Lock()
+        self._file = None
+        self._index = None
+        self._segment: Optional[Path] = None
+        self._sequence: Optional[int] = None
+        self._opened_at = 0.0
+        self._records = 0
+        self._unsynced = 0
+        self._synced_at = time.monotonic()
+
+    def append(self, record: dict) -> None:
+        """
+        Acrescenta um registro ao segmento ativo.
+
+        Raises:
+            OSError: Se não conseguir gravar (contado na métrica)
+        """
+        line = (json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+        with self._lock:
+            try:
+                if self._file is None or self._should_rotate(len(line)):
+                    self._rotate()
+                if self._records % self.index_every == 0:
+                    entry = {"ts": record["timestamp"], "offset": self._file.tell()}
+                    self._index.write(json.dumps(entry) + "\n")
+                self._file.write(line)
+                self._records += 1
+                self._unsynced += 1
+                if (
+                    self._unsynced >= self.fsync_every
+                    or time.monotonic() - self._synced_at >= self.fsync_interval
+                ):
+                    self._sync()
+            except Exception:
+                INTERACTION_LOG_RECORDS.inc(status="error")
+                raise
+        INTERACTION_LOG_RECORDS.inc(status="ok")
+
+    def scan(self, start: Optional[datetime] = None, end: Optional[datetime] = None) -> Iterator[dict]:
+        """
+        Registros com start <= timestamp < end, na ordem de gravação.
+
+        Args:
+            start: Início do intervalo (None: desde o primeiro registro)
+            end: Fim do intervalo, exclusivo (None: até o último registro)
+        """
+        with self._lock:
+            if self._file is not None:
+                # O que ainda está no buffer também entra na leitura
+                self._file.flush()
+                self._index.flush()
+            segments = self.segments()
+
+        indexes = [self._read_index(segment) for segment in segments]
+        for i, segment in enumerate(segments):
+            index = indexes[i]
+            if end is not None and index and index[0][0] >= end:
+                return
+            following = indexes[i + 1] if i + 1 < len(indexes) else None
+            if start is not None and following and following[0][0] <= start:
+                # Tudo neste segmento é anterior ao início do próximo
+                continue
+
+            offset = 0
+            for timestamp, position in index:
+                if start is None or timestamp > start:
+                    break
+                offset = position
+
+            for record in self._read_segment(segment, offset):
+                timestamp = datetime.fromisoformat(record["timestamp"])
+                if start is not None and timestamp < start:
+                    continue
+                if end is not None and timestamp >= end:
+                    return
+                yield record
+
+    def segments(self) -> list[Path]:
+        """Segmentos do diretório, do mais antigo ao mais novo"""
+        if not self.path.exists():
+            return []
+        segments = [
+            path for path in self.path.iterdir()
+            if path.name.endswith(SEGMENT_SUFFIX) or path.name.endswith(COMPRESSED_SUFFIX)
+        ]
+        return sorted(segments, key=_sequence_of)
+
+    def sync(self) -> None:
+        """Grava em disco (fsync) o que está no segmento ativo"""
+        with self._lock:
+            if self._file is not None:
+                self._sync()
+
+    def close(self) -> None:
+        """Fecha o segmento ativo; o próximo append() abre outro"""
+        with self._lock:
+            self._close_active()
+
+    def _should_rotate(self, size: int) -> bool:
+        if self._records and self._file.tell() + size > self.segment_bytes:
+            return True
+        return time.monotonic() - self._opened_at >= self.segment_seconds
+
+    def _rotate(self) -> None:
+        self._close_active()
+        self.path.mkdir(parents=True, exist_ok=True)
+        if self._sequence is None:
+            self._sequence = max((_sequence_of(path) for path in self.segments()), default=0)
+        self._sequence += 1
+
+        stem = f"{self._sequence:08d}-{datetime.now().strftime('%Y%m%dT%H%M%S')}"
+        self._segment = self.path / f"{stem}{SEGMENT_SUFFIX}"
+        self._file = open(self._segment, "ab")
+        self._index = open(self.path / f"{stem}{INDEX_SUFFIX}", "a", encoding="utf-8")
+        self._opened_at = time.monotonic()
+        self._records = 0
+        INTERACTION_LOG_SEGMENTS.inc(event="opened")
+
+        # Segmentos que ficaram abertos numa execução anterior também são fechados aqui
+        self._seal_closed()
+        self._apply_retention()
+
+    def _close_active(self) -> None:
+        if self._file is None:
+            return
+        self._sync()
+        self._file.close()
+        self._index.close()
+        self._file = self._index = self._segment = None
+
+    def _sync(self) -> None:
+        for handle in (self._file, self._index):
+            handle.flush()
+            os.fsync(handle.fileno())
+        self._unsynced = 0
+        self._synced_at = time.monotonic()
+        INTERACTION_LOG_FSYNCS.inc()
+
+    def _seal_closed(self) -> None:
+        if not self.compress:
+            return
+        for segment in self.segments():
+            if segment == self._segment or not segment.name.endswith(SEGMENT_SUFFIX):
+                continue
+            target = segment.with_name(segment.name + ".gz")
+            tmp_target = target.with_name(target.name + ".tmp")
+            with open(segment, "rb") as source, gzip.open(tmp_target, "wb") as destination:
+                shutil.copyfileobj(source, destination)
+            tmp_target.replace(target)
+            segment.unlink()
+            INTERACTION_LOG_SEGMENTS.inc(event="compressed")
+
+    def _apply_retention(self) -> None:
+        if self.retention_days <= 0:
+            return
+        cutoff = datetime.now() - timedelta(days=self.retention_days)
+        segments = self.segments()
+        for segment, following in zip(segments, segments[1:]):
+            index = self._read_index(following)
+            # Um segmento termina antes do início do seguinte
+            if not index or index[0][0] >= cutoff:
+                break
+            segment.unlink()
+            self._index_path(segment).unlink(missing_ok=True)
+            INTERACTION_LOG_SEGMENTS.inc(event="expired")
+
+    def _index_path(self, segment: Path) -> Path:
+        return self.path / f"{_stem_of(segment)}{INDEX_SUFFIX}"
+
+    def _read_index(self, segment: Path) -> list[tuple[datetime, int]]:
+        index = []
+        try:
+            with open(self._index_path(segment), "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                        index.append((datetime.fromisoformat(entry["ts"]), entry["offset"]))
+                    except (ValueError, KeyError, TypeError):
+                        # Linha cortada por uma queda no meio da gravação
+                        continue
+        except FileNotFoundError:
+            pass
+        return index
+
+    def _read_segment(self, segment: Path, offset: int) -> Iterator[dict]:
+        opener = gzip.open if segment.name.endswith(COMPRESSED_SUFFIX) else open
+        with opener(segment, "rb") as f:
+            f.seek(offset)
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if isinstance(record, dict) and "timestamp" in record:
+                    yield record
+
+
+def _stem_of(segment: Path) -> str:
+    name = segment.name
+    for suffix in (COMPRESSED_SUFFIX, SEGMENT_SUFFIX):
+        if name.endswith(suffix):
+            return name[:-len(suffix)]
+    return segment.stem
+
+
+def _sequence_of(segment: Path) -> int:
+    try:
+        return int(_stem_of(segment).split("-", 1)[0])
+    except ValueError:
+        return 0
+
+
+def migrate(source: Path, log: InteractionLog, remove: bool = True) -> tuple[int, int]:
+    """
+    Copia as interações gravadas um arquivo por interação para o log.
+
+    Os arquivos são lidos na ordem do nome (o horário da interação). Só
+    depois do fsync do log os migrados são apagados; os ilegíveis ficam.
+
+    Args:
+        source: Diretório com os arquivos <AAAA-MM-DD_HHMMSS>.json
+        log: Log de destino
+        remove: Apaga os arquivos migrados
+
+    Returns:
+        Tupla (migrados, ignorados)
+    """
+    migrated, skipped = [], 0
+    for path in sorted(Path(source).glob("*.json")):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                record = json.load(f)
+            if not isinstance(record, dict):
+                raise ValueError("registro não é um objeto")
+            if "timestamp" not in record:
+                record["timestamp"] = datetime.strptime(path.stem, "%Y-%m-%d_%H%M%S").isoformat()
+            log.append(record)
+        except (OSError, ValueError):
+            skipped += 1
+            continue
+        migrated.append(path)
+
+    log.sync()
+    if remove:
+        for path in migrated:
+            path.unlink()
+    return len(migrated), skipped
+
+
+_logs: dict[Path, InteractionLog] = {}
+_logs_lock = threading.Lock()
+
+
+def interaction_log(path: Optional[Path] = None) -> InteractionLog:
+    """Retorna o log compartilhado pelo processo para o diretório (fechado no fim dele)"""
+    path = Path(path if path is not None else config.INTERACOES_PATH).resolve()
+    with _logs_lock:
+        log = _logs.get(path)
+        if log is None:
+            log = _logs[path] = InteractionLog(path)
+            atexit.register(log.close)
+        return log
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Migra as interações gravadas um arquivo .json por interação para o log segmentado"
+    )
+    parser.add_argument("origem", nargs="?", type=Path, default=config.INTERACOES_PATH)
+    parser.add_argument("--destino", type=Path, default=None, help="diretório do log (padrão: a origem)")
+    parser.add_argument("--manter", action="store_true", help="não apaga os arquivos migrados")
+    args = parser.parse_args()
+
+    destination = InteractionLog(args.destino or args.origem)
+    migrated, skipped = migrate(args.origem, destination, remove=not args.manter)
+    destination.close()
+    print(f"{migrated} interações migradas, {skipped} arquivos ignorados")
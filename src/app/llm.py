@@ -2,49 +2,420 @@
 Integração com Large Language Model
 """
 
-import json
+import asyncio
+import contextlib
+import time
+from collections import Counter
+from typing import AsyncIterator, Iterator, Optional
 
-from groq import Groq, GroqError
+import groq
+from groq import GroqError
 
 import config
-from exceptions import LLMError
+from cache import ResponseCache, prompt_hash
+from clients import registry
+from hedging import HedgedCaller
+from metrics import (
+    LLM_CASCADE,
+    LLM_PARSE_FAILURES,
+    LLM_PARSE_REPAIRS,
+    LLM_RETRIES,
+    LLM_ROUTES,
+    LLMCall,
+)
+from routing import ModelRouter, Route, is_confident
+from singleflight import SingleFlight
+from tools import ToolCallAccumulator, ToolSet, tool_calls_from_message
+from tokens import estimate_messages_tokens
+from parsing import (
+    REPAIR_FAILED,
+    REPAIR_PLAIN_TEXT,
+    IncrementalAnswerParser,
+    ParseResult,
+    extract_partial_answer,
+    parse_llm_json,
+)
+from exceptions import (
+    CircuitOpenError,
+    DeadlineExceededError,
+    LLMError,
+    LLMTimeoutError,
+    RateLimitError,
+)
+from resilience import (
+    CircuitBreaker,
+    Deadline,
+    RateLimiter,
+    RetryPolicy,
+    circuit_breaker_for,
+    deadline_kwargs,
+    rate_limiter_for,
+    retry_after_seconds,
+)
 
 
 class GroqProvider:
-    def __init__(self, model=config.GROQ_MODEL_NAME):
-        self.client = Groq(api_key=config.GROQ_API_KEY)
+    # Executa as chamadas de ferramenta pedidas pelo modelo (veja tools.py)
+    supports_tools = True
+    # Aceita o prazo do turno, que limita o timeout de cada chamada
+    supports_deadline = True
+
+    def __init__(
+        self,
+        model=config.GROQ_MODEL_NAME,
+        client=None,
+        rate_limiter: Optional[RateLimiter] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        max_tokens: Optional[int] = None
+    ):
+        # Por padrão usa o cliente compartilhado (pool de conexões do processo)
+        self.client = client or registry.get_client()
         self.model = model
+        self.max_tokens = max_tokens
+        self.rate_limiter = rate_limiter or rate_limiter_for(model)
+        self.retry_policy = retry_policy or RetryPolicy()
+        # Tokens informados pelo Groq na última chamada concluída
+        self.last_usage: Optional[dict] = None
+
+    def generate_answer(
+        self,
+        messages_propmt: list[dict],
+        tools: Optional[ToolSet] = None,
+        deadline: Optional[Deadline] = None
+    ) -> str:
+        """
+        Gera a resposta completa.
+
+        Com `tools`, o modelo pode pedir ferramentas: elas são executadas
+        localmente e o resultado volta ao modelo, por até
+        config.LLM_TOOLS_MAX_ROUNDS rodadas antes da resposta final.
+
+        Com `deadline` (prazo do turno), nenhuma chamada passa dele.
+        """
+        messages = list(messages_propmt)
+        for round_ in range(config.LLM_TOOLS_MAX_ROUNDS + 1):
+            with LLMCall(self.model) as call:
+                resp = self._create(messages, deadline, **tool_request(tools, round_))
+                self.last_usage = call.set_usage(getattr(resp, "usage", None))
+            message = resp.choices[0].message
+            calls = tool_calls_from_message(message) if tools is not None else []
+            if not calls:
+                return (message.content or "").strip()
+            messages += tools.tool_messages(calls, message.content)
+
+    def stream_answer(
+        self,
+        messages_propmt: list[dict],
+        tools: Optional[ToolSet] = None,
+        deadline: Optional[Deadline] = None
+    ) -> Iterator[str]:
+        """Gera a resposta em pedaços (tokens) à medida que chegam do Groq"""
+        messages = list(messages_propmt)
+        for round_ in range(config.LLM_TOOLS_MAX_ROUNDS + 1):
+            pending = ToolCallAccumulator()
+            with LLMCall(self.model, stream=True) as call:
+                stream = self._create(messages, deadline, stream=True, **tool_request(tools, round_))
+                try:
+                    for chunk in stream:
+                        usage = chunk_usage(chunk)
+                        if usage is not None:
+                            self.last_usage = call.set_usage(usage)
+                        if not chunk.choices:
+                            continue
+                        pending.add(getattr(chunk.choices[0].delta, "tool_calls", None))
+                        delta = chunk.choices[0].delta.content
+                        if delta:
+                            yield delta
+
+                except GroqError as e:
+                    raise translate_groq_error(e)
+
+            calls = pending.calls() if tools is not None else []
+            if not calls:
+                return
+            messages += tools.tool_messages(calls)
+
+    def _create(self, messages_propmt: list[dict], turn_deadline: Optional[Deadline] = None, **kwargs):
+        """
+        Chama a API respeitando o limitador de taxa e com retentativas.
+
+        Todas as tentativas (e esperas) cabem em config.GROQ_LLM_TIMEOUT e
+        no que resta do prazo do turno, se houver.
+        No streaming só a abertura do stream é retentada.
+        """
+        deadline = call_deadline(turn_deadline)
+        if self.max_tokens is not None:
+            kwargs.setdefault("max_tokens", self.max_tokens)
+        time.sleep(self.rate_limiter.acquire(estimate_messages_tokens(messages_propmt), deadline))
+
+        attempt = 0
+        while True:
+            try:
+                return self.client.chat.completions.create(
+                    model=self.model,
+                    messages=messages_propmt,
+                    timeout=deadline.remaining(),
+                    **kwargs
+                )
+            except GroqError as e:
+                delay = retry_delay(self.retry_policy, e, attempt, deadline)
+                if delay is None:
+                    raise translate_groq_error(e)
+                LLM_RETRIES.inc(model=self.model)
+                time.sleep(delay)
+                attempt += 1
+
+
+class AsyncGroqProvider:
+    """Provider assíncrono do Groq: não prende uma thread durante o I/O de rede"""
+
+    supports_tools = True
+    supports_deadline = True
+
+    def __init__(
+        self,
+        model=config.GROQ_MODEL_NAME,
+        client=None,
+        rate_limiter: Optional[RateLimiter] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        max_tokens: Optional[int] = None
+    ):
+        self.client = client or registry.get_async_client()
+        self.model = model
+        self.max_tokens = max_tokens
+        self.rate_limiter = rate_limiter or rate_limiter_for(model)
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.last_usage: Optional[dict] = None
+
+    async def generate_answer(
+        self,
+        messages_propmt: list[dict],
+        tools: Optional[ToolSet] = None,
+        deadline: Optional[Deadline] = None
+    ) -> str:
+        """Versão assíncrona de GroqProvider.generate_answer"""
+        messages = list(messages_propmt)
+        for round_ in range(config.LLM_TOOLS_MAX_ROUNDS + 1):
+            with LLMCall(self.model) as call:
+                resp = await self._create(messages, deadline, **tool_request(tools, round_))
+                self.last_usage = call.set_usage(getattr(resp, "usage", None))
+            message = resp.choices[0].message
+            calls = tool_calls_from_message(message) if tools is not None else []
+            if not calls:
+                return (message.content or "").strip()
+            messages += tools.tool_messages(calls, message.content)
+
+    async def stream_answer(
+        self,
+        messages_propmt: list[dict],
+        tools: Optional[ToolSet] = None,
+        deadline: Optional[Deadline] = None
+    ) -> AsyncIterator[str]:
+        """Versão assíncrona de GroqProvider.stream_answer"""
+        messages = list(messages_propmt)
+        for round_ in range(config.LLM_TOOLS_MAX_ROUNDS + 1):
+            pending = ToolCallAccumulator()
+            with LLMCall(self.model, stream=True) as call:
+                stream = await self._create(messages, deadline, stream=True, **tool_request(tools, round_))
+                try:
+                    async for chunk in stream:
+                        usage = chunk_usage(chunk)
+                        if usage is not None:
+                            self.last_usage = call.set_usage(usage)
+                        if not chunk.choices:
+                            continue
+                        pending.add(getattr(chunk.choices[0].delta, "tool_calls", None))
+                        delta = chunk.choices[0].delta.content
+                        if delta:
+                            yield delta
+
+                except GroqError as e:
+                    raise translate_groq_error(e)
+
+            calls = pending.calls() if tools is not None else []
+            if not calls:
+                return
+            messages += tools.tool_messages(calls)
+
+    async def _create(self, messages_propmt: list[dict], turn_deadline: Optional[Deadline] = None, **kwargs):
+        """Versão assíncrona de GroqProvider._create"""
+        deadline = call_deadline(turn_deadline)
+        if self.max_tokens is not None:
+            kwargs.setdefault("max_tokens", self.max_tokens)
+        await asyncio.sleep(self.rate_limiter.acquire(estimate_messages_tokens(messages_propmt), deadline))
+
+        attempt = 0
+        while True:
+            try:
+                return await self.client.chat.completions.create(
+                    model=self.model,
+                    messages=messages_propmt,
+                    timeout=deadline.remaining(),
+                    **kwargs
+                )
+            except GroqError as e:
+                delay = retry_delay(self.retry_policy, e, attempt, deadline)
+                if delay is None:
+                    raise translate_groq_error(e)
+                LLM_RETRIES.inc(model=self.model)
+                await asyncio.sleep(delay)
+                attempt += 1
 
-    def generate_answer(self, messages_propmt: list[dict]) -> str:
-        try:
-            resp = self.client.chat.completions.create(
-                model=self.model,
-                messages=messages_propmt,
-                timeout=config.GROQ_LLM_TIMEOUT,
-            )
-            response = resp.choices[0].message.content.strip()
-            return response
 
-        except GroqError as e:
-            if "rate limit" in str(e).lower():
-                raise LLMError("Rate limit atingido. Aguarde alguns minutos e tente novamente.")
-            elif "authentication" in str(e).lower():
-                raise LLMError("API key inválida.")
-            else:
-                raise LLMError(f"Erro Groq: {e}")
+RETRYABLE_ERRORS = (
+    groq.RateLimitError,
+    groq.APIConnectionError,
+    groq.InternalServerError,
+)
+
+
+def retry_delay(
+    policy: RetryPolicy,
+    error: GroqError,
+    attempt: int,
+    deadline: Deadline
+) -> Optional[float]:
+    """Retorna a espera antes de retentar, ou None se o erro não deve ser retentado"""
+    if not isinstance(error, RETRYABLE_ERRORS):
+        return None
+    response = getattr(error, "response", None)
+    retry_after = retry_after_seconds(getattr(response, "headers", None))
+    return policy.next_delay(attempt, deadline, retry_after)
+
+
+def call_deadline(turn_deadline: Optional[Deadline]) -> Deadline:
+    """
+    Prazo de uma chamada ao Groq: config.GROQ_LLM_TIMEOUT, limitado ao que
+    resta do turno.
+
+    Raises:
+        DeadlineExceededError: Se o turno já não tiver tempo para a chamada
+    """
+    if turn_deadline is None:
+        return Deadline(config.GROQ_LLM_TIMEOUT)
+    if turn_deadline.expired():
+        raise DeadlineExceededError("Tempo limite de resposta do LLM esgotado.")
+    return turn_deadline.cap(config.GROQ_LLM_TIMEOUT)
+
+
+def tool_request(tools: Optional[ToolSet], round_: int) -> dict:
+    """Oferece as ferramentas até a última rodada, que fica sem elas e força o texto final"""
+    if tools is None or round_ >= config.LLM_TOOLS_MAX_ROUNDS:
+        return {}
+    return tools.request_kwargs()
+
+
+def chunk_usage(chunk):
+    """Tokens do stream: o Groq informa o uso no último pedaço (em usage ou x_groq.usage)"""
+    usage = getattr(chunk, "usage", None)
+    if usage is None:
+        usage = getattr(getattr(chunk, "x_groq", None), "usage", None)
+    return usage
+
+
+def translate_groq_error(error: GroqError) -> LLMError:
+    """Converte erros do SDK do Groq em LLMError com mensagem amigável"""
+    if isinstance(error, groq.RateLimitError):
+        return RateLimitError("Rate limit atingido. Aguarde alguns minutos e tente novamente.")
+    elif isinstance(error, groq.AuthenticationError):
+        return LLMError("API key inválida.")
+    elif isinstance(error, groq.APITimeoutError):
+        return LLMTimeoutError("Tempo limite de resposta do LLM esgotado.")
+    else:
+        return LLMError(f"Erro Groq: {error}")
+
+
+def tool_kwargs(provider, tools: Optional[ToolSet]) -> dict:
+    """Repassa as ferramentas só a providers com suporte a function calling"""
+    if tools is None or not getattr(provider, "supports_tools", False):
+        return {}
+    return {"tools": tools}
+
+
+def _has_text(value) -> bool:
+    return isinstance(value, str) and bool(value.strip())
 
 
 class LLMManager:
     """Gerenciador de interações com LLM"""
 
-    def __init__(self, provider=None):
+    def __init__(
+        self,
+        provider=None,
+        async_provider=None,
+        cache: Optional[ResponseCache] = None,
+        providers: Optional[list] = None,
+        async_providers: Optional[list] = None,
+        router: Optional[ModelRouter] = None,
+        breaker: Optional[CircuitBreaker] = None
+    ):
+        """
+        Args:
+            provider: Provider síncrono (padrão: GroqProvider)
+            async_provider: Provider assíncrono. Se omitido junto com o
+                provider, usa AsyncGroqProvider; caso contrário as chamadas
+                assíncronas executam o provider síncrono em uma thread
+            cache: Cache de respostas (padrão: definido por config.LLM_CACHE_*)
+            providers: Lista ordenada de providers para hedge/failover; o
+                primeiro é o primário (substitui `provider`)
+            async_providers: Lista equivalente para as chamadas assíncronas
+            router: Roteador de modelos por tipo de chamada (padrão: criado
+                por config.LLM_ROUTING_ENABLED quando os providers são os do Groq)
+            breaker: Circuit breaker das chamadas ao provedor (padrão: o do
+                Groq, compartilhado pelo processo, com config.LLM_BREAKER_ENABLED)
+        """
+        if providers:
+            provider = providers[0]
+        if async_providers:
+            async_provider = async_providers[0]
+
         if provider is None:
+            if breaker is None and config.LLM_BREAKER_ENABLED:
+                breaker = circuit_breaker_for("groq")
+            if router is None and config.LLM_ROUTING_ENABLED:
+                router = ModelRouter(
+                    provider_factory=lambda model, max_tokens: GroqProvider(
+                        model=model, max_tokens=max_tokens
+                    ),
+                    async_provider_factory=lambda model, max_tokens: AsyncGroqProvider(
+                        model=model, max_tokens=max_tokens
+                    ),
+                )
             provider = GroqProvider()
+            if async_provider is None:
+                async_provider = AsyncGroqProvider(model=provider.model)
+            if providers is None:
+                providers = [provider] + [
+                    GroqProvider(model=model) for model in config.GROQ_FALLBACK_MODELS
+                ]
+                async_providers = [async_provider] + [
+                    AsyncGroqProvider(model=model) for model in config.GROQ_FALLBACK_MODELS
+                ]
+        if cache is None and config.LLM_CACHE_ENABLED:
+            cache = ResponseCache(
+                disk_path=config.LLM_CACHE_PATH if config.LLM_CACHE_DISK else None
+            )
         self.provider = provider
+        self.async_provider = async_provider
+        self.router = router
+        self.breaker = breaker
+        self.cache = cache
+        self.singleflight = SingleFlight() if config.LLM_SINGLEFLIGHT_ENABLED else None
+        self.parse_repairs: Counter = Counter()
+
+        # Com mais de um provider, as chamadas passam pelo hedge/failover
+        self.hedger = HedgedCaller(providers) if providers and len(providers) > 1 else None
+        self.async_hedger = (
+            HedgedCaller(async_providers)
+            if async_providers and len(async_providers) > 1 else None
+        )
 
     def generate_answer(
         self,
-        messages_prompt: list[dict]
+        messages_prompt: list[dict],
+        route: Optional[str] = None,
+        tools: Optional[ToolSet] = None,
+        deadline: Optional[Deadline] = None
     ) -> dict:
         """
         Gera resposta baseada em fatos permitidos.
@@ -52,6 +423,13 @@ class LLMManager:
         Args:
             mensagem_usuario: Mensagem do usuário
             fatos_permitidos: Set de fatos confirmados
+            route: Tipo de chamada (routing.ROUTE_*); define modelo e
+                max_tokens quando há roteador. None usa o provider padrão
+            tools: Ferramentas que o modelo pode chamar (ex.:
+                calculations.CALCULATION_TOOLS); ignoradas por providers
+                sem suporte a function calling
+            deadline: Prazo do turno; o timeout das chamadas ao provider
+                encolhe para caber nele
 
         Returns:
             Resposta gerada pelo LLM
@@ -59,30 +437,441 @@ class LLMManager:
         Raises:
             LLMError: Se houver erro na geração
         """
+        target = self._resolve_route(route)
+        key = self._prompt_key(messages_prompt, target, tools)
+        cached = self._cache_get(key)
+        if cached is not None:
+            return cached
+
+        if target is not None and target.cascade_model:
+            answer = self._try_small_model(messages_prompt, key, target, tools, deadline)
+            if answer is not None:
+                return answer
+            target = target.escalated()
+
         try:
-            answer = self.provider.generate_answer(messages_prompt)
-            json_answer = json.loads(answer)
+            answer = self._call_provider(messages_prompt, key, target, tools, deadline)
+        except CircuitOpenError as e:
+            return self._degraded_answer(e)
         except LLMError as e:
             return {
-                "resposta": str(e)
+                "resposta": str(e),
+                "error": True
             }
-        except json.JSONDecodeError:
-            try:
-                response, json_answer = answer.split('{', 1)
-                json_answer = json.loads("{" + json_answer)
-                json_answer['resposta'] = response
-            except ValueError:
-                return {
-                    "resposta": (
-                        "Erro ao se comunicar com o servidor. Por favor, aguarde e tente novamente mais tarde."
-                    )
-                }
+        return self._store_answer(key, parse_llm_json(answer))
+
+    def stream_answer(
+        self,
+        messages_prompt: list[dict],
+        route: Optional[str] = None,
+        tools: Optional[ToolSet] = None,
+        deadline: Optional[Deadline] = None
+    ) -> Iterator[dict]:
+        """
+        Gera resposta em modo streaming.
+
+        Enquanto o stream chega, produz dicionários parciais contendo apenas
+        o texto de "resposta" já recebido. O último item produzido é a
+        resposta completa, já parseada (incluindo "dados_extraidos").
+
+        Com cascata, a tentativa no modelo pequeno não é transmitida: só a
+        resposta aceita (ou o stream do modelo maior, na escalada) chega ao
+        usuário.
+
+        Args:
+            messages_prompt: Mensagens do prompt
+            route: Tipo de chamada (veja generate_answer)
+            tools: Ferramentas que o modelo pode chamar (veja generate_answer)
+            deadline: Prazo do turno (veja generate_answer)
+
+        Yields:
+            Dicionários com a resposta parcial e, por último, a completa
+        """
+        target = self._resolve_route(route, count=False)
+        if not hasattr(self._route_provider(target), "stream_answer"):
+            yield self.generate_answer(messages_prompt, route=route, tools=tools, deadline=deadline)
+            return
+        if target is not None:
+            LLM_ROUTES.inc(route=target.name, model=target.model)
+
+        key = self._prompt_key(messages_prompt, target, tools)
+        cached = self._cache_get(key)
+        if cached is not None:
+            yield cached
+            return
+
+        if target is not None and target.cascade_model:
+            answer = self._try_small_model(messages_prompt, key, target, tools, deadline)
+            if answer is not None:
+                yield answer
+                return
+            target = target.escalated()
+
+        parser = IncrementalAnswerParser()
+        last_partial = None
+        try:
+            provider = self._route_provider(target)
+            with self._guard():
+                for chunk in provider.stream_answer(
+                    messages_prompt, **tool_kwargs(provider, tools), **deadline_kwargs(provider, deadline)
+                ):
+                    partial = parser.feed(chunk)
+                    if partial and partial != last_partial:
+                        last_partial = partial
+                        yield {"resposta": partial}
+        except CircuitOpenError as e:
+            yield self._degraded_answer(e)
+            return
+        except LLMError as e:
+            yield {
+                "resposta": str(e),
+                "error": True
+            }
+            return
+
+        yield self._store_answer(key, parser.finish())
+
+    async def agenerate_answer(
+        self,
+        messages_prompt: list[dict],
+        route: Optional[str] = None,
+        tools: Optional[ToolSet] = None,
+        deadline: Optional[Deadline] = None
+    ) -> dict:
+        """Versão assíncrona de generate_answer"""
+        target = self._resolve_route(route)
+        key = self._prompt_key(messages_prompt, target, tools)
+        cached = self._cache_get(key)
+        if cached is not None:
+            return cached
+
+        if target is not None and target.cascade_model:
+            answer = await self._atry_small_model(messages_prompt, key, target, tools, deadline)
+            if answer is not None:
+                return answer
+            target = target.escalated()
+
+        try:
+            answer = await self._acall_provider(messages_prompt, key, target, tools, deadline)
+        except CircuitOpenError as e:
+            return self._degraded_answer(e)
+        except LLMError as e:
+            return {
+                "resposta": str(e),
+                "error": True
+            }
+        return self._store_answer(key, parse_llm_json(answer))
+
+    async def astream_answer(
+        self,
+        messages_prompt: list[dict],
+        route: Optional[str] = None,
+        tools: Optional[ToolSet] = None,
+        deadline: Optional[Deadline] = None
+    ) -> AsyncIterator[dict]:
+        """Versão assíncrona de stream_answer"""
+        target = self._resolve_route(route, count=False)
+        if not hasattr(self._aroute_provider(target), "stream_answer"):
+            yield await self.agenerate_answer(messages_prompt, route=route, tools=tools, deadline=deadline)
+            return
+        if target is not None:
+            LLM_ROUTES.inc(route=target.name, model=target.model)
+
+        key = self._prompt_key(messages_prompt, target, tools)
+        cached = self._cache_get(key)
+        if cached is not None:
+            yield cached
+            return
+
+        if target is not None and target.cascade_model:
+            answer = await self._atry_small_model(messages_prompt, key, target, tools, deadline)
+            if answer is not None:
+                yield answer
+                return
+            target = target.escalated()
+
+        parser = IncrementalAnswerParser()
+        last_partial = None
+        try:
+            provider = self._aroute_provider(target)
+            with self._guard():
+                async for chunk in provider.stream_answer(
+                    messages_prompt, **tool_kwargs(provider, tools), **deadline_kwargs(provider, deadline)
+                ):
+                    partial = parser.feed(chunk)
+                    if partial and partial != last_partial:
+                        last_partial = partial
+                        yield {"resposta": partial}
+        except CircuitOpenError as e:
+            yield self._degraded_answer(e)
+            return
+        except LLMError as e:
+            yield {
+                "resposta": str(e),
+                "error": True
+            }
+            return
+
+        yield self._store_answer(key, parser.finish())
+
+    def _resolve_route(self, route: Optional[str], count: bool = True) -> Optional[Route]:
+        """Rota da chamada, ou None quando não há roteador (provider padrão)"""
+        if self.router is None:
+            return None
+        target = self.router.route(route)
+        if target is not None and count:
+            LLM_ROUTES.inc(route=target.name, model=target.model)
+        return target
+
+    def _route_provider(self, target: Optional[Route]):
+        if target is None:
+            return self.provider
+        return self.router.provider(target.model, target.max_tokens)
+
+    def _aroute_provider(self, target: Optional[Route]):
+        if target is None:
+            return self.async_provider
+        return self.router.async_provider(target.model, target.max_tokens)
+
+    def _try_small_model(
+        self,
+        messages_prompt: list[dict],
+        key: str,
+        target: Route,
+        tools: Optional[ToolSet] = None,
+        deadline: Optional[Deadline] = None
+    ) -> Optional[dict]:
+        """
+        Primeira etapa da cascata: aceita a resposta do modelo pequeno se
+        ela passar em is_confident.
+
+        Returns:
+            Resposta aceita, ou None para escalar ao modelo maior
+        """
+        try:
+            result = parse_llm_json(self._call_provider(messages_prompt, key, target, tools, deadline))
+        except LLMError:
+            result = None
+        return self._cascade_outcome(key, target, result)
+
+    async def _atry_small_model(
+        self,
+        messages_prompt: list[dict],
+        key: str,
+        target: Route,
+        tools: Optional[ToolSet] = None,
+        deadline: Optional[Deadline] = None
+    ) -> Optional[dict]:
+        """Versão assíncrona de _try_small_model"""
+        try:
+            result = parse_llm_json(await self._acall_provider(messages_prompt, key, target, tools, deadline))
+        except LLMError:
+            result = None
+        return self._cascade_outcome(key, target, result)
+
+    def _cascade_outcome(self, key: str, target: Route, result: Optional[ParseResult]) -> Optional[dict]:
+        if result is not None and is_confident(result):
+            LLM_CASCADE.inc(route=target.name, outcome="accepted")
+            return self._store_answer(key, result)
+        LLM_CASCADE.inc(route=target.name, outcome="escalated")
+        return None
+
+    def _call_provider(
+        self,
+        messages_prompt: list[dict],
+        key: str,
+        target: Optional[Route] = None,
+        tools: Optional[ToolSet] = None,
+        deadline: Optional[Deadline] = None
+    ) -> str:
+        """Chama o provider; prompts idênticos em andamento compartilham a chamada"""
+        # O modelo entra na chave: na cascata, pequeno e grande são chamadas distintas
+        flight_key = f"{key}:{target.model}" if target is not None else key
+        if self.singleflight is None:
+            return self._call_upstream(messages_prompt, target, tools, deadline)
+        return self.singleflight.do(
+            flight_key, lambda: self._call_upstream(messages_prompt, target, tools, deadline)
+        )
+
+    async def _acall_provider(
+        self,
+        messages_prompt: list[dict],
+        key: str,
+        target: Optional[Route] = None,
+        tools: Optional[ToolSet] = None,
+        deadline: Optional[Deadline] = None
+    ) -> str:
+        flight_key = f"{key}:{target.model}" if target is not None else key
+        if self.singleflight is None:
+            return await self._acall_upstream(messages_prompt, target, tools, deadline)
+        return await self.singleflight.ado(
+            flight_key, lambda: self._acall_upstream(messages_prompt, target, tools, deadline)
+        )
+
+    def _guard(self):
+        """Contexto do circuit breaker (nulo quando não há breaker)"""
+        if self.breaker is None:
+            return contextlib.nullcontext()
+        return self.breaker.guard()
+
+    def _call_upstream(
+        self,
+        messages_prompt: list[dict],
+        target: Optional[Route] = None,
+        tools: Optional[ToolSet] = None,
+        deadline: Optional[Deadline] = None
+    ) -> str:
+        with self._guard():
+            return self._call_upstream_unguarded(messages_prompt, target, tools, deadline)
+
+    async def _acall_upstream(
+        self,
+        messages_prompt: list[dict],
+        target: Optional[Route] = None,
+        tools: Optional[ToolSet] = None,
+        deadline: Optional[Deadline] = None
+    ) -> str:
+        with self._guard():
+            return await self._acall_upstream_unguarded(messages_prompt, target, tools, deadline)
+
+    def _call_upstream_unguarded(
+        self,
+        messages_prompt: list[dict],
+        target: Optional[Route] = None,
+        tools: Optional[ToolSet] = None,
+        deadline: Optional[Deadline] = None
+    ) -> str:
+        # Rotas e chamadas com ferramentas vão direto ao provider, sem hedge
+        provider = self._route_provider(target)
+        kwargs = tool_kwargs(provider, tools)
+        if target is not None or kwargs:
+            return provider.generate_answer(messages_prompt, **kwargs, **deadline_kwargs(provider, deadline))
+        if self.hedger is not None:
+            return self.hedger.call(messages_prompt, deadline)
+        return self.provider.generate_answer(messages_prompt, **deadline_kwargs(self.provider, deadline))
+
+    async def _acall_upstream_unguarded(
+        self,
+        messages_prompt: list[dict],
+        target: Optional[Route] = None,
+        tools: Optional[ToolSet] = None,
+        deadline: Optional[Deadline] = None
+    ) -> str:
+        provider = self._aroute_provider(target)
+        if provider is not None:
+            kwargs = tool_kwargs(provider, tools)
+            if target is not None or kwargs:
+                return await provider.generate_answer(
+                    messages_prompt, **kwargs, **deadline_kwargs(provider, deadline)
+                )
+        else:
+            sync_provider = self._route_provider(target)
+            kwargs = tool_kwargs(sync_provider, tools)
+            if target is not None or kwargs:
+                return await asyncio.to_thread(
+                    sync_provider.generate_answer,
+                    messages_prompt,
+                    **kwargs,
+                    **deadline_kwargs(sync_provider, deadline)
+                )
+        if self.async_hedger is not None:
+            return await self.async_hedger.acall(messages_prompt, deadline)
+        if self.async_provider is not None:
+            return await self.async_provider.generate_answer(
+                messages_prompt, **deadline_kwargs(self.async_provider, deadline)
+            )
+        if self.hedger is not None:
+            return await asyncio.to_thread(self.hedger.call, messages_prompt, deadline)
+        return await asyncio.to_thread(
+            self.provider.generate_answer, messages_prompt, **deadline_kwargs(self.provider, deadline)
+        )
+
+    def hedge_stats(self) -> dict:
+        """Retorna as estatísticas de hedge/failover (vazio com um só provider)"""
+        if self.hedger is None:
+            return {}
+        return self.hedger.stats()
+
+    def cache_stats(self) -> dict:
+        """Retorna as estatísticas do cache de respostas"""
+        if self.cache is None:
+            return {}
+        return self.cache.stats()
+
+    def singleflight_stats(self) -> dict:
+        """Retorna quantas chamadas foram coalescidas pelo single-flight"""
+        if self.singleflight is None:
+            return {}
+        return self.singleflight.stats()
+
+    def _prompt_key(
+        self,
+        messages_prompt: list[dict],
+        target: Optional[Route] = None,
+        tools: Optional[ToolSet] = None
+    ) -> str:
+        model = target.model if target is not None else getattr(self.provider, "model", None)
+        if tools is not None:
+            model = f"{model}+tools:{','.join(tools.names)}"
+        return prompt_hash(messages_prompt, model)
+
+    def _cache_get(self, key: str) -> Optional[dict]:
+        if self.cache is None:
+            return None
+        return self.cache.get(key)
+
+    def parse_stats(self) -> dict:
+        """Retorna quantas respostas passaram por cada caminho de reparo do parser"""
+        return dict(self.parse_repairs)
+
+    def _store_answer(self, key: str, result: ParseResult) -> dict:
+        """Contabiliza o parse e guarda no cache apenas respostas estruturadas"""
+        self.parse_repairs[result.repair] += 1
+        LLM_PARSE_REPAIRS.inc(repair=result.repair)
+        if result.repair in (REPAIR_PLAIN_TEXT, REPAIR_FAILED):
+            LLM_PARSE_FAILURES.inc()
+        if not result.ok:
+            return self._error_answer()
+
+        json_answer = result.data
+        if (
+            self.cache is not None
+            and result.repair != REPAIR_PLAIN_TEXT
+            and _has_text(json_answer.get('resposta'))
+        ):
+            self.cache.set(key, json_answer)
+        return self._validate_answer(json_answer)
+
+    def _validate_answer(self, json_answer: dict) -> dict:
         # Validação básica da resposta
-        if not json_answer['resposta'] or len(json_answer['resposta'].strip()) == 0:
+        if not _has_text(json_answer.get('resposta')):
             json_answer['resposta'] = self._default_answer()
 
         return json_answer
 
+    def breaker_stats(self) -> dict:
+        """Retorna o estado do circuit breaker (vazio sem breaker)"""
+        if self.breaker is None:
+            return {}
+        return self.breaker.stats()
+
+    def _degraded_answer(self, error: CircuitOpenError) -> dict:
+        """
+        Resposta imediata com o circuito aberto. "degraded" avisa quem chamou
+        (o agente) que pode trocá-la por uma resposta local.
+        """
+        return {
+            "resposta": str(error),
+            "degraded": True
+        }
+
+    def _error_answer(self) -> dict:
+        return {
+            "resposta": (
+                "Erro ao se comunicar com o servidor. Por favor, aguarde e tente novamente mais tarde."
+            )
+        }
+
     def _default_answer(self) -> str:
         """Retorna resposta padrão em caso de erro"""
         return (
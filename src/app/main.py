@@ -1,11 +1,33 @@
 from dotenv import load_dotenv
 load_dotenv()
 
+import asyncio
+import atexit
+import threading
+from typing import Optional
+
 import gradio as gr
 
-from agent import FinancialAgent
+import config
+from clients import registry
+from metrics import start_metrics_server
+from sessions import AgentPool
+
+# Um agente por sessão do navegador (perfil e estado separados)
+pool = AgentPool()
+atexit.register(pool.close)
+
+if config.GROQ_WARMUP:
+    # Abre a conexão com o Groq em paralelo à montagem da interface
+    threading.Thread(target=registry.warm_up, daemon=True).start()
 
-agent = FinancialAgent()
+# O pool do AsyncGroq (usado pela interface) só pode ser aquecido no loop do
+# servidor: é feito uma vez, na primeira sessão aberta
+_async_warmup: Optional[asyncio.Task] = None
+
+if config.METRICS_ENABLED:
+    # Endpoint /metrics (formato Prometheus) ao lado da interface Gradio
+    start_metrics_server()
 
 
 def render_user_data(show: bool, user: dict):
@@ -53,25 +75,43 @@ def render_user_data(show: bool, user: dict):
     )
 
 
-def chat_handler(message, history, user_state):
-    llm_answer = agent.process_message(
+async def start_session(request: gr.Request):
+    global _async_warmup
+    if config.GROQ_WARMUP and _async_warmup is None:
+        _async_warmup = asyncio.create_task(registry.awarm_up())
+    agent = pool.get(request.session_hash)
+    welcome = [{"role": "assistant", "content": agent.welcome_message()}]
+    return welcome, agent.user.copy()
+
+
+async def chat_handler(message, history, user_state, request: gr.Request):
+    session_id = request.session_hash
+    agent = pool.get(session_id)
+    if not config.LLM_STREAMING:
+        llm_answer = await agent.aprocess_message(
+            user_message=message,
+            history=history,
+        )
+        pool.account(session_id)
+        yield llm_answer, agent.user.copy()
+        return
+
+    llm_answer = ""
+    async for llm_answer in agent.astream_message(
         user_message=message,
         history=history,
-    )
-    return llm_answer, agent.user.copy()
+    ):
+        yield llm_answer, user_state
+    pool.account(session_id)
+    # dados extraídos só ficam disponíveis ao final do stream
+    yield llm_answer, agent.user.copy()
 
 
 # Interface Gradio
 with gr.Blocks(title="Assessor Financeiro Pessoal") as app:
-    user_state = gr.State(agent.user)
-
-    chatbot = gr.Chatbot(
-        height=400,
-        value=[{
-                "role": "assistant",
-                "content": agent.welcome_message()
-            }]
-    )
+    user_state = gr.State({})
+
+    chatbot = gr.Chatbot(height=400)
     msg = gr.Textbox(
         label="Mensagem",
         placeholder="Ex: minha renda mensal agora é 6500 reais",
@@ -107,6 +147,9 @@ with gr.Blocks(title="Assessor Financeiro Pessoal") as app:
             outputs=(toggle_data_state, user_state, user_data_box, toggle_data),
         )
 
+    # Cada aba abre a própria sessão, com a boas-vindas do perfil dela
+    app.load(fn=start_session, outputs=(chatbot, user_state))
+
 if __name__ == "__main__":
     app.launch(
         server_name="0.0.0.0",
@@ -0,0 +1,482 @@
+"""
+Métricas de uso do LLM no formato de texto do Prometheus
+"""
+import asyncio
+import threading
+import time
+import uuid
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+import config
+
+# Limites (em segundos) dos buckets de latência
+DEFAULT_BUCKETS = (0.1, 0.25, 0.5, 1.0, 1.5, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _label_key(labelnames: tuple, labels: dict) -> tuple:
+    if set(labels) != set(labelnames):
+        raise ValueError(f"Labels esperados: {labelnames}, recebidos: {tuple(labels)}")
+    return tuple(str(labels[name]) for name in labelnames)
+
+
+def _format_labels(labelnames: tuple, values: tuple, extra: Optional[dict] = None) -> str:
+    pairs = list(zip(labelnames, values)) + list((extra or {}).items())
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Counter:
+    """Contador monotônico com labels"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        if amount < 0:
+            raise ValueError("Contadores só podem aumentar")
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            return self._values.get(key, 0)
+
+    def snapshot(self) -> dict:
+        """Valores por combinação de labels"""
+        with self._lock:
+            return {self._snapshot_key(key): value for key, value in self._values.items()}
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in items
+        ]
+
+    def _snapshot_key(self, key: tuple):
+        # Sem labels a chave é "", com um label é o próprio valor
+        if len(key) <= 1:
+            return key[0] if key else ""
+        return key
+
+
+class Gauge(Counter):
+    """Valor que sobe e desce (sessões abertas, bytes em memória...)"""
+
+    kind = "gauge"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels) -> None:
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(Counter):
+    """Histograma com buckets cumulativos, soma e contagem por labels"""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple = (),
+        buckets: tuple = DEFAULT_BUCKETS
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        raise TypeError("Use observe em histogramas")
+
+    def observe(self, value: float, **labels) -> None:
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {
+                    "buckets": [0] * len(self.buckets),
+                    "sum": 0.0,
+                    "count": 0,
+                }
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state["buckets"][i] += 1
+            state["sum"] += value
+            state["count"] += 1
+
+    def value(self, **labels) -> dict:
+        """Contagem e soma das observações para os labels"""
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                return {"count": 0, "sum": 0.0}
+            return {"count": state["count"], "sum": state["sum"]}
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                self._snapshot_key(key): {"count": state["count"], "sum": state["sum"]}
+                for key, state in self._values.items()
+            }
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = sorted(
+                (key, list(state["buckets"]), state["sum"], state["count"])
+                for key, state in self._values.items()
+            )
+
+        lines = []
+        for key, buckets, total, count in items:
+            for bound, cumulative in zip(self.buckets, buckets):
+                labels = _format_labels(self.labelnames, key, {"le": _format_value(bound)})
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key, {"le": "+Inf"})
+            lines.append(f"{self.name}_bucket{labels} {count}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Registro das métricas do processo.
+
+    As métricas podem ser consultadas em memória (`snapshot`) ou expostas
+    no formato de texto do Prometheus (`render`). Pedir a mesma métrica duas
+    vezes devolve a mesma instância.
+    """
+
+    def __init__(self, recent_calls: int = config.METRICS_RECENT_CALLS):
+        """
+        Args:
+            recent_calls: Quantos registros de chamada individuais manter
+        """
+        self._metrics: dict[str, Counter] = {}
+        self._lock = threading.Lock()
+        self._calls: deque[dict] = deque(maxlen=recent_calls)
+
+    def counter(self, name: str, documentation: str, labelnames: tuple = ()) -> Counter:
+        return self._get_or_create(Counter, name, documentation, labelnames)
+
+    def gauge(self, name: str, documentation: str, labelnames: tuple = ()) -> Gauge:
+        return self._get_or_create(Gauge, name, documentation, labelnames)
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple = (),
+        buckets: tuple = DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self._get_or_create(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def record_call(self, record: dict) -> None:
+        """Guarda o registro de uma chamada individual (request_id, duração, tokens...)"""
+        with self._lock:
+            self._calls.append(record)
+
+    def recent_calls(self, limit: Optional[int] = None) -> list[dict]:
+        """Registros das chamadas mais recentes, da mais antiga para a mais nova"""
+        with self._lock:
+            calls = list(self._calls)
+        return calls[-limit:] if limit else calls
+
+    def snapshot(self) -> dict:
+        """Valores atuais de todas as métricas, por nome"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {metric.name: metric.snapshot() for metric in metrics}
+
+    def render(self) -> str:
+        """Todas as métricas no formato de texto do Prometheus"""
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def _get_or_create(self, cls, name, documentation, labelnames, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, documentation, tuple(labelnames), **kwargs)
+            elif type(metric) is not cls or metric.labelnames != tuple(labelnames):
+                raise ValueError(f"Métrica {name} já registrada com outro tipo ou labels")
+            return metric
+
+
+default_registry = MetricsRegistry()
+
+LLM_REQUESTS = default_registry.counter(
+    "llm_requests_total", "Chamadas ao provider de LLM por status", ("model", "status")
+)
+LLM_LATENCY = default_registry.histogram(
+    "llm_request_duration_seconds", "Duração das chamadas ao provider de LLM", ("model",)
+)
+LLM_TOKENS = default_registry.counter(
+    "llm_tokens_total", "Tokens informados pelo provider (prompt/completion/cached)", ("model", "kind")
+)
+LLM_ERRORS = default_registry.counter(
+    "llm_errors_total", "Erros nas chamadas ao LLM por tipo", ("model", "type")
+)
+LLM_RETRIES = default_registry.counter(
+    "llm_retries_total", "Retentativas de chamadas ao LLM", ("model",)
+)
+LLM_ROUTES = default_registry.counter(
+    "llm_routes_total", "Chamadas ao LLM por rota e modelo escolhido", ("route", "model")
+)
+LLM_CASCADE = default_registry.counter(
+    "llm_cascade_total", "Respostas do modelo pequeno aceitas ou escaladas", ("route", "outcome")
+)
+LLM_BREAKER_TRANSITIONS = default_registry.counter(
+    "llm_breaker_transitions_total", "Mudanças de estado do circuit breaker", ("breaker", "state")
+)
+LLM_BREAKER_REJECTED = default_registry.counter(
+    "llm_breaker_rejected_total", "Chamadas recusadas com o circuit breaker aberto", ("breaker",)
+)
+LLM_PARSE_REPAIRS = default_registry.counter(
+    "llm_parse_repairs_total", "Respostas do LLM por caminho de reparo do parser", ("repair",)
+)
+LLM_PARSE_FAILURES = default_registry.counter(
+    "llm_parse_failures_total", "Respostas do LLM sem JSON aproveitável", ()
+)
+PROMPT_ESTIMATED_TOKENS = default_registry.counter(
+    "prompt_estimated_tokens_total", "Tokens estimados dos prompts de resposta montados", ()
+)
+PROMPT_PREFIX_SHARED_TOKENS = default_registry.counter(
+    "prompt_prefix_shared_tokens_total", "Tokens estimados que repetem o prefixo do prompt anterior", ()
+)
+LLM_TOOL_CALLS = default_registry.counter(
+    "llm_tool_calls_total", "Ferramentas chamadas pelo LLM por nome e status", ("tool", "status")
+)
+TURN_DURATION = default_registry.histogram(
+    "turn_duration_seconds", "Duração dos turnos do agente, do início até a resposta completa", ()
+)
+TURN_DEADLINE_FALLBACKS = default_registry.counter(
+    "turn_deadline_fallbacks_total", "Etapas puladas ou adiadas por falta de prazo no turno", ("stage", "action")
+)
+HISTORY_SUMMARIES = default_registry.counter(
+    "history_summaries_total", "Compactações do histórico por resultado (reused/stale/folded/full)", ("result",)
+)
+HISTORY_SUMMARY_STALENESS = default_registry.histogram(
+    "history_summary_staleness_messages",
+    "Mensagens antigas ainda fora do resumo usado no turno",
+    (),
+    buckets=(0, 1, 2, 4, 8, 16, 32, 64),
+)
+COMPACTION_JOBS = default_registry.counter(
+    "compaction_jobs_total", "Compactações do histórico em segundo plano por status", ("status",)
+)
+COMPACTION_LAG = default_registry.histogram(
+    "compaction_lag_seconds", "Tempo entre agendar a compactação e o novo resumo ficar pronto", ()
+)
+SESSIONS_LIVE = default_registry.gauge(
+    "session_pool_sessions", "Sessões com agente em memória", ()
+)
+SESSIONS_BYTES = default_registry.gauge(
+    "session_pool_bytes", "Memória estimada do estado de todas as sessões em memória", ()
+)
+SESSION_BYTES = default_registry.histogram(
+    "session_pool_session_bytes",
+    "Memória estimada do estado de uma sessão ao fim de cada turno",
+    (),
+    buckets=(1_000, 5_000, 10_000, 50_000, 100_000, 500_000, 1_000_000, 5_000_000),
+)
+SESSION_EVICTIONS = default_registry.counter(
+    "session_pool_evictions_total", "Sessões tiradas da memória por motivo (lru/idle/shutdown)", ("reason",)
+)
+PERSISTENCE_QUEUE_DEPTH = default_registry.gauge(
+    "persistence_queue_depth", "Gravações em disco aguardando na fila write-behind", ()
+)
+PERSISTENCE_WRITES = default_registry.counter(
+    "persistence_writes_total", "Gravações em disco por tipo e status", ("kind", "status")
+)
+PERSISTENCE_COALESCED = default_registry.counter(
+    "persistence_coalesced_total", "Gravações substituídas por uma versão mais nova antes de ir ao disco", ("kind",)
+)
+PERSISTENCE_BACKPRESSURE = default_registry.counter(
+    "persistence_backpressure_total", "Vezes em que a fila cheia obrigou quem enfileirou a gravar na hora", ()
+)
+PERSISTENCE_FLUSH_DURATION = default_registry.histogram(
+    "persistence_flush_seconds", "Duração de cada esvaziamento da fila write-behind", ()
+)
+INTERACTION_LOG_RECORDS = default_registry.counter(
+    "interaction_log_records_total", "Interações gravadas no log segmentado por status", ("status",)
+)
+INTERACTION_LOG_SEGMENTS = default_registry.counter(
+    "interaction_log_segments_total", "Segmentos do log de interações por evento (opened/compressed/expired)", ("event",)
+)
+INTERACTION_LOG_FSYNCS = default_registry.counter(
+    "interaction_log_fsyncs_total", "Lotes do log de interações gravados em disco com fsync", ()
+)
+STORAGE_BATCHES = default_registry.histogram(
+    "storage_batch_size",
+    "Interações inseridas por transação no armazenamento SQLite",
+    (),
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128),
+)
+EXTRACTION_JOBS = default_registry.counter(
+    "extraction_jobs_total", "Extrações de dados feitas em segundo plano por status", ("status",)
+)
+EXTRACTION_LAG = default_registry.histogram(
+    "extraction_lag_seconds", "Tempo entre a resposta entregue e os dados extraídos salvos", ()
+)
+
+
+class LLMCall:
+    """
+    Instrumentação de uma chamada ao provider de LLM.
+
+    Usado como context manager em volta da chamada (ou de todo o consumo
+    do stream): mede a duração, lê os tokens informados pelo provider e
+    registra status e tipo do erro ao sair.
+    """
+
+    def __init__(self, model: str, stream: bool = False):
+        self.model = model
+        self.stream = stream
+        self.request_id = uuid.uuid4().hex
+        self.usage: Optional[dict] = None
+        self._start = 0.0
+
+    def set_usage(self, usage) -> Optional[dict]:
+        """
+        Registra o campo `usage` da resposta do provider.
+
+        Returns:
+            Dicionário com prompt_tokens/completion_tokens/total_tokens/cached_tokens,
+            ou None se o provider não informou
+        """
+        if usage is None:
+            return None
+        details = getattr(usage, "prompt_tokens_details", None)
+        self.usage = {
+            "prompt_tokens": getattr(usage, "prompt_tokens", None),
+            "completion_tokens": getattr(usage, "completion_tokens", None),
+            "total_tokens": getattr(usage, "total_tokens", None),
+            # Tokens do prompt servidos pelo cache de prefixo do provider
+            "cached_tokens": getattr(details, "cached_tokens", None),
+        }
+        return self.usage
+
+    def __enter__(self) -> "LLMCall":
+        self._start = time.monotonic()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        duration = time.monotonic() - self._start
+        if exc_type is None:
+            status = "ok"
+        elif issubclass(exc_type, (GeneratorExit, asyncio.CancelledError)):
+            status = "cancelled"
+        else:
+            status = "error"
+
+        LLM_REQUESTS.inc(model=self.model, status=status)
+        LLM_LATENCY.observe(duration, model=self.model)
+        if status == "error":
+            LLM_ERRORS.inc(model=self.model, type=exc_type.__name__)
+
+        usage = self.usage or {}
+        for kind in ("prompt", "completion", "cached"):
+            tokens = usage.get(f"{kind}_tokens")
+            if tokens:
+                LLM_TOKENS.inc(tokens, model=self.model, kind=kind)
+
+        default_registry.record_call({
+            "request_id": self.request_id,
+            "timestamp": time.time(),
+            "model": self.model,
+            "stream": self.stream,
+            "duration_ms": round(duration * 1000, 1),
+            "tokens_request": usage.get("prompt_tokens"),
+            "tokens_response": usage.get("completion_tokens"),
+            "tokens_cached": usage.get("cached_tokens"),
+            "status": status,
+            "error": exc_type.__name__ if status == "error" else None,
+        })
+        return False
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry: MetricsRegistry = default_registry
+
+    def do_GET(self):
+        if self.path.split("?", 1)[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        body = self.registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Sem log de acesso a cada coleta do Prometheus
+        pass
+
+
+def start_metrics_server(
+    port: int = config.METRICS_PORT,
+    host: str = config.METRICS_HOST,
+    registry: MetricsRegistry = default_registry
+) -> ThreadingHTTPServer:
+    """
+    Sobe o endpoint /metrics numa thread daemon.
+
+    Args:
+        port: Porta HTTP (0 escolhe uma porta livre)
+        host: Interface de escuta
+        registry: Registro a expor
+
+    Returns:
+        O servidor, para consultar a porta ou chamar shutdown()
+    """
+    handler = type("MetricsHandler", (_MetricsHandler,), {"registry": registry})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    return server
@@ -0,0 +1,311 @@
+"""
+Parser tolerante das respostas JSON do LLM
+"""
+import json
+import re
+from typing import Any, Optional
+
+# Caminhos de reparo, do mais limpo ao mais permissivo
+REPAIR_DIRECT = "direct"
+REPAIR_CODE_FENCE = "code_fence"
+REPAIR_EXTRACTED = "extracted"
+REPAIR_TRAILING_COMMA = "trailing_comma"
+REPAIR_TRUNCATED = "truncated"
+REPAIR_PLAIN_TEXT = "plain_text"
+REPAIR_FAILED = "failed"
+
+_CODE_FENCE = re.compile(r"```(?:json|JSON)?\s*(.*?)(?:```|$)", re.DOTALL)
+_ANSWER_KEY = re.compile(r'"resposta"\s*:\s*"')
+_OBJECT_START = re.compile(r'\{\s*"')
+_TRAILING_COMMA = re.compile(r",(\s*[}\]])")
+
+_MAX_TRUNCATION_CUTS = 20
+
+_ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+
+class ParseResult:
+    """Resultado do parse: o dicionário obtido e o caminho de reparo usado"""
+
+    def __init__(self, data: Optional[dict], repair: str):
+        self.data = data
+        self.repair = repair
+
+    @property
+    def ok(self) -> bool:
+        return self.data is not None
+
+    def __repr__(self) -> str:
+        return f"ParseResult(repair={self.repair!r}, data={self.data!r})"
+
+
+def parse_llm_json(text: str) -> ParseResult:
+    """
+    Extrai o objeto JSON de uma resposta do LLM, reparando o que for possível.
+
+    Aceita JSON puro, blocos ```json```, texto antes/depois do objeto,
+    vírgulas sobrando e saída truncada (fecha strings, listas e objetos).
+    Texto sem nenhum JSON vira a própria "resposta".
+
+    Args:
+        text: Texto bruto retornado pelo LLM
+
+    Returns:
+        ParseResult com os dados e o caminho de reparo usado
+    """
+    text = (text or "").strip()
+    if not text:
+        return ParseResult(None, REPAIR_FAILED)
+
+    data = _loads_dict(text)
+    if data is not None:
+        return ParseResult(data, REPAIR_DIRECT)
+
+    fence = _CODE_FENCE.search(text)
+    if fence:
+        data = _loads_dict(fence.group(1).strip())
+        if data is not None:
+            return ParseResult(data, REPAIR_CODE_FENCE)
+
+    start, end = _find_object(text)
+    if start is None:
+        return ParseResult({"resposta": text}, REPAIR_PLAIN_TEXT)
+
+    prose = text[:start].strip().strip("`").strip()
+    candidate = text[start:end] if end is not None else text[start:]
+
+    if end is not None:
+        for repair, fixed in (
+            (REPAIR_EXTRACTED, candidate),
+            (REPAIR_TRAILING_COMMA, _remove_trailing_commas(candidate)),
+        ):
+            data = _loads_dict(fixed)
+            if data is not None:
+                return ParseResult(_with_prose(data, prose), repair)
+
+    # Saída truncada: fecha o que ficou aberto; se ainda não for válido,
+    # descarta o último item incompleto (até a vírgula anterior) e tenta de novo
+    truncated = _remove_trailing_commas(candidate)
+    for _ in range(_MAX_TRUNCATION_CUTS):
+        data = _loads_dict(_close_truncated(truncated))
+        if data is not None:
+            return ParseResult(_with_prose(data, prose), REPAIR_TRUNCATED)
+        cut = truncated.rfind(",")
+        if cut <= 0:
+            break
+        truncated = truncated[:cut]
+
+    return ParseResult(None, REPAIR_FAILED)
+
+
+def extract_partial_answer(buffer: str) -> Optional[str]:
+    """
+    Extrai o valor (possivelmente incompleto) do campo "resposta" de um JSON parcial.
+
+    Args:
+        buffer: Texto acumulado do stream até o momento
+
+    Returns:
+        Texto da resposta decodificado até onde já chegou, ou None se o campo
+        ainda não começou
+    """
+    parser = IncrementalAnswerParser()
+    return parser.feed(buffer)
+
+
+class IncrementalAnswerParser:
+    """
+    Parser incremental para streams de resposta.
+
+    Decodifica o campo "resposta" à medida que os pedaços chegam, sem
+    reprocessar o buffer inteiro a cada pedaço, e faz o parse completo
+    (tolerante) no final.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._pos: Optional[int] = None
+        self._chars: list[str] = []
+        self._closed = False
+        self._search_from = 0
+
+    @property
+    def answer(self) -> Optional[str]:
+        """Texto da resposta decodificado até agora (None se não começou)"""
+        if self._pos is None:
+            return None
+        return "".join(self._chars)
+
+    def feed(self, chunk: str) -> Optional[str]:
+        """
+        Adiciona um pedaço do stream.
+
+        Returns:
+            Texto parcial da resposta até agora, ou None se ainda não começou
+        """
+        self._buffer += chunk
+
+        if self._pos is None:
+            match = _ANSWER_KEY.search(self._buffer, self._search_from)
+            if match is None:
+                # a chave pode estar dividida entre pedaços
+                self._search_from = max(0, len(self._buffer) - 20)
+                return None
+            self._pos = match.end()
+
+        if not self._closed:
+            self._decode()
+        return self.answer
+
+    def finish(self) -> ParseResult:
+        """Faz o parse completo do que foi recebido"""
+        return parse_llm_json(self._buffer)
+
+    def _decode(self) -> None:
+        buffer = self._buffer
+        pos = self._pos
+        while pos < len(buffer):
+            char = buffer[pos]
+            if char == '"':
+                self._closed = True
+                break
+            if char != "\\":
+                self._chars.append(char)
+                pos += 1
+                continue
+
+            # Escape incompleto: espera o próximo pedaço do stream
+            if pos + 1 >= len(buffer):
+                break
+            code = buffer[pos + 1]
+            if code == "u":
+                if pos + 6 > len(buffer):
+                    break
+                try:
+                    self._chars.append(chr(int(buffer[pos + 2:pos + 6], 16)))
+                except ValueError:
+                    pass
+                pos += 6
+            else:
+                self._chars.append(_ESCAPES.get(code, code))
+                pos += 2
+        self._pos = pos
+
+
+def _loads_dict(text: str) -> Optional[dict]:
+    try:
+        data = json.loads(text)
+    except (json.JSONDecodeError, ValueError):
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def _with_prose(data: dict, prose: str) -> dict:
+    """Usa o texto antes do JSON como resposta quando o JSON não trouxe uma"""
+    if prose and not _has_text(data.get("resposta")):
+        data["resposta"] = prose
+    return data
+
+
+def _has_text(value: Any) -> bool:
+    return isinstance(value, str) and bool(value.strip())
+
+
+def _find_object(text: str) -> tuple[Optional[int], Optional[int]]:
+    """
+    Localiza o objeto JSON principal no texto.
+
+    Procura o primeiro "{" seguido de uma chave entre aspas (o que ignora
+    chaves soltas na prosa, como "{nome}") e acompanha strings e escapes
+    para achar o "}" correspondente.
+
+    Returns:
+        (início, fim) do objeto; fim é None se o objeto estiver truncado.
+        (None, None) se não houver objeto
+    """
+    match = _OBJECT_START.search(text)
+    if match is None:
+        return None, None
+    start = match.start()
+
+    depth = 0
+    in_string = False
+    escaped = False
+    for i in range(start, len(text)):
+        char = text[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in "{[":
+            depth += 1
+        elif char in "}]":
+            depth -= 1
+            if depth == 0:
+                return start, i + 1
+    return start, None
+
+
+def _remove_trailing_commas(text: str) -> str:
+    """Remove vírgulas antes de "}" ou "]" fora de strings"""
+    result = []
+    in_string = False
+    escaped = False
+    last = 0
+    for i, char in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char == ",":
+            match = _TRAILING_COMMA.match(text, i)
+            if match:
+                result.append(text[last:i])
+                last = i + 1
+    result.append(text[last:])
+    return "".join(result)
+
+
+def _close_truncated(text: str) -> str:
+    """Fecha string, listas e objetos deixados abertos por saída truncada"""
+    stack = []
+    in_string = False
+    escaped = False
+    for char in text:
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in "{[":
+            stack.append("}" if char == "{" else "]")
+        elif char in "}]" and stack:
+            stack.pop()
+
+    if in_string:
+        if escaped:
+            text = text[:-1]
+        text += '"'
+
+    text = text.rstrip()
+    # Valor ausente no final ("chave":) ou vírgula pendente
+    if text.endswith(":"):
+        text += " null"
+    elif text.endswith(","):
+        text = text[:-1]
+
+    return text + "".join(reversed(stack))
@@ -0,0 +1,174 @@
+"""
+Gravação em segundo plano (write-behind) do perfil e das interações
+"""
+import atexit
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+import config
+from metrics import (
+    PERSISTENCE_BACKPRESSURE,
+    PERSISTENCE_COALESCED,
+    PERSISTENCE_FLUSH_DURATION,
+    PERSISTENCE_QUEUE_DEPTH,
+    PERSISTENCE_WRITES,
+)
+
+DURABILITY_SYNC = "sync"
+DURABILITY_WRITE_BEHIND = "write_behind"
+
+
+class PersistenceQueue:
+    """
+    Fila em memória das gravações em disco, esvaziada por uma thread.
+
+    - Gravações com a mesma chave (o perfil de um arquivo) são unidas:
+      só a última versão vai para o disco
+    - Gravações sem chave (interações) são todas feitas, em lote e na ordem
+    - A fila é gravada a cada `flush_interval` segundos, em `flush()` e no
+      fim do processo
+    - Com `max_pending` gravações na fila, quem enfileira grava tudo na
+      hora (a memória continua limitada e nada é descartado)
+
+    Enquanto não vai para o disco, a versão enfileirada pode ser lida com
+    `pending(key)`, então quem grava e lê no mesmo processo vê o dado novo.
+    """
+
+    def __init__(
+        self,
+        max_pending: int = config.PERSISTENCE_QUEUE_SIZE,
+        flush_interval: float = config.PERSISTENCE_FLUSH_INTERVAL
+    ):
+        """
+        Args:
+            max_pending: Gravações na fila antes de gravar na hora
+            flush_interval: Segundos entre as gravações da thread
+        """
+        self.max_pending = max_pending
+        self.flush_interval = flush_interval
+        self._entries: OrderedDict[Hashable, tuple[str, Callable, Any]] = OrderedDict()
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+        # Uma gravação por vez: mantém a ordem entre a thread e flush() explícitos
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+
+    def put(self, kind: str, write: Callable[[Any], None], payload: Any, key: Optional[Hashable] = None) -> None:
+        """
+        Enfileira uma gravação.
+
+        Args:
+            kind: Tipo da gravação nas métricas ("user", "interaction")
+            write: Função que grava: write(payload)
+            payload: Dado já copiado (não pode mudar depois de enfileirado)
+            key: Chave de união; None para gravações que não se substituem
+        """
+        with self._lock:
+            if self._closed:
+                closed = True
+            else:
+                closed = False
+                if key is None:
+                    key = ("seq", next(self._sequence))
+                elif key in self._entries:
+                    PERSISTENCE_COALESCED.inc(kind=kind)
+                    del self._entries[key]
+                self._entries[key] = (kind, write, payload)
+                full = len(self._entries) >= self.max_pending
+                self._update_depth()
+                self._ensure_thread()
+
+        if closed:
+            # Depois do fechamento a gravação é síncrona (depois do que ainda
+            # estiver na fila, para uma versão antiga não sobrescrever a nova)
+            self.flush()
+            self._write(kind, write, payload)
+        elif full:
+            PERSISTENCE_BACKPRESSURE.inc()
+            self.flush()
+
+    def pending(self, key: Hashable) -> Optional[Any]:
+        """Payload ainda não gravado da chave, se houver"""
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry[2] if entry is not None else None
+
+    def depth(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def flush(self) -> int:
+        """
+        Grava tudo o que está na fila.
+
+        Returns:
+            Quantidade de gravações feitas
+        """
+        with self._flush_lock:
+            with self._lock:
+                entries = list(self._entries.items())
+            if not entries:
+                return 0
+
+            start = time.perf_counter()
+            for key, (kind, write, payload) in entries:
+                self._write(kind, write, payload)
+                with self._lock:
+                    # Só sai da fila se não chegou versão mais nova enquanto gravava
+                    if self._entries.get(key, (None, None, None))[2] is payload:
+                        del self._entries[key]
+                    self._update_depth()
+            PERSISTENCE_FLUSH_DURATION.observe(time.perf_counter() - start)
+            return len(entries)
+
+    def close(self) -> None:
+        """Grava o que falta e passa a gravar de forma síncrona"""
+        with self._lock:
+            self._closed = True
+            thread = self._thread
+        self._wake.set()
+        if thread is not None:
+            thread.join(timeout=self.flush_interval + 5)
+        self.flush()
+
+    def _write(self, kind: str, write: Callable, payload: Any) -> None:
+        try:
+            write(payload)
+            PERSISTENCE_WRITES.inc(kind=kind, status="ok")
+        except Exception:
+            # Sem quem tratar o erro: a falha fica na métrica
+            PERSISTENCE_WRITES.inc(kind=kind, status="error")
+
+    def _ensure_thread(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._run, name="persistence", daemon=True
+            )
+            self._thread.start()
+
+    def _run(self) -> None:
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self.flush()
+
+    def _update_depth(self) -> None:
+        PERSISTENCE_QUEUE_DEPTH.set(len(self._entries))
+
+
+_queue: Optional[PersistenceQueue] = None
+_queue_lock = threading.Lock()
+
+
+def persistence_queue() -> PersistenceQueue:
+    """Retorna a fila de gravação compartilhada pelo processo (gravada no fim dele)"""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = PersistenceQueue()
+            atexit.register(_queue.close)
+        return _queue
@@ -0,0 +1,89 @@
+"""
+Estabilidade do prefixo dos prompts entre turnos (cache de prefixo do provider)
+"""
+import os
+import threading
+from typing import Optional
+
+from metrics import PROMPT_ESTIMATED_TOKENS, PROMPT_PREFIX_SHARED_TOKENS
+from tokens import MESSAGE_OVERHEAD, estimate_message_tokens, estimate_tokens
+
+
+def shared_prefix(previous: list[dict], current: list[dict]) -> tuple[int, int]:
+    """
+    Mede o prefixo comum entre dois prompts.
+
+    Caches de prefixo reaproveitam tokens até o primeiro byte diferente,
+    então conta as mensagens idênticas do início e, na primeira mensagem
+    diferente, o trecho inicial em comum (se o papel for o mesmo).
+
+    Returns:
+        (mensagens idênticas, tokens estimados em comum)
+    """
+    messages = 0
+    tokens = 0
+    for old, new in zip(previous, current):
+        if old == new:
+            messages += 1
+            tokens += estimate_message_tokens(new)
+            continue
+        if old.get("role") == new.get("role"):
+            common = os.path.commonprefix([str(old.get("content") or ""), str(new.get("content") or "")])
+            if common:
+                tokens += estimate_tokens(common) + MESSAGE_OVERHEAD
+        break
+    return messages, tokens
+
+
+class PrefixTracker:
+    """
+    Acompanha quanto de cada prompt repete o prefixo do prompt anterior.
+
+    É a estimativa do lado do cliente para o que o cache de prefixo do
+    provider pode reaproveitar; os tokens realmente servidos do cache vêm
+    em `cached_tokens` nos registros de chamada (metrics.py).
+    """
+
+    def __init__(self):
+        self._last: Optional[list[dict]] = None
+        self._lock = threading.Lock()
+
+        self.prompts = 0
+        self.shared_tokens = 0
+        self.total_tokens = 0
+
+    def observe(self, messages: list[dict]) -> dict:
+        """
+        Registra um prompt e compara com o anterior.
+
+        Returns:
+            Mensagens e tokens em comum com o prompt anterior e a fração do
+            prompt coberta pelo prefixo
+        """
+        total = sum(estimate_message_tokens(m) for m in messages)
+        with self._lock:
+            previous, self._last = self._last, [dict(m) for m in messages]
+            shared_messages, shared_tokens = (
+                shared_prefix(previous, messages) if previous is not None else (0, 0)
+            )
+            self.prompts += 1
+            self.shared_tokens += shared_tokens
+            self.total_tokens += total
+
+        PROMPT_PREFIX_SHARED_TOKENS.inc(shared_tokens)
+        PROMPT_ESTIMATED_TOKENS.inc(total)
+        return {
+            "prefix_shared_messages": shared_messages,
+            "prefix_shared_tokens": shared_tokens,
+            "prefix_ratio": shared_tokens / total if total else 0.0,
+        }
+
+    def stats(self) -> dict:
+        """Retorna a fração acumulada de tokens que repetiram o prefixo anterior"""
+        with self._lock:
+            return {
+                "prompts": self.prompts,
+                "shared_tokens": self.shared_tokens,
+                "total_tokens": self.total_tokens,
+                "prefix_ratio": self.shared_tokens / self.total_tokens if self.total_tokens else 0.0,
+            }
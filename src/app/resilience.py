@@ -0,0 +1,423 @@
+"""
+Resiliência nas chamadas ao LLM: limite de taxa, retentativas e prazos
+"""
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+import config
+from exceptions import CircuitOpenError, DeadlineExceededError, LLMError, RateLimitError
+from metrics import LLM_BREAKER_REJECTED, LLM_BREAKER_TRANSITIONS
+
+
+class Deadline:
+    """Prazo absoluto para uma operação, medido com relógio monotônico"""
+
+    def __init__(self, timeout: float):
+        """
+        Args:
+            timeout: Segundos disponíveis a partir de agora
+        """
+        self.timeout = timeout
+        self.started_at = time.monotonic()
+        self.expires_at = self.started_at + timeout
+
+    def remaining(self) -> float:
+        """Segundos restantes (nunca negativo)"""
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def elapsed(self) -> float:
+        """Segundos desde a criação do prazo"""
+        return time.monotonic() - self.started_at
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def cap(self, timeout: float) -> "Deadline":
+        """Prazo de até `timeout` segundos que nunca passa deste"""
+        return Deadline(max(0.0, min(timeout, self.remaining())))
+
+
+class TokenBucket:
+    """
+    Balde de fichas com reabastecimento contínuo.
+
+    Em vez de bloquear, `reserve` consome as fichas imediatamente (o saldo
+    pode ficar negativo) e devolve quanto tempo o chamador deve esperar.
+    Assim o mesmo balde serve para código síncrono e assíncrono.
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        """
+        Args:
+            rate_per_minute: Fichas repostas por minuto
+            capacity: Saldo máximo acumulado (padrão: uma cota de um minuto)
+        """
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait_time(self, amount: float) -> float:
+        """Tempo de espera até haver `amount` fichas, sem consumir"""
+        with self._lock:
+            self._refill()
+            return self._wait_for(amount)
+
+    def reserve(self, amount: float) -> float:
+        """Consome `amount` fichas e retorna quantos segundos esperar"""
+        with self._lock:
+            self._refill()
+            wait = self._wait_for(amount)
+            self._tokens -= amount
+            return wait
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _wait_for(self, amount: float) -> float:
+        # Pedidos maiores que a capacidade esperam só até o balde encher
+        amount = min(amount, self.capacity)
+        missing = amount - self._tokens
+        if missing <= 0:
+            return 0.0
+        return missing / self.rate
+
+
+class RateLimiter:
+    """Limitador do lado do cliente para as cotas de requisições e tokens por minuto"""
+
+    def __init__(
+        self,
+        requests_per_minute: float = config.GROQ_RPM,
+        tokens_per_minute: float = config.GROQ_TPM
+    ):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: int, deadline: Optional[Deadline] = None) -> float:
+        """
+        Reserva uma requisição e `tokens` tokens.
+
+        Args:
+            tokens: Tokens estimados da requisição
+            deadline: Prazo da requisição; se a espera não couber, nada é reservado
+
+        Returns:
+            Segundos que o chamador deve esperar antes de enviar
+
+        Raises:
+            RateLimitError: Se a espera ultrapassar o prazo
+        """
+        with self._lock:
+            wait = max(self.requests.wait_time(1), self.tokens.wait_time(tokens))
+            if deadline is not None and wait >= deadline.remaining():
+                raise RateLimitError(
+                    "Rate limit atingido. Aguarde alguns minutos e tente novamente."
+                )
+            self.requests.reserve(1)
+            self.tokens.reserve(tokens)
+            return wait
+
+
+class RetryPolicy:
+    """Backoff exponencial com jitter, respeitando retry-after e o prazo"""
+
+    def __init__(
+        self,
+        max_attempts: int = config.GROQ_RETRY_ATTEMPTS,
+        base_delay: float = config.GROQ_RETRY_BASE_DELAY,
+        max_delay: float = config.GROQ_RETRY_MAX_DELAY
+    ):
+        """
+        Args:
+            max_attempts: Tentativas no total (incluindo a primeira)
+            base_delay: Espera base em segundos
+            max_delay: Espera máxima entre tentativas
+        """
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def next_delay(
+        self,
+        attempt: int,
+        deadline: Deadline,
+        retry_after: Optional[float] = None
+    ) -> Optional[float]:
+        """
+        Calcula a espera antes da próxima tentativa.
+
+        Args:
+            attempt: Número da tentativa que falhou (começando em 0)
+            deadline: Prazo total da requisição
+            retry_after: Espera sugerida pelo servidor, se houver
+
+        Returns:
+            Segundos a esperar, ou None se não vale mais tentar
+        """
+        if attempt + 1 >= self.max_attempts:
+            return None
+
+        # "Full jitter": espalha as retentativas e evita rajadas sincronizadas
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+
+        if delay >= deadline.remaining():
+            return None
+        return delay
+
+
+def deadline_kwargs(provider, deadline: Optional[Deadline]) -> dict:
+    """Repassa o prazo do turno só a providers que o aceitam (supports_deadline)"""
+    if deadline is None or not getattr(provider, "supports_deadline", False):
+        return {}
+    return {"deadline": deadline}
+
+
+def retry_after_seconds(headers) -> Optional[float]:
+    """
+    Lê a espera sugerida pelo servidor nos cabeçalhos da resposta.
+
+    Returns:
+        Segundos a esperar, ou None se não houver indicação
+    """
+    if headers is None:
+        return None
+
+    retry_after_ms = headers.get("retry-after-ms")
+    if retry_after_ms is not None:
+        try:
+            return float(retry_after_ms) / 1000
+        except ValueError:
+            pass
+
+    retry_after = headers.get("retry-after")
+    if retry_after is not None:
+        try:
+            return float(retry_after)
+        except ValueError:
+            pass
+    return None
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker por taxa de erros e de chamadas lentas numa janela móvel.
+
+    Fechado, deixa tudo passar e registra o resultado de cada chamada. Com
+    pelo menos `min_calls` na janela e a taxa de erros (ou de chamadas
+    lentas) acima do limite, abre: as chamadas são recusadas na hora com
+    CircuitOpenError. Depois de `open_seconds` fica meio aberto e deixa
+    passar até `half_open_calls` chamadas de teste; se derem certo, fecha,
+    se alguma falhar, abre de novo.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        name: str = "llm",
+        window: float = config.LLM_BREAKER_WINDOW,
+        min_calls: int = config.LLM_BREAKER_MIN_CALLS,
+        error_rate: float = config.LLM_BREAKER_ERROR_RATE,
+        slow_call: float = config.LLM_BREAKER_SLOW_CALL,
+        slow_rate: float = config.LLM_BREAKER_SLOW_RATE,
+        open_seconds: float = config.LLM_BREAKER_OPEN_SECONDS,
+        half_open_calls: int = config.LLM_BREAKER_HALF_OPEN_CALLS
+    ):
+        """
+        Args:
+            name: Nome usado nas métricas
+            window: Janela móvel, em segundos, das chamadas consideradas
+            min_calls: Chamadas mínimas na janela antes de poder abrir
+            error_rate: Fração de erros que abre o circuito
+            slow_call: Duração, em segundos, a partir da qual a chamada é lenta
+            slow_rate: Fração de chamadas lentas que abre o circuito
+            open_seconds: Tempo aberto antes das chamadas de teste
+            half_open_calls: Chamadas de teste simultâneas no estado meio aberto
+        """
+        self.name = name
+        self.window = window
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.slow_call = slow_call
+        self.slow_rate = slow_rate
+        self.open_seconds = open_seconds
+        self.half_open_calls = half_open_calls
+
+        self._state = self.CLOSED
+        self._opened_at = 0.0
+        self._probes = 0
+        # (instante, falhou, lenta)
+        self._calls: deque[tuple[float, bool, bool]] = deque()
+        self._lock = threading.Lock()
+
+        self.rejected = 0
+        self.trips = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._maybe_half_open(time.monotonic())
+            return self._state
+
+    def allow(self) -> bool:
+        """
+        Pede passagem para uma chamada.
+
+        No estado meio aberto, a passagem concedida ocupa uma vaga de teste
+        até record_success, record_failure ou release.
+        """
+        with self._lock:
+            self._maybe_half_open(time.monotonic())
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.HALF_OPEN and self._probes < self.half_open_calls:
+                self._probes += 1
+                return True
+            self.rejected += 1
+        LLM_BREAKER_REJECTED.inc(breaker=self.name)
+        return False
+
+    def record_success(self, duration: float = 0.0) -> None:
+        self._record(failed=False, duration=duration)
+
+    def record_failure(self, duration: float = 0.0) -> None:
+        self._record(failed=True, duration=duration)
+
+    def release(self) -> None:
+        """Devolve a vaga de uma chamada que não terminou (ex.: cancelada)"""
+        with self._lock:
+            if self._state == self.HALF_OPEN and self._probes > 0:
+                self._probes -= 1
+
+    @contextmanager
+    def guard(self) -> Iterator[None]:
+        """
+        Executa uma chamada sob o breaker.
+
+        LLMError conta como falha; cancelamentos (GeneratorExit,
+        CancelledError) e prazos do turno esgotados antes do envio só
+        liberam a vaga, sem contar contra o provedor.
+
+        Raises:
+            CircuitOpenError: Se o circuito estiver aberto
+        """
+        if not self.allow():
+            raise CircuitOpenError("Serviço de respostas temporariamente indisponível.")
+        started = time.monotonic()
+        try:
+            yield
+        except DeadlineExceededError:
+            self.release()
+            raise
+        except LLMError:
+            self.record_failure(time.monotonic() - started)
+            raise
+        except BaseException:
+            self.release()
+            raise
+        else:
+            self.record_success(time.monotonic() - started)
+
+    def stats(self) -> dict:
+        with self._lock:
+            now = time.monotonic()
+            self._maybe_half_open(now)
+            self._expire(now)
+            total = len(self._calls)
+            failures = sum(1 for _, failed, _ in self._calls if failed)
+            slow = sum(1 for _, _, is_slow in self._calls if is_slow)
+            return {
+                "state": self._state,
+                "calls": total,
+                "error_rate": failures / total if total else 0.0,
+                "slow_rate": slow / total if total else 0.0,
+                "rejected": self.rejected,
+                "trips": self.trips,
+            }
+
+    def _record(self, failed: bool, duration: float) -> None:
+        slow = duration >= self.slow_call
+        now = time.monotonic()
+        with self._lock:
+            self._maybe_half_open(now)
+            if self._state == self.HALF_OPEN:
+                self._probes = max(0, self._probes - 1)
+                if failed or slow:
+                    self._transition(self.OPEN, now)
+                elif self._probes == 0:
+                    self._transition(self.CLOSED, now)
+                return
+            if self._state == self.OPEN:
+                # Chamada iniciada antes de abrir: o resultado já não importa
+                return
+
+            self._calls.append((now, failed, slow))
+            self._expire(now)
+            if self._should_trip():
+                self._transition(self.OPEN, now)
+
+    def _should_trip(self) -> bool:
+        total = len(self._calls)
+        if total < self.min_calls:
+            return False
+        failures = sum(1 for _, failed, _ in self._calls if failed)
+        slow = sum(1 for _, _, is_slow in self._calls if is_slow)
+        return failures / total >= self.error_rate or slow / total >= self.slow_rate
+
+    def _expire(self, now: float) -> None:
+        while self._calls and self._calls[0][0] <= now - self.window:
+            self._calls.popleft()
+
+    def _maybe_half_open(self, now: float) -> None:
+        if self._state == self.OPEN and now - self._opened_at >= self.open_seconds:
+            self._transition(self.HALF_OPEN, now)
+
+    def _transition(self, state: str, now: float) -> None:
+        self._state = state
+        self._probes = 0
+        if state == self.OPEN:
+            self._opened_at = now
+            self.trips += 1
+        elif state == self.CLOSED:
+            # Recomeça a contagem: os erros que abriram o circuito já passaram
+            self._calls.clear()
+        LLM_BREAKER_TRANSITIONS.inc(breaker=self.name, state=state)
+
+
+_limiters: dict[str, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def rate_limiter_for(model: str) -> RateLimiter:
+    """Retorna o limitador compartilhado pelo processo para um modelo"""
+    with _limiters_lock:
+        limiter = _limiters.get(model)
+        if limiter is None:
+            limiter = _limiters[model] = RateLimiter()
+        return limiter
+
+
+_breakers: dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def circuit_breaker_for(name: str) -> CircuitBreaker:
+    """Retorna o circuit breaker compartilhado pelo processo para um provedor"""
+    with _breakers_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            breaker = _breakers[name] = CircuitBreaker(name)
+        return breaker
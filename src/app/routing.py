@@ -0,0 +1,182 @@
+"""
+Roteamento de modelos por tipo de chamada e cascata pequeno -> grande
+"""
+import re
+import threading
+import unicodedata
+from typing import Callable, Optional
+
+import config
+from parsing import REPAIR_FAILED, REPAIR_PLAIN_TEXT, REPAIR_TRUNCATED, ParseResult
+
+ROUTE_ANSWER = "answer"
+ROUTE_SUMMARY = "summary"
+ROUTE_EXTRACTION = "extraction"
+ROUTE_GREETING = "greeting"
+ROUTE_SIMULATION = "simulation"
+
+ROUTES = (ROUTE_ANSWER, ROUTE_SUMMARY, ROUTE_EXTRACTION, ROUTE_GREETING, ROUTE_SIMULATION)
+
+_GREETINGS = (
+    "oi", "ola", "opa", "e ai", "bom dia", "boa tarde", "boa noite", "tudo bem",
+    "obrigado", "obrigada", "valeu", "tchau", "ate mais", "ok", "beleza",
+)
+_GREETING_MAX_WORDS = 5
+
+_SIMULATION = re.compile(
+    r"\b(simul\w*|parcel\w*|prestac\w*|juros|financi\w*|amortiz\w*|price|sac|"
+    r"a vista|quanto (?:preciso|devo|tenho que|teria que) (?:guardar|poupar|investir|juntar)|"
+    r"rendiment\w*|render|rende|rendem|taxa)\b"
+)
+
+# Respostas que indicam que o modelo pequeno não deu conta
+_UNCERTAIN = re.compile(
+    r"\b(nao tenho certeza|nao sei|nao consigo|nao e possivel calcular|desculpe)\b"
+)
+_MIN_CONFIDENT_ANSWER = 20
+
+
+class Route:
+    """Modelo e limite de tokens de saída de um tipo de chamada"""
+
+    def __init__(
+        self,
+        name: str,
+        model: str,
+        max_tokens: Optional[int] = None,
+        cascade_model: Optional[str] = None
+    ):
+        """
+        Args:
+            name: Tipo de chamada (ROUTE_*)
+            model: Modelo usado na chamada (o pequeno, se houver cascata)
+            max_tokens: Limite de tokens de saída
+            cascade_model: Modelo maior para onde a resposta escala quando a
+                do primeiro modelo é rejeitada
+        """
+        self.name = name
+        self.model = model
+        self.max_tokens = max_tokens
+        self.cascade_model = cascade_model
+
+    def escalated(self) -> "Route":
+        """A mesma rota no modelo maior da cascata"""
+        return Route(self.name, self.cascade_model or self.model, self.max_tokens)
+
+    def __repr__(self) -> str:
+        return (
+            f"Route({self.name!r}, model={self.model!r}, max_tokens={self.max_tokens}, "
+            f"cascade_model={self.cascade_model!r})"
+        )
+
+
+def default_routes() -> dict[str, Route]:
+    """Rotas definidas por config.ROUTE_MODELS / ROUTE_MAX_TOKENS / LLM_CASCADE_ENABLED"""
+    routes = {}
+    for name in ROUTES:
+        model = config.ROUTE_MODELS.get(name, config.GROQ_MODEL_NAME)
+        cascade_model = None
+        if name in (ROUTE_ANSWER, ROUTE_SIMULATION) and config.LLM_CASCADE_ENABLED:
+            # Cascata: o modelo pequeno responde primeiro, o da rota é a escalada
+            cascade_model, model = model, config.GROQ_SMALL_MODEL
+            if cascade_model == model:
+                cascade_model = None
+        routes[name] = Route(name, model, config.ROUTE_MAX_TOKENS.get(name), cascade_model)
+    return routes
+
+
+def classify_message(user_message: str) -> str:
+    """
+    Escolhe a rota da resposta pelo conteúdo da mensagem.
+
+    Returns:
+        ROUTE_GREETING para saudações curtas, ROUTE_SIMULATION para pedidos
+        de cálculo e ROUTE_ANSWER para o resto
+    """
+    text = _plain(user_message)
+    words = text.split()
+    if not words:
+        return ROUTE_GREETING
+
+    if _SIMULATION.search(text):
+        return ROUTE_SIMULATION
+
+    if len(words) <= _GREETING_MAX_WORDS:
+        stripped = " ".join(words)
+        if any(stripped == g or stripped.startswith(g + " ") for g in _GREETINGS):
+            return ROUTE_GREETING
+
+    return ROUTE_ANSWER
+
+
+def is_confident(result: ParseResult) -> bool:
+    """
+    Heurística de aceitação da resposta do modelo pequeno na cascata.
+
+    Rejeita JSON que precisou ser salvo de texto puro ou truncado, resposta
+    vazia ou curta demais e respostas que admitem não saber.
+    """
+    if not result.ok or result.repair in (REPAIR_PLAIN_TEXT, REPAIR_TRUNCATED, REPAIR_FAILED):
+        return False
+    answer = result.data.get("resposta")
+    if not isinstance(answer, str) or len(answer.strip()) < _MIN_CONFIDENT_ANSWER:
+        return False
+    return not _UNCERTAIN.search(_plain(answer))
+
+
+def _plain(text: str) -> str:
+    """Minúsculas, sem acentos nem pontuação"""
+    text = unicodedata.normalize("NFKD", (text or "").lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return " ".join(re.findall(r"[a-z0-9%]+", text))
+
+
+class ModelRouter:
+    """
+    Escolhe o provider de cada tipo de chamada.
+
+    Os providers são criados sob demanda, um por (modelo, max_tokens), e
+    compartilham o pool de conexões do processo (clients.py).
+    """
+
+    def __init__(
+        self,
+        routes: Optional[dict[str, Route]] = None,
+        provider_factory: Optional[Callable] = None,
+        async_provider_factory: Optional[Callable] = None
+    ):
+        """
+        Args:
+            routes: Rotas por nome (padrão: default_routes())
+            provider_factory: Cria o provider síncrono: f(model, max_tokens)
+            async_provider_factory: Cria o provider assíncrono; se omitido,
+                as chamadas assíncronas usam o síncrono numa thread
+        """
+        self.routes = routes if routes is not None else default_routes()
+        self.provider_factory = provider_factory
+        self.async_provider_factory = async_provider_factory
+        self._providers: dict[tuple, object] = {}
+        self._async_providers: dict[tuple, object] = {}
+        self._lock = threading.Lock()
+
+    def route(self, name: Optional[str]) -> Optional[Route]:
+        """Rota pelo nome; None para chamadas sem rota (usam o provider padrão)"""
+        if name is None:
+            return None
+        return self.routes.get(name) or self.routes.get(ROUTE_ANSWER)
+
+    def provider(self, model: str, max_tokens: Optional[int]):
+        return self._get(self._providers, self.provider_factory, model, max_tokens)
+
+    def async_provider(self, model: str, max_tokens: Optional[int]):
+        if self.async_provider_factory is None:
+            return None
+        return self._get(self._async_providers, self.async_provider_factory, model, max_tokens)
+
+    def _get(self, providers: dict, factory: Callable, model: str, max_tokens: Optional[int]):
+        key = (model, max_tokens)
+        with self._lock:
+            provider = providers.get(key)
+            if provider is None:
+                provider = providers[key] = factory(model, max_tokens)
+            return provider
@@ -0,0 +1,230 @@
+"""
+Cache semântico de perguntas quase duplicadas
+"""
+import copy
+import hashlib
+import random
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Iterable, Optional
+
+import config
+
+
+STOPWORDS = {
+    "a", "ao", "aos", "as", "com", "como", "da", "das", "de", "do", "dos",
+    "e", "eh", "em", "entre", "essa", "esse", "esta", "este", "eu", "isso",
+    "mais", "me", "meu", "minha", "na", "nas", "no", "nos", "o", "os", "ou",
+    "para", "pra", "pela", "pelo", "por", "qual", "quais", "que", "se", "sua",
+    "seu", "um", "uma", "voce", "vc",
+}
+
+# Variações comuns que significam a mesma coisa nas perguntas financeiras
+SINONIMOS = {
+    "compensa": "vale",
+    "compensar": "vale",
+    "melhor": "vale",
+    "parcelado": "parcelar",
+    "parcelada": "parcelar",
+    "parcelamento": "parcelar",
+    "parcela": "parcelar",
+    "avista": "vista",
+    "poupar": "guardar",
+    "economizar": "guardar",
+    "funciona": "funcionam",
+}
+
+_PRIMO = (1 << 61) - 1
+
+
+def normalize_text(text: str) -> list[str]:
+    """
+    Normaliza texto em português para comparação.
+
+    Remove acentos e pontuação, descarta stopwords, aplica sinônimos e
+    remove o plural simples.
+
+    Returns:
+        Lista de termos normalizados
+    """
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    text = text.replace("a vista", "avista")
+
+    termos = []
+    for token in re.findall(r"[a-z0-9]+", text):
+        if token in STOPWORDS:
+            continue
+        token = SINONIMOS.get(token, token)
+        if len(token) > 4 and token.endswith("s"):
+            token = token[:-1]
+        termos.append(token)
+    return termos
+
+
+def _features(termos: Iterable[str]) -> set[str]:
+    """Termos inteiros mais trigramas de caracteres (tolera erros de digitação)"""
+    features = set()
+    for termo in termos:
+        features.add(termo)
+        padded = f"#{termo}#"
+        for i in range(len(padded) - 2):
+            features.add(f"3:{padded[i:i + 3]}")
+    return features
+
+
+class SemanticCache:
+    """
+    Cache de respostas para perguntas com redação diferente e mesmo sentido.
+
+    Usa assinaturas MinHash com LSH em bandas para encontrar candidatos sem
+    comparar contra todas as entradas. Não depende de rede nem de modelos de
+    embedding. As entradas ficam separadas por escopo (os fatos do usuário
+    presentes quando a resposta foi gerada) e são removidas por LRU.
+    """
+
+    def __init__(
+        self,
+        threshold: float = config.SEMANTIC_CACHE_THRESHOLD,
+        max_size: int = config.SEMANTIC_CACHE_SIZE,
+        min_terms: int = config.SEMANTIC_CACHE_MIN_TERMS,
+        num_perm: int = 64,
+        bands: int = 16
+    ):
+        """
+        Args:
+            threshold: Similaridade mínima (Jaccard estimado) para considerar hit
+            max_size: Quantidade máxima de entradas
+            min_terms: Perguntas com menos termos relevantes não usam o cache
+            num_perm: Quantidade de funções hash da assinatura MinHash
+            bands: Quantidade de bandas do LSH (deve dividir num_perm)
+        """
+        if num_perm % bands:
+            raise ValueError("num_perm deve ser múltiplo de bands")
+
+        self.threshold = threshold
+        self.max_size = max_size
+        self.min_terms = min_terms
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+
+        rng = random.Random(42)
+        self._perms = [
+            (rng.randrange(1, _PRIMO), rng.randrange(0, _PRIMO))
+            for _ in range(num_perm)
+        ]
+        self._entries: OrderedDict[tuple, tuple[tuple, dict]] = OrderedDict()
+        self._buckets: dict[tuple, set[tuple]] = {}
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def lookup(self, question: str, scope: Iterable[str]) -> Optional[dict]:
+        """
+        Busca resposta para uma pergunta parecida no mesmo escopo.
+
+        Args:
+            question: Pergunta do usuário
+            scope: Fatos do usuário presentes no prompt
+
+        Returns:
+            Cópia da resposta armazenada, ou None
+        """
+        signature = self._signature(question)
+        if signature is None:
+            return None
+        scope_key = self._scope_key(scope)
+
+        with self._lock:
+            best_key, best_score = None, 0.0
+            for key in self._candidates(scope_key, signature):
+                stored_signature, _ = self._entries[key]
+                score = self._similarity(signature, stored_signature)
+                if score > best_score:
+                    best_key, best_score = key, score
+
+            if best_key is None or best_score < self.threshold:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(best_key)
+            self.hits += 1
+            return copy.deepcopy(self._entries[best_key][1])
+
+    def store(self, question: str, scope: Iterable[str], answer: dict) -> None:
+        """Armazena a resposta de uma pergunta no escopo informado"""
+        signature = self._signature(question)
+        if signature is None:
+            return
+        key = (self._scope_key(scope), signature)
+
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return
+            self._entries[key] = (signature, copy.deepcopy(answer))
+            for bucket in self._bands(key[0], signature):
+                self._buckets.setdefault(bucket, set()).add(key)
+            while len(self._entries) > self.max_size:
+                self._evict()
+
+    def stats(self) -> dict:
+        """Retorna contadores de uso do cache"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+    def _signature(self, question: str) -> Optional[tuple]:
+        termos = normalize_text(question)
+        if len(set(termos)) < self.min_terms:
+            return None
+
+        hashes = [
+            int.from_bytes(hashlib.blake2b(f.encode("utf-8"), digest_size=8).digest(), "big")
+            for f in _features(termos)
+        ]
+        return tuple(
+            min((a * h + b) % _PRIMO for h in hashes)
+            for a, b in self._perms
+        )
+
+    def _similarity(self, sig_a: tuple, sig_b: tuple) -> float:
+        iguais = sum(1 for a, b in zip(sig_a, sig_b) if a == b)
+        return iguais / self.num_perm
+
+    def _scope_key(self, scope: Iterable[str]) -> str:
+        joined = "\n".join(sorted(f for f in scope if f))
+        return hashlib.sha256(joined.encode("utf-8")).hexdigest()
+
+    def _bands(self, scope_key: str, signature: tuple) -> list[tuple]:
+        return [
+            (scope_key, band, signature[band * self.rows:(band + 1) * self.rows])
+            for band in range(self.bands)
+        ]
+
+    def _candidates(self, scope_key: str, signature: tuple) -> set[tuple]:
+        candidates = set()
+        for bucket in self._bands(scope_key, signature):
+            candidates |= self._buckets.get(bucket, set())
+        return candidates
+
+    def _evict(self) -> None:
+        key, (signature, _) = self._entries.popitem(last=False)
+        for bucket in self._bands(key[0], signature):
+            keys = self._buckets.get(bucket)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._buckets[bucket]
+        self.evictions += 1
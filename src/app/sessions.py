@@ -0,0 +1,199 @@
+"""
+Agentes por sessão do navegador
+"""
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional
+
+import config
+from agent import FinancialAgent
+from data import DataManager
+from exceptions import DataSaveError
+from metrics import SESSION_BYTES, SESSION_EVICTIONS, SESSIONS_BYTES, SESSIONS_LIVE
+
+DEFAULT_SESSION = "anonimo"
+
+
+def session_file(session_id: str):
+    """Arquivo do perfil da sessão (o id vem do navegador, então é saneado)"""
+    name = re.sub(r"[^A-Za-z0-9_-]", "_", session_id)[:64] or DEFAULT_SESSION
+    return config.SESSIONS_PATH / f"{name}.json"
+
+
+def default_agent_factory(session_id: str) -> FinancialAgent:
+    return FinancialAgent(
+        data_manager=DataManager(user_file=session_file(session_id)),
+        session_id=session_id,
+    )
+
+
+def approx_size(obj, _seen: Optional[set] = None) -> int:
+    """
+    Memória aproximada de um objeto e do que ele referencia, em bytes.
+
+    Percorre dicionários, sequências e atributos de objetos; cada objeto
+    é contado uma vez. Serve para comparar sessões, não para medir o processo.
+    """
+    seen = _seen if _seen is not None else set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, (str, bytes, int, float, bool, type(None))):
+        return size
+    if isinstance(obj, dict):
+        size += sum(approx_size(k, seen) + approx_size(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(approx_size(item, seen) for item in obj)
+    elif hasattr(obj, "__dict__"):
+        size += approx_size(vars(obj), seen)
+    return size
+
+
+def session_state_size(agent: FinancialAgent) -> int:
+    """Memória aproximada do estado que o agente guarda por sessão"""
+    return approx_size((
+        agent.user,
+        agent.last_prompt_report,
+        agent.prefix_tracker,
+        agent.semantic_cache,
+    ))
+
+
+class _Session:
+    __slots__ = ("agent", "last_used", "bytes")
+
+    def __init__(self, agent: FinancialAgent, now: float):
+        self.agent = agent
+        self.last_used = now
+        self.bytes = 0
+
+
+class AgentPool:
+    """
+    Agentes criados sob demanda, um por sessão.
+
+    Cada sessão tem o próprio perfil, histórico de prompts e cache
+    semântico, então conversas simultâneas não disputam o mesmo `user`.
+    A memória é limitada por LRU (`max_sessions`) e por tempo parado
+    (`idle_ttl`); a sessão que sai grava o perfil e pode ser recriada
+    do disco depois.
+    """
+
+    def __init__(
+        self,
+        factory: Optional[Callable[[str], FinancialAgent]] = None,
+        max_sessions: int = config.SESSION_POOL_SIZE,
+        idle_ttl: Optional[float] = config.SESSION_IDLE_TTL
+    ):
+        """
+        Args:
+            factory: Cria o agente de uma sessão: f(session_id)
+            max_sessions: Sessões mantidas em memória
+            idle_ttl: Segundos sem uso até a sessão sair da memória
+                (None ou 0 = sem limite)
+        """
+        self.factory = factory or default_agent_factory
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl or None
+        self._sessions: OrderedDict[str, _Session] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id: Optional[str]) -> FinancialAgent:
+        """Agente da sessão, criado na primeira vez que ela aparece"""
+        session_id = session_id or DEFAULT_SESSION
+        now = time.monotonic()
+        with self._lock:
+            evicted = self._pop_idle(now)
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = self._sessions[session_id] = _Session(self.factory(session_id), now)
+            session.last_used = now
+            self._sessions.move_to_end(session_id)
+            while len(self._sessions) > self.max_sessions:
+                evicted.append(self._pop(next(iter(self._sessions)), "lru"))
+            self._update_gauges()
+
+        self._flush(evicted)
+        return session.agent
+
+    def account(self, session_id: Optional[str]) -> int:
+        """
+        Mede a memória da sessão depois de um turno.
+
+        Returns:
+            Bytes estimados do estado da sessão (0 se ela não está em memória)
+        """
+        session_id = session_id or DEFAULT_SESSION
+        with self._lock:
+            session = self._sessions.get(session_id)
+        if session is None:
+            return 0
+
+        size = session_state_size(session.agent)
+        SESSION_BYTES.observe(size)
+        with self._lock:
+            session.bytes = size
+            self._update_gauges()
+        return size
+
+    def evict_idle(self) -> int:
+        """Tira da memória as sessões paradas há mais de `idle_ttl`"""
+        with self._lock:
+            evicted = self._pop_idle(time.monotonic())
+            self._update_gauges()
+        self._flush(evicted)
+        return len(evicted)
+
+    def close(self) -> None:
+        """Grava e descarta todas as sessões (fim do processo)"""
+        with self._lock:
+            evicted = [self._pop(session_id, "shutdown") for session_id in list(self._sessions)]
+            self._update_gauges()
+        self._flush(evicted)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "bytes": sum(session.bytes for session in self._sessions.values()),
+            }
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._sessions)
+
+    def __contains__(self, session_id: str) -> bool:
+        with self._lock:
+            return session_id in self._sessions
+
+    def _pop_idle(self, now: float) -> list[FinancialAgent]:
+        if self.idle_ttl is None:
+            return []
+        idle = [
+            session_id for session_id, session in self._sessions.items()
+            if now - session.last_used > self.idle_ttl
+        ]
+        return [self._pop(session_id, "idle") for session_id in idle]
+
+    def _pop(self, session_id: str, reason: str) -> FinancialAgent:
+        SESSION_EVICTIONS.inc(reason=reason)
+        return self._sessions.pop(session_id).agent
+
+    def _update_gauges(self) -> None:
+        SESSIONS_LIVE.set(len(self._sessions))
+        SESSIONS_BYTES.set(sum(session.bytes for session in self._sessions.values()))
+
+    def _flush(self, agents: list[FinancialAgent]) -> None:
+        """Termina o trabalho em segundo plano e grava o perfil das sessões que saíram"""
+        for agent in agents:
+            agent.wait_extractions(timeout=config.SESSION_FLUSH_TIMEOUT)
+            try:
+                agent.data_manager.save_user(user=agent.user)
+            except DataSaveError:
+                # O perfil fica como estava no último turno salvo
+                pass
@@ -0,0 +1,114 @@
+"""
+Coalescência de chamadas idênticas em andamento (single-flight)
+"""
+import asyncio
+import threading
+from typing import Awaitable, Callable, TypeVar
+
+T = TypeVar("T")
+
+
+class _Call:
+    """Chamada em andamento compartilhada pelos chamadores de uma mesma chave"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Garante uma única execução por chave enquanto ela estiver em andamento.
+
+    Chamadores concorrentes com a mesma chave esperam a execução do primeiro
+    (o "líder") e recebem o mesmo resultado ou a mesma exceção. Nada é
+    guardado depois que a chamada termina, então não há risco de resposta
+    velha: é deduplicação, não cache.
+    """
+
+    def __init__(self):
+        self._calls: dict[str, _Call] = {}
+        self._async_calls: dict[tuple, asyncio.Future] = {}
+        self._lock = threading.Lock()
+
+        self.calls = 0
+        self.coalesced = 0
+
+    def do(self, key: str, fn: Callable[[], T]) -> T:
+        """
+        Executa `fn` ou aguarda a execução em andamento para a mesma chave.
+
+        Args:
+            key: Chave da chamada (ex.: hash canônico do prompt)
+            fn: Função que faz a chamada de fato
+
+        Returns:
+            Resultado de `fn`, compartilhado entre os chamadores
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.calls += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+    async def ado(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        """Versão assíncrona de do; a chamada é compartilhada dentro do mesmo event loop"""
+        loop_key = (id(asyncio.get_running_loop()), key)
+        with self._lock:
+            future = self._async_calls.get(loop_key)
+            leader = future is None
+            if leader:
+                future = self._async_calls[loop_key] = asyncio.get_running_loop().create_future()
+                self.calls += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            # shield: cancelar um seguidor não cancela a chamada do líder
+            return await asyncio.shield(future)
+
+        try:
+            result = await fn()
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # evita o aviso de exceção nunca lida quando não há seguidores
+            future.exception()
+            raise
+        finally:
+            with self._lock:
+                del self._async_calls[loop_key]
+
+    def stats(self) -> dict:
+        """Retorna quantas chamadas foram feitas e quantas foram coalescidas"""
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "coalesced": self.coalesced,
+                "in_flight": len(self._calls) + len(self._async_calls),
+            }
@@ -0,0 +1,315 @@
+"""
+Armazenamento do perfil e das interações: arquivos JSON ou SQLite
+"""
+import atexit
+import json
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator, Optional
+
+import config
+from interaction_log import InteractionLog, interaction_log
+from metrics import INTERACTION_LOG_RECORDS, STORAGE_BATCHES
+
+STORAGE_JSON = "json"
+STORAGE_SQLITE = "sqlite"
+
+
+class Storage:
+    """
+    Interface dos armazenamentos usados pelo DataManager.
+
+    Os perfis são identificados por um id (o nome do arquivo do perfil no
+    DataManager); as interações só são acrescentadas e lidas por intervalo.
+    """
+
+    def key(self, user_id: str) -> tuple:
+        """Identifica o perfil entre armazenamentos (chave da fila write-behind)"""
+        raise NotImplementedError
+
+    def load_user(self, user_id: str) -> Optional[dict]:
+        """Perfil gravado, ou None se ainda não existe"""
+        raise NotImplementedError
+
+    def save_user(self, user_id: str, user: dict) -> None:
+        raise NotImplementedError
+
+    def append_interaction(self, user_id: str, record: dict) -> None:
+        """Acrescenta uma interação (precisa de "timestamp" em ISO 8601)"""
+        raise NotImplementedError
+
+    def scan_interactions(
+        self, start: Optional[datetime] = None, end: Optional[datetime] = None
+    ) -> Iterator[dict]:
+        """Interações com start <= timestamp < end, na ordem de gravação"""
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+
+class JsonStorage(Storage):
+    """Um arquivo JSON por perfil e o log segmentado de interações"""
+
+    def __init__(self, user_file: Path, interactions: Optional[InteractionLog] = None):
+        """
+        Args:
+            user_file: Arquivo do perfil
+            interactions: Log das interações (padrão: o do processo em
+                config.INTERACOES_PATH)
+        """
+        self.user_file = Path(user_file)
+        self.interactions = interactions if interactions is not None else interaction_log()
+
+    def key(self, user_id: str) -> tuple:
+        return (STORAGE_JSON, str(self.user_file))
+
+    def load_user(self, user_id: str) -> Optional[dict]:
+        if not self.user_file.exists():
+            return None
+        with open(self.user_file, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def save_user(self, user_id: str, user: dict) -> None:
+        # Cria diretório se não existir
+        self.user_file.parent.mkdir(parents=True, exist_ok=True)
+
+        # Arquivo temporário + replace: uma queda no meio não corrompe o perfil
+        tmp_file = self.user_file.with_suffix(".tmp")
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(user, f, ensure_ascii=False, indent=2)
+        tmp_file.replace(self.user_file)
+
+    def append_interaction(self, user_id: str, record: dict) -> None:
+        self.interactions.append(record)
+
+    def scan_interactions(
+        self, start: Optional[datetime] = None, end: Optional[datetime] = None
+    ) -> Iterator[dict]:
+        return self.interactions.scan(start, end)
+
+
+# Campos do perfil copiados para colunas indexadas (o perfil inteiro fica em JSON)
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS usuarios (
+    id TEXT PRIMARY KEY,
+    perfil TEXT NOT NULL,
+    metas TEXT NOT NULL DEFAULT '[]',
+    nome TEXT,
+    idade REAL,
+    renda_mensal REAL,
+    perfil_investidor TEXT,
+    versao INTEGER NOT NULL DEFAULT 0,
+    ultima_atualizacao TEXT
+);
+CREATE INDEX IF NOT EXISTS usuarios_perfil_investidor ON usuarios (perfil_investidor);
+CREATE INDEX IF NOT EXISTS usuarios_renda_mensal ON usuarios (renda_mensal);
+CREATE INDEX IF NOT EXISTS usuarios_ultima_atualizacao ON usuarios (ultima_atualizacao);
+CREATE TABLE IF NOT EXISTS interacoes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    usuario_id TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    mensagem TEXT,
+    resposta TEXT,
+    dados_extraidos TEXT
+);
+CREATE INDEX IF NOT EXISTS interacoes_timestamp ON interacoes (timestamp);
+CREATE INDEX IF NOT EXISTS interacoes_usuario ON interacoes (usuario_id, timestamp);
+"""
+
+_UPSERT_USER = """
+INSERT INTO usuarios (id, perfil, metas, nome, idade, renda_mensal, perfil_investidor, versao, ultima_atualizacao)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (id) DO UPDATE SET
+    perfil = excluded.perfil,
+    metas = excluded.metas,
+    nome = excluded.nome,
+    idade = excluded.idade,
+    renda_mensal = excluded.renda_mensal,
+    perfil_investidor = excluded.perfil_investidor,
+    versao = excluded.versao,
+    ultima_atualizacao = excluded.ultima_atualizacao
+"""
+_SELECT_USER = "SELECT perfil, metas FROM usuarios WHERE id = ?"
+_INSERT_INTERACTION = """
+INSERT INTO interacoes (usuario_id, timestamp, mensagem, resposta, dados_extraidos)
+VALUES (?, ?, ?, ?, ?)
+"""
+
+
+class SqliteStorage(Storage):
+    """
+    Perfis e interações num banco SQLite em modo WAL.
+
+    - Uma conexão por thread (leitores não bloqueiam o gravador no WAL)
+    - Consultas com parâmetros e SQL fixo, reaproveitadas pelo cache de
+      comandos preparados de cada conexão
+    - Interações inseridas em lote: a cada `batch_size` registros,
+      `batch_interval` segundos, em scan_interactions() e em close()
+    """
+
+    def __init__(
+        self,
+        path: Path = config.STORAGE_SQLITE_PATH,
+        batch_size: int = config.STORAGE_BATCH_SIZE,
+        batch_interval: float = config.STORAGE_BATCH_INTERVAL,
+        busy_timeout: float = config.STORAGE_BUSY_TIMEOUT
+    ):
+        """
+        Args:
+            path: Arquivo do banco
+            batch_size: Interações acumuladas antes de inserir
+            batch_interval: Segundos máximos de uma interação acumulada
+            busy_timeout: Segundos esperando o lock de escrita de outra conexão
+        """
+        self.path = Path(path)
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        self._connections: list[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+        self._pending: list[tuple] = []
+        self._pending_since = 0.0
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        connection = self._connection()
+        connection.executescript(_SCHEMA)
+
+    def key(self, user_id: str) -> tuple:
+        return (STORAGE_SQLITE, str(self.path), user_id)
+
+    def load_user(self, user_id: str) -> Optional[dict]:
+        row = self._connection().execute(_SELECT_USER, (user_id,)).fetchone()
+        if row is None:
+            return None
+        user = json.loads(row[0])
+        user["metas"] = json.loads(row[1])
+        return user
+
+    def save_user(self, user_id: str, user: dict) -> None:
+        perfil = user.get("perfil_investidor")
+        perfil = perfil.get("valor") if isinstance(perfil, dict) else perfil
+        profile = {key: value for key, value in user.items() if key != "metas"}
+        with self._connection() as connection:
+            connection.execute(_UPSERT_USER, (
+                user_id,
+                json.dumps(profile, ensure_ascii=False),
+                json.dumps(user.get("metas") or [], ensure_ascii=False),
+                user.get("nome"),
+                _number(user.get("idade")),
+                _number(user.get("renda_mensal")),
+                perfil,
+                user.get("versao") or 0,
+                user.get("ultima_atualizacao"),
+            ))
+
+    def append_interaction(self, user_id: str, record: dict) -> None:
+        row = (
+            user_id,
+            record["timestamp"],
+            record.get("mensagem"),
+            record.get("resposta"),
+            json.dumps(record.get("dados_extraidos"), ensure_ascii=False),
+        )
+        with self._lock:
+            if not self._pending:
+                self._pending_since = time.monotonic()
+            self._pending.append(row)
+            full = (
+                len(self._pending) >= self.batch_size
+                or time.monotonic() - self._pending_since >= self.batch_interval
+            )
+        if full:
+            self.flush()
+
+    def flush(self) -> None:
+        """Insere as interações acumuladas numa transação só"""
+        with self._lock:
+            rows, self._pending = self._pending, []
+        if not rows:
+            return
+        try:
+            with self._connection() as connection:
+                connection.executemany(_INSERT_INTERACTION, rows)
+        except sqlite3.Error:
+            INTERACTION_LOG_RECORDS.inc(len(rows), status="error")
+            raise
+        INTERACTION_LOG_RECORDS.inc(len(rows), status="ok")
+        STORAGE_BATCHES.observe(len(rows))
+
+    def scan_interactions(
+        self, start: Optional[datetime] = None, end: Optional[datetime] = None
+    ) -> Iterator[dict]:
+        self.flush()
+        query = "SELECT timestamp, mensagem, resposta, dados_extraidos FROM interacoes"
+        conditions, params = [], []
+        if start is not None:
+            conditions.append("timestamp >= ?")
+            params.append(start.isoformat())
+        if end is not None:
+            conditions.append("timestamp < ?")
+            params.append(end.isoformat())
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY id"
+
+        for timestamp, mensagem, resposta, dados in self._connection().execute(query, params):
+            yield {
+                "timestamp": timestamp,
+                "mensagem": mensagem,
+                "resposta": resposta,
+                "dados_extraidos": json.loads(dados) if dados is not None else None,
+            }
+
+    def close(self) -> None:
+        """Insere o que falta e fecha as conexões de todas as threads"""
+        self.flush()
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for connection in connections:
+            connection.close()
+        self._local = threading.local()
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(
+                self.path, timeout=self.busy_timeout, check_same_thread=False
+            )
+            connection.execute("PRAGMA journal_mode=WAL")
+            # No WAL, NORMAL só perde transações numa queda do sistema, não do processo
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+            with self._lock:
+                self._connections.append(connection)
+        return connection
+
+
+def _number(value) -> Optional[float]:
+    return value if isinstance(value, (int, float)) and not isinstance(value, bool) else None
+
+
+_sqlite: dict[Path, SqliteStorage] = {}
+_sqlite_lock = threading.Lock()
+
+
+def sqlite_storage(path: Optional[Path] = None) -> SqliteStorage:
+    """Retorna o banco SQLite compartilhado pelo processo (fechado no fim dele)"""
+    path = Path(path if path is not None else config.STORAGE_SQLITE_PATH).resolve()
+    with _sqlite_lock:
+        storage = _sqlite.get(path)
+        if storage is None:
+            storage = _sqlite[path] = SqliteStorage(path)
+            atexit.register(storage.close)
+        return storage
+
+
+def default_storage(user_file: Path, interactions: Optional[InteractionLog] = None) -> Storage:
+    """Armazenamento escolhido por config.STORAGE_BACKEND"""
+    if config.STORAGE_BACKEND == STORAGE_SQLITE:
+        return sqlite_storage()
+    return JsonStorage(user_file, interactions)
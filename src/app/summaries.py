@@ -0,0 +1,84 @@
+"""
+Resumo incremental do histórico da conversa
+"""
+import hashlib
+import json
+from typing import Optional
+
+import config
+from cache import ResponseCache
+
+
+def prefix_keys(messages: list[dict], seed: str = "") -> list[str]:
+    """
+    Chaves encadeadas dos prefixos do histórico.
+
+    keys[i] identifica messages[:i + 1]: cada chave é o hash da anterior
+    com a mensagem seguinte, então calcular todas custa O(n) e históricos
+    que começam igual compartilham as mesmas chaves.
+
+    Args:
+        messages: Mensagens {"role", "content"}
+        seed: Valor inicial da cadeia (muda quando as instruções do resumo mudam)
+    """
+    keys = []
+    key = hashlib.sha256(seed.encode("utf-8")).hexdigest()
+    for message in messages:
+        canonical = json.dumps(
+            {"role": message.get("role"), "content": message.get("content")},
+            ensure_ascii=False,
+            sort_keys=True,
+            separators=(",", ":"),
+        )
+        key = hashlib.sha256(f"{key}:{canonical}".encode("utf-8")).hexdigest()
+        keys.append(key)
+    return keys
+
+
+class RollingSummary:
+    """
+    Resumos da parte antiga da conversa, memorizados por prefixo.
+
+    A cada turno o agente busca o maior prefixo já resumido e só manda ao
+    LLM as mensagens que envelheceram depois dele, junto com o resumo
+    anterior. Com o nível em disco do ResponseCache, os resumos sobrevivem
+    a reinícios do processo.
+    """
+
+    def __init__(self, cache: Optional[ResponseCache] = None, seed: str = ""):
+        """
+        Args:
+            cache: Onde os resumos ficam guardados (padrão: definido por
+                config.SUMMARY_CACHE_*)
+            seed: Identifica as instruções do resumo; resumos feitos com
+                outras instruções não são reaproveitados
+        """
+        if cache is None:
+            cache = ResponseCache(
+                max_size=config.SUMMARY_CACHE_SIZE,
+                ttl=None,
+                disk_path=config.SUMMARY_CACHE_PATH if config.SUMMARY_CACHE_DISK else None,
+            )
+        self.cache = cache
+        self.seed = seed
+
+    def lookup(self, messages: list[dict]) -> tuple[int, Optional[str]]:
+        """
+        Maior prefixo de `messages` que já tem resumo.
+
+        Returns:
+            Tupla (mensagens cobertas, resumo); (0, None) se não houver
+        """
+        keys = prefix_keys(messages, self.seed)
+        for covered in range(len(keys), 0, -1):
+            entry = self.cache.get(keys[covered - 1])
+            if entry is not None:
+                return covered, entry["resumo"]
+        return 0, None
+
+    def store(self, messages: list[dict], summary: str) -> None:
+        """Guarda o resumo que cobre todas as `messages`"""
+        if not messages:
+            return
+        key = prefix_keys(messages, self.seed)[-1]
+        self.cache.set(key, {"resumo": summary, "mensagens": len(messages)})
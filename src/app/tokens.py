@@ -0,0 +1,85 @@
+"""
+Estimativa local de tokens e ajuste de prompts ao orçamento
+"""
+import math
+import re
+
+import config
+
+# Custo fixo aproximado de cada mensagem no formato de chat (papel, separadores)
+MESSAGE_OVERHEAD = 4
+
+_PIECES = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+
+TRUNCATION_MARKER = "\n[...]\n"
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estima a quantidade de tokens de um texto sem depender do tokenizer do modelo.
+
+    Palavras curtas contam como um token e palavras longas como um token a
+    cada 4 caracteres; cada sinal de pontuação conta como um token. Para
+    português com tokenizers BPE a estimativa fica próxima, com leve sobra.
+
+    Args:
+        text: Texto a estimar
+
+    Returns:
+        Quantidade estimada de tokens
+    """
+    if not text:
+        return 0
+    return sum(
+        max(1, math.ceil(len(piece) / 4))
+        for piece in _PIECES.findall(text)
+    )
+
+
+def estimate_message_tokens(message: dict) -> int:
+    """Estima os tokens de uma mensagem de chat, incluindo o custo fixo"""
+    return estimate_tokens(str(message.get("content") or "")) + MESSAGE_OVERHEAD
+
+
+def estimate_messages_tokens(messages: list[dict]) -> int:
+    """Estima os tokens de uma lista de mensagens de chat"""
+    return sum(estimate_message_tokens(m) for m in messages)
+
+
+def max_input_tokens(model: str) -> int:
+    """Orçamento de tokens de entrada configurado para o modelo"""
+    return config.MODEL_MAX_INPUT_TOKENS.get(model, config.LLM_MAX_INPUT_TOKENS)
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """
+    Reduz o texto para caber em `max_tokens`, preservando início e fim.
+
+    Mantém cerca de 2/3 do orçamento no início e 1/3 no final, que é onde
+    costumam estar a pergunta e o contexto mais relevantes de textos colados.
+
+    Args:
+        text: Texto original
+        max_tokens: Limite de tokens
+
+    Returns:
+        Texto truncado (ou o original, se já couber)
+    """
+    tokens = estimate_tokens(text)
+    if tokens <= max_tokens:
+        return text
+    if max_tokens <= 0:
+        return ""
+
+    chars_per_token = len(text) / tokens
+    budget_chars = int((max_tokens - estimate_tokens(TRUNCATION_MARKER)) * chars_per_token)
+    if budget_chars <= 0:
+        return ""
+
+    while True:
+        head = budget_chars * 2 // 3
+        tail = budget_chars - head
+        truncated = text[:head] + TRUNCATION_MARKER + (text[-tail:] if tail else "")
+        if estimate_tokens(truncated) <= max_tokens or budget_chars <= 1:
+            return truncated
+        budget_chars = int(budget_chars * 0.9)
@@ -0,0 +1,152 @@
+"""
+Ferramentas (function calling) oferecidas ao LLM
+"""
+import json
+from typing import Callable, Iterable, Optional
+
+from exceptions import ValidationError
+from metrics import LLM_TOOL_CALLS
+
+
+class ToolSet:
+    """
+    Conjunto de funções locais que o LLM pode chamar.
+
+    O LLM só escolhe a ferramenta e os parâmetros; a execução é local e o
+    resultado volta ao modelo como mensagem "tool" em JSON.
+    """
+
+    def __init__(self):
+        self._functions: dict[str, Callable] = {}
+        self.schemas: list[dict] = []
+
+    def add(
+        self,
+        function: Callable,
+        name: str,
+        description: str,
+        parameters: dict,
+        required: Optional[Iterable[str]] = None
+    ) -> None:
+        """
+        Registra uma ferramenta.
+
+        Args:
+            function: Função chamada com os argumentos do LLM por nome
+            name: Nome visto pelo LLM
+            description: Quando usar a ferramenta
+            parameters: Propriedades do JSON Schema dos argumentos
+            required: Argumentos obrigatórios (padrão: todos)
+        """
+        self._functions[name] = function
+        self.schemas.append({
+            "type": "function",
+            "function": {
+                "name": name,
+                "description": description,
+                "parameters": {
+                    "type": "object",
+                    "properties": parameters,
+                    "required": list(required if required is not None else parameters),
+                },
+            },
+        })
+
+    @property
+    def names(self) -> list[str]:
+        return list(self._functions)
+
+    def request_kwargs(self) -> dict:
+        """Parâmetros da chamada à API que oferecem as ferramentas"""
+        return {"tools": self.schemas, "tool_choice": "auto"}
+
+    def run(self, name: str, arguments) -> str:
+        """
+        Executa uma ferramenta.
+
+        Erros de argumento não interrompem a conversa: voltam ao LLM como
+        {"erro": ...} para que ele corrija os parâmetros ou explique.
+
+        Args:
+            name: Nome da ferramenta
+            arguments: Argumentos em JSON (como vêm da API) ou dicionário
+
+        Returns:
+            Resultado serializado em JSON
+        """
+        function = self._functions.get(name)
+        if function is None:
+            result, status = {"erro": f"ferramenta desconhecida: {name}"}, "unknown"
+        else:
+            try:
+                result, status = function(**_parse_arguments(arguments)), "ok"
+            except (ValueError, TypeError, ValidationError) as e:
+                result, status = {"erro": str(e)}, "invalid"
+
+        LLM_TOOL_CALLS.inc(tool=name, status=status)
+        return json.dumps(result, ensure_ascii=False)
+
+    def tool_messages(self, calls: list[dict], content: Optional[str] = None) -> list[dict]:
+        """
+        Mensagens que continuam a conversa depois das chamadas de ferramenta:
+        a mensagem da assistente com as chamadas e um resultado por chamada.
+        """
+        messages = [{
+            "role": "assistant",
+            "content": content,
+            "tool_calls": [
+                {
+                    "id": call["id"],
+                    "type": "function",
+                    "function": {"name": call["name"], "arguments": call["arguments"]},
+                }
+                for call in calls
+            ],
+        }]
+        for call in calls:
+            messages.append({
+                "role": "tool",
+                "tool_call_id": call["id"],
+                "content": self.run(call["name"], call["arguments"]),
+            })
+        return messages
+
+
+class ToolCallAccumulator:
+    """Junta as chamadas de ferramenta que chegam em pedaços no streaming"""
+
+    def __init__(self):
+        self._calls: dict[int, dict] = {}
+
+    def add(self, deltas) -> None:
+        for delta in deltas or ():
+            index = getattr(delta, "index", None)
+            if index is None:
+                index = len(self._calls)
+            call = self._calls.setdefault(index, {"id": "", "name": "", "arguments": ""})
+            if getattr(delta, "id", None):
+                call["id"] = delta.id
+            function = getattr(delta, "function", None)
+            if function is not None:
+                call["name"] += getattr(function, "name", None) or ""
+                call["arguments"] += getattr(function, "arguments", None) or ""
+
+    def calls(self) -> list[dict]:
+        return [self._calls[index] for index in sorted(self._calls)]
+
+
+def tool_calls_from_message(message) -> list[dict]:
+    """Chamadas de ferramenta de uma resposta completa (sem streaming)"""
+    return [
+        {"id": call.id, "name": call.function.name, "arguments": call.function.arguments}
+        for call in getattr(message, "tool_calls", None) or ()
+    ]
+
+
+def _parse_arguments(arguments) -> dict:
+    if isinstance(arguments, str):
+        arguments = json.loads(arguments or "{}")
+    if not isinstance(arguments, dict):
+        raise ValidationError("os argumentos devem ser um objeto JSON")
+    # Modelos costumam mandar null nos opcionais: vale o padrão da função
+    return {key: value for key, value in arguments.items() if value is not None}
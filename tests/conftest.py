@@ -43,12 +43,30 @@ class MockLLMManager:
 
     def __init__(self, provider: MockLLMProvider = None):
         self.provider = provider or MockLLMProvider()
+        self.routes = []
+        self.tools = []
+        self.deadlines = []
 
-    def generate_answer(self, messages_prompt: list[dict]) -> dict:
+    def generate_answer(self, messages_prompt: list[dict], route: str = None, tools=None, deadline=None) -> dict:
         """Retorna resposta parseada"""
+        self.routes.append(route)
+        self.tools.append(tools)
+        self.deadlines.append(deadline)
         response = self.provider.generate_answer(messages_prompt)
         return json.loads(response)
 
+    def stream_answer(self, messages_prompt: list[dict], route: str = None, tools=None, deadline=None):
+        """Simula o streaming entregando a resposta completa de uma vez"""
+        yield self.generate_answer(messages_prompt, route, tools, deadline)
+
+    async def agenerate_answer(self, messages_prompt: list[dict], route: str = None, tools=None, deadline=None) -> dict:
+        """Versão assíncrona de generate_answer"""
+        return self.generate_answer(messages_prompt, route, tools, deadline)
+
+    async def astream_answer(self, messages_prompt: list[dict], route: str = None, tools=None, deadline=None):
+        """Versão assíncrona de stream_answer"""
+        yield self.generate_answer(messages_prompt, route, tools, deadline)
+
 
 @pytest.fixture
 def temp_dir():
@@ -72,7 +90,11 @@ def temp_user_file(temp_dir):
 def mock_data_manager(temp_user_file):
     """Fixture para DataManager com arquivo temporário"""
     from data import DataManager
-    return DataManager(user_file=temp_user_file)
+    from interaction_log import InteractionLog
+    return DataManager(
+        user_file=temp_user_file,
+        interactions=InteractionLog(temp_user_file.parent / "interacoes"),
+    )
 
 
 @pytest.fixture
@@ -95,19 +117,29 @@ def mock_llm_manager(mock_llm_provider):
 
 
 @pytest.fixture
-def mock_agent(mock_data_manager, mock_validator, mock_llm_manager):
+def summaries(temp_dir):
+    """Fixture para resumos do histórico gravados em diretório temporário"""
+    from agent import SQUASH_INSTRUCTIONS
+    from cache import ResponseCache
+    from summaries import RollingSummary
+    return RollingSummary(ResponseCache(ttl=None, disk_path=temp_dir / "resumos"), seed=SQUASH_INSTRUCTIONS)
+
+
+@pytest.fixture
+def mock_agent(mock_data_manager, mock_validator, mock_llm_manager, summaries):
     """Fixture para FinancialAgent completo"""
     from agent import FinancialAgent
     agent = FinancialAgent(
         data_manager=mock_data_manager,
         validator=mock_validator,
-        llm_manager=mock_llm_manager
+        llm_manager=mock_llm_manager,
+        summaries=summaries
     )
     return agent
 
 
 @pytest.fixture
-def mock_agent_with_extraction(mock_data_manager, mock_validator):
+def mock_agent_with_extraction(mock_data_manager, mock_validator, summaries):
     """Fixture para FinancialAgent que extrai renda"""
     from agent import FinancialAgent
     
@@ -128,7 +160,8 @@ def mock_agent_with_extraction(mock_data_manager, mock_validator):
     agent = FinancialAgent(
         data_manager=mock_data_manager,
         validator=mock_validator,
-        llm_manager=MockLLMManager(provider=provider)
+        llm_manager=MockLLMManager(provider=provider),
+        summaries=summaries
     )
     return agent
 
@@ -2,6 +2,7 @@
 Testes para o agente financeiro principal
 """
 import pytest
+import asyncio
 import sys
 from pathlib import Path
 
@@ -72,13 +73,98 @@ class TestProcessMessage:
         assert resposta is not None
 
 
+class TestSemanticCacheNoAgente:
+    """Testes para o uso do cache semântico pelo agente"""
+
+    def test_pergunta_parecida_nao_chama_llm(self, mock_agent):
+        """Testa que pergunta reescrita é respondida pelo cache"""
+        mock_agent.process_message("Vale mais pagar à vista ou parcelar?", [])
+        mock_agent.llm_manager.provider.last_prompt = None
+
+        resposta = mock_agent.process_message("compensa parcelar ou pagar à vista?", [])
+
+        assert resposta == "Resposta mockada do assistente."
+        assert mock_agent.llm_manager.provider.last_prompt is None
+
+    def test_continuacao_depende_do_turno_anterior(self, mock_agent):
+        """Testa que a mesma pergunta de continuação em outra conversa não usa o cache"""
+        pergunta = "e se for parcelado em 24 meses?"
+        conversa_a = [
+            {"role": "user", "content": "quanto junto guardando 500 por mês?"},
+            {"role": "assistant", "content": "Guardando R$ 500 por mês..."},
+        ]
+        conversa_b = [
+            {"role": "user", "content": "vale a pena comprar um carro de 60 mil?"},
+            {"role": "assistant", "content": "Um carro de R$ 60.000..."},
+        ]
+        mock_agent.process_message(pergunta, conversa_a)
+        mock_agent.llm_manager.provider.last_prompt = None
+
+        mock_agent.process_message(pergunta, conversa_b)
+        assert mock_agent.llm_manager.provider.last_prompt is not None
+
+        mock_agent.llm_manager.provider.last_prompt = None
+        mock_agent.process_message(pergunta, conversa_a)
+        assert mock_agent.llm_manager.provider.last_prompt is None
+
+    def test_resposta_com_extracao_nao_vai_para_cache(self, mock_agent_with_extraction):
+        """Testa que respostas que extraíram dados não são reaproveitadas"""
+        mock_agent_with_extraction.process_message("minha renda mensal é 5000 reais", [])
+        assert mock_agent_with_extraction.semantic_cache.stats()["size"] == 0
+
+
+class TestStreamMessage:
+    """Testes para processamento de mensagens em streaming"""
+
+    def test_stream_message_produz_resposta(self, mock_agent):
+        """Testa que o stream termina com a resposta completa"""
+        partes = list(mock_agent.stream_message("olá", []))
+        assert partes[-1] == "Resposta mockada do assistente."
+
+    def test_stream_message_persiste_ao_final(self, mock_agent_with_extraction):
+        """Testa que dados extraídos são salvos ao final do stream"""
+        list(mock_agent_with_extraction.stream_message("minha renda é 5000", []))
+
+        user_reloaded = mock_agent_with_extraction.data_manager.load_user()
+        assert user_reloaded["renda_mensal"] == 5000.0
+
+
+class TestAsyncProcessMessage:
+    """Testes para o processamento assíncrono"""
+
+    def test_aprocess_message_retorna_string(self, mock_agent):
+        """Testa que aprocess_message retorna a resposta"""
+        resposta = asyncio.run(mock_agent.aprocess_message("olá", []))
+        assert resposta == "Resposta mockada do assistente."
+
+    def test_aprocess_message_persiste(self, mock_agent_with_extraction):
+        """Testa que dados extraídos são persistidos no fluxo assíncrono"""
+        asyncio.run(mock_agent_with_extraction.aprocess_message("minha renda é 5000", []))
+
+        user_reloaded = mock_agent_with_extraction.data_manager.load_user()
+        assert user_reloaded["renda_mensal"] == 5000.0
+
+    def test_astream_message(self, mock_agent):
+        """Testa o streaming assíncrono com histórico longo"""
+        history = [
+            {"role": "user" if i % 2 == 0 else "assistant", "content": f"msg{i}"}
+            for i in range(8)
+        ]
+
+        async def coletar():
+            return [parte async for parte in mock_agent.astream_message("oi", history)]
+
+        partes = asyncio.run(coletar())
+        assert partes[-1] == "Resposta mockada do assistente."
+
+
 class TestExtractFacts:
     """Testes para extração de fatos do usuário"""
 
     def test_extract_facts_usuario_vazio(self, mock_agent):
         """Testa extração de fatos com usuário vazio"""
         fatos = mock_agent._extract_facts({})
-        assert fatos == set()
+        assert fatos == []
 
     def test_extract_facts_com_renda(self, mock_agent, mock_usuario):
         """Testa extração de renda"""
@@ -112,6 +198,44 @@ class TestExtractFacts:
         fatos = mock_agent._extract_facts(mock_usuario)
         assert any("Meta" in f for f in fatos)
 
+    def test_fatos_em_ordem_deterministica(self, mock_agent, mock_usuario):
+        from agent import order_facts
+        fatos = mock_agent._extract_facts(mock_usuario)
+
+        assert isinstance(fatos, list)
+        assert fatos == order_facts(set(fatos))
+        assert fatos[0].startswith("Nome")
+
+    def test_fatos_reaproveitados_ate_o_perfil_mudar(self, mock_agent, mock_usuario):
+        """Testa que os fatos só são renderizados de novo com nova versão do perfil"""
+        mock_usuario["versao"] = 1
+        fatos = mock_agent._extract_facts(mock_usuario)
+        assert mock_agent._extract_facts(mock_usuario) is fatos
+
+        mock_agent.data_manager.update_user(mock_usuario, {"renda_mensal": 9000.0})
+
+        novos = mock_agent._extract_facts(mock_usuario)
+        assert novos is not fatos
+        assert any("9,000.00" in f for f in novos)
+
+    def test_perfil_sem_versao_nao_usa_cache(self, mock_agent):
+        usuario = {"nome": "Ana"}
+        mock_agent._extract_facts(usuario)
+        usuario["nome"] = "Bia"
+
+        assert mock_agent._extract_facts(usuario) == ["Nome: Bia"]
+
+    def test_bloco_de_contexto_identico_entre_turnos(self, mock_agent, mock_usuario):
+        """Testa que o prompt reaproveita a mensagem de contexto pronta"""
+        mock_usuario["versao"] = 1
+        primeiro = mock_agent._make_prompt("oi", [], mock_agent._extract_facts(mock_usuario))
+        segundo = mock_agent._make_prompt("tudo bem?", [], mock_agent._extract_facts(mock_usuario))
+
+        contexto = mock_agent._facts_block.message
+        assert any(m is contexto for m in primeiro)
+        assert any(m is contexto for m in segundo)
+        assert "Nome: João Silva" in contexto["content"]
+
 
 class TestSanitizeHistory:
     """Testes para sanitização do histórico"""
@@ -170,6 +294,86 @@ class TestSquashHistory:
         assert result[-6]["content"] == "msg19"
 
 
+class TestIncrementalSummary:
+    """Testes para o resumo incremental e memorizado do histórico"""
+
+    def _history(self, size):
+        return [
+            {"role": "user" if i % 2 == 0 else "assistant", "content": f"msg{i}"}
+            for i in range(size)
+        ]
+
+    def test_resumo_e_texto(self, mock_agent):
+        """Testa que o histórico compactado traz o texto do resumo, não o dict"""
+        result = mock_agent._squash_history(self._history(8))
+
+        assert result[0]["content"] == "Resumo da conversa anterior:\nResposta mockada do assistente."
+
+    def test_turno_seguinte_reaproveita_resumo(self, mock_agent):
+        """Testa que poucas mensagens novas não geram outra chamada de resumo"""
+        mock_agent._squash_history(self._history(8))
+        result = mock_agent._squash_history(self._history(10))
+
+        assert mock_agent.llm_manager.routes == ["summary"]
+        assert [m["content"] for m in result[1:]] == [f"msg{i}" for i in range(6, 10)]
+
+    def test_resume_so_mensagens_novas(self, mock_agent, monkeypatch):
+        """Testa que o resumo seguinte recebe o anterior e só as mensagens novas"""
+        import config
+        monkeypatch.setattr(config, "SUMMARY_FOLD_BATCH", 2)
+        prompts = []
+        original = mock_agent.llm_manager.generate_answer
+
+        def generate_answer(messages_prompt, **kwargs):
+            prompts.append(messages_prompt[-1]["content"])
+            return original(messages_prompt, **kwargs)
+
+        mock_agent.llm_manager.generate_answer = generate_answer
+        mock_agent._squash_history(self._history(8))
+        result = mock_agent._squash_history(self._history(10))
+
+        assert len(prompts) == 2
+        assert "Resposta mockada do assistente." in prompts[1]
+        assert "msg6" in prompts[1] and "msg7" in prompts[1]
+        assert "msg5" not in prompts[1]
+        assert len(result) == 3
+
+    def test_resumo_persistido_entre_agentes(self, mock_agent, mock_data_manager, mock_validator, summaries):
+        """Testa que outro processo reaproveita o resumo gravado em disco"""
+        from agent import FinancialAgent
+        from cache import ResponseCache
+        from summaries import RollingSummary
+        from conftest import MockLLMManager
+
+        mock_agent._squash_history(self._history(8))
+        restarted = FinancialAgent(
+            data_manager=mock_data_manager,
+            validator=mock_validator,
+            llm_manager=MockLLMManager(),
+            summaries=RollingSummary(
+                ResponseCache(ttl=None, disk_path=summaries.cache.disk_path),
+                seed=summaries.seed,
+            ),
+        )
+
+        restarted._squash_history(self._history(8))
+
+        assert restarted.llm_manager.routes == []
+
+    def test_sem_tempo_usa_resumo_anterior(self, mock_agent, monkeypatch):
+        """Testa que, sem prazo para resumir, o último resumo segue valendo"""
+        import config
+        from resilience import Deadline
+        mock_agent._squash_history(self._history(8))
+        monkeypatch.setattr(config, "TURN_ANSWER_RESERVE", 1000)
+
+        result = mock_agent._squash_history(self._history(14), deadline=Deadline(30))
+
+        assert mock_agent.llm_manager.routes == ["summary"]
+        assert result[0]["role"] == "system"
+        assert [m["content"] for m in result[1:]] == [f"msg{i}" for i in range(6, 14)]
+
+
 class TestMakePrompt:
     """Testes para construção do prompt"""
 
@@ -203,6 +407,102 @@ class TestMakePrompt:
         assert any("msg anterior" in m.get("content", "") for m in messages)
 
 
+class TestPromptLayout:
+    """Testes para o layout de prefixo estável do prompt"""
+
+    def test_instrucoes_fixas_antes_dos_fatos(self, mock_agent, monkeypatch):
+        """Testa a ordem: instruções, fatos, histórico e mensagem do usuário"""
+        monkeypatch.setattr("config.PROMPT_LAYOUT", "stable")
+        history = [{"role": "user", "content": "msg anterior"}]
+
+        messages = mock_agent._make_prompt("oi", history, {"Idade: 30 anos"})
+
+        from agent import FORMAT_PROMPT, SYSTEM_PROMPT
+        assert messages[0]["content"] == FORMAT_PROMPT
+        assert messages[1]["content"] == SYSTEM_PROMPT
+        assert "INFORMAÇÕES" in messages[2]["content"]
+        assert messages[3]["content"] == "msg anterior"
+        assert messages[4]["content"] == "oi"
+
+    def test_layout_legado(self, mock_agent, monkeypatch):
+        """Testa que o layout legado mantém os fatos no índice 1"""
+        monkeypatch.setattr("config.PROMPT_LAYOUT", "legacy")
+
+        messages = mock_agent._make_prompt("oi", [], {"Idade: 30 anos"})
+
+        assert "INFORMAÇÕES" in messages[1]["content"]
+
+    def test_fatos_em_ordem_fixa(self, mock_agent):
+        """Testa que a ordem dos fatos independe da ordem do set"""
+        fatos = ["Meta: Casa", "Renda mensal: R$ 5,000.00", "Nome: Ana", "Idade: 30 anos", "Meta: Carro"]
+
+        a = mock_agent._make_prompt("oi", [], set(fatos))
+        b = mock_agent._make_prompt("oi", [], set(reversed(fatos)))
+
+        assert a == b
+        context = a[2]["content"]
+        posicoes = [context.index(f) for f in ("Nome", "Idade", "Renda", "Meta: Carro", "Meta: Casa")]
+        assert posicoes == sorted(posicoes)
+
+    def test_relatorio_de_prefixo(self, mock_agent):
+        """Testa que turnos seguidos reaproveitam o prefixo fixo"""
+        mock_agent._make_prompt("primeira", [], {"Nome: Ana"})
+        assert mock_agent.last_prompt_report["prefix_shared_tokens"] == 0
+
+        mock_agent._make_prompt("segunda", [{"role": "user", "content": "primeira"}], {"Nome: Ana"})
+        report = mock_agent.last_prompt_report
+
+        assert report["prefix_shared_messages"] == 4
+        assert 0.5 < report["prefix_ratio"] < 1
+
+
+class TestPromptBudget:
+    """Testes para o orçamento de tokens do prompt"""
+
+    def _history(self, n, tamanho=50):
+        return [
+            {"role": "user" if i % 2 == 0 else "assistant", "content": f"msg{i} " + "texto " * tamanho}
+            for i in range(n)
+        ]
+
+    def test_dentro_do_orcamento_nada_muda(self, mock_agent):
+        """Testa que prompts pequenos não são cortados"""
+        history = self._history(2, tamanho=5)
+        messages = mock_agent._make_prompt("oi", history, set(), max_tokens=100000)
+
+        assert len(messages) == 5
+        assert mock_agent.last_prompt_report["dropped_history"] == 0
+        assert mock_agent.last_prompt_report["estimated_tokens"] > 0
+
+    def test_corta_historico_mais_antigo_primeiro(self, mock_agent):
+        """Testa que o histórico antigo sai antes de qualquer outra parte"""
+        history = self._history(6)
+        completo = mock_agent._make_prompt("oi", history, set(), max_tokens=100000)
+        limite = mock_agent.last_prompt_report["estimated_tokens"] - 60
+
+        messages = mock_agent._make_prompt("oi", history, set(), max_tokens=limite)
+        report = mock_agent.last_prompt_report
+
+        assert report["dropped_history"] == 1
+        assert not report["compact_system_prompt"]
+        assert report["estimated_tokens"] <= limite
+        assert len(messages) == len(completo) - 1
+        assert not any(m["content"].startswith("msg0") for m in messages)
+
+    def test_mensagem_gigante_e_truncada(self, mock_agent):
+        """Testa que uma mensagem colada enorme cabe no orçamento"""
+        mensagem = "extrato " + "compra mercado R$ 123,45 " * 5000
+        messages = mock_agent._make_prompt(mensagem, self._history(4), {"Nome: Ana"}, max_tokens=2000)
+        report = mock_agent.last_prompt_report
+
+        assert report["compact_system_prompt"]
+        assert report["truncated_user_message"]
+        assert report["dropped_history"] == 4
+        assert report["estimated_tokens"] <= 2000
+        assert len(messages[-1]["content"]) < len(mensagem)
+        assert any("INFORMAÇÕES" in m["content"] for m in messages)
+
+
 class TestDataExtraction:
     """Testes para extração de dados via LLM"""
 
@@ -220,6 +520,308 @@ class TestDataExtraction:
         assert user_reloaded["renda_mensal"] == 5000.0
 
 
+class TestBackgroundCompaction:
+    """Testes para a compactação do histórico fora do caminho da resposta"""
+
+    @pytest.fixture
+    def agent(self, mock_agent):
+        from agent import COMPACTION_BACKGROUND
+        from compaction import CompactionWorker
+        mock_agent.compaction_mode = COMPACTION_BACKGROUND
+        mock_agent.compaction = CompactionWorker(max_pending=4, workers=1)
+        return mock_agent
+
+    def _history(self, size):
+        return [
+            {"role": "user" if i % 2 == 0 else "assistant", "content": f"msg{i}"}
+            for i in range(size)
+        ]
+
+    def test_sem_resumo_pronto_usa_historico(self, agent):
+        """Testa que o turno não espera o resumo e o seguinte já o usa"""
+        result = agent._squash_history(self._history(8))
+        assert result == self._history(8)
+
+        assert agent.wait_extractions(timeout=5)
+        result = agent._squash_history(self._history(10))
+
+        assert agent.llm_manager.routes == ["summary"]
+        assert result[0]["content"].startswith("Resumo da conversa anterior:")
+        assert [m["content"] for m in result[1:]] == [f"msg{i}" for i in range(6, 10)]
+
+    def test_usa_resumo_anterior_enquanto_compacta(self, agent):
+        from metrics import HISTORY_SUMMARY_STALENESS
+        agent._squash_history(self._history(8))
+        agent.wait_extractions(timeout=5)
+        antes = HISTORY_SUMMARY_STALENESS.snapshot().get("", {"count": 0})["count"]
+
+        result = agent._squash_history(self._history(14))
+
+        assert [m["content"] for m in result[1:]] == [f"msg{i}" for i in range(6, 14)]
+        assert HISTORY_SUMMARY_STALENESS.snapshot()[""]["count"] == antes + 1
+        assert agent.wait_extractions(timeout=5)
+        assert agent.llm_manager.routes == ["summary", "summary"]
+
+    def test_turno_completo_nao_chama_resumo(self, agent):
+        """Testa que o turno só agenda o resumo, sem chamá-lo antes da resposta"""
+        agendados = []
+
+        class FilaParada:
+            def submit(self, session, function, *args):
+                agendados.append(session)
+                return None
+
+        agent.compaction = FilaParada()
+        agent.process_message("oi", self._history(8))
+
+        assert agendados == [agent.session_id]
+        assert "summary" not in agent.llm_manager.routes
+
+
+class TestBackgroundExtraction:
+    """Testes para a extração de dados fora do caminho da resposta"""
+
+    @pytest.fixture
+    def agent(self, mock_agent_with_extraction):
+        mock_agent_with_extraction.extraction_mode = "background"
+        return mock_agent_with_extraction
+
+    def test_prompt_de_resposta_sem_dados_extraidos(self, agent):
+        """Testa que a chamada de resposta não pede o JSON de extração"""
+        messages = agent._make_prompt("oi", [], set())
+
+        assert "dados_extraidos" not in messages[0]["content"]
+        assert '"resposta"' in messages[0]["content"]
+
+    def test_extrai_depois_da_resposta(self, agent):
+        """Testa que os dados são salvos pela extração em segundo plano"""
+        history = [
+            {"role": "user", "content": "oi"},
+            {"role": "assistant", "content": "Qual a sua renda?"},
+        ]
+        resposta = agent.process_message("5000", history)
+
+        assert resposta == "Entendi! Sua renda mensal é R$ 5.000,00."
+        assert agent.wait_extractions(timeout=5)
+        assert agent.user["renda_mensal"] == 5000.0
+        assert agent.data_manager.load_user()["renda_mensal"] == 5000.0
+
+        from agent import EXTRACTION_PROMPT
+        prompt = agent.llm_manager.provider.last_prompt
+        assert prompt[0]["content"] == EXTRACTION_PROMPT
+        assert prompt[1] == {"role": "assistant", "content": "Qual a sua renda?"}
+        assert prompt[-1] == {"role": "user", "content": "5000"}
+
+    def test_extrai_no_stream_assincrono(self, agent):
+        """Testa a extração em segundo plano no fluxo assíncrono"""
+        async def coletar():
+            return [parte async for parte in agent.astream_message("minha renda é 5000", [])]
+
+        asyncio.run(coletar())
+
+        assert agent.wait_extractions(timeout=5)
+        assert agent.user["renda_mensal"] == 5000.0
+
+    def test_falha_na_extracao_nao_afeta_resposta(self, agent):
+        """Testa que erro na extração só é contabilizado"""
+        from metrics import EXTRACTION_JOBS
+        antes = EXTRACTION_JOBS.value(status="error")
+        agent.process_message("minha renda é 5000", [])
+        agent.wait_extractions(timeout=5)
+
+        def falha(messages_prompt, **kwargs):
+            raise RuntimeError("indisponível")
+
+        agent.llm_manager.generate_answer = falha
+        agent._schedule_extraction("outra", [], {"resposta": "ok"}, set())
+
+        assert agent.wait_extractions(timeout=5)
+        assert EXTRACTION_JOBS.value(status="error") == antes + 1
+
+
+class TestDeltaSchema:
+    """Testes para o esquema delta no agente"""
+
+    @pytest.fixture
+    def agent(self, mock_data_manager, mock_validator):
+        from agent import FinancialAgent
+        from conftest import MockLLMManager, MockLLMProvider
+
+        provider = MockLLMProvider(response_data={"resposta": "Anotado!", "d": {"r": 7000, "i": 35}})
+        return FinancialAgent(
+            data_manager=mock_data_manager,
+            validator=mock_validator,
+            llm_manager=MockLLMManager(provider=provider),
+            extraction_schema="delta",
+        )
+
+    def test_prompt_pede_delta(self, agent):
+        """Testa que o prompt usa o formato delta"""
+        messages = agent._make_prompt("oi", [], set())
+
+        assert '"d"' in messages[0]["content"]
+        assert "dados_extraidos" not in messages[0]["content"]
+
+    def test_delta_atualiza_usuario(self, agent):
+        """Testa que o delta é expandido e persistido"""
+        resposta = agent.process_message("ganho 7 mil e tenho 35 anos", [])
+
+        assert resposta == "Anotado!"
+        user = agent.data_manager.load_user()
+        assert user["renda_mensal"] == 7000
+        assert user["idade"] == 35
+
+    def test_delta_em_segundo_plano(self, agent):
+        """Testa o delta na extração em segundo plano"""
+        from agent import DELTA_EXTRACTION_PROMPT
+        agent.extraction_mode = "background"
+
+        agent.process_message("ganho 7 mil e tenho 35 anos", [])
+
+        assert agent.wait_extractions(timeout=5)
+        assert agent.user["renda_mensal"] == 7000
+        assert agent.llm_manager.provider.last_prompt[0]["content"] == DELTA_EXTRACTION_PROMPT
+
+
+class TestCalculationTools:
+    """Testes para as ferramentas de cálculo nas simulações"""
+
+    def test_simulacao_recebe_ferramentas(self, mock_agent):
+        """Testa que pedidos de cálculo vão com as ferramentas e a rota de simulação"""
+        from calculations import CALCULATION_TOOLS
+
+        mock_agent.process_message("Quanto fica a parcela de 10 mil em 12x a 1% ao mês?", [])
+
+        assert mock_agent.llm_manager.routes[-1] == "simulation"
+        assert mock_agent.llm_manager.tools[-1] is CALCULATION_TOOLS
+
+    def test_conversa_sem_ferramentas(self, mock_agent):
+        """Testa que mensagens que não pedem cálculo não levam as ferramentas"""
+        mock_agent.process_message("Quero organizar minhas finanças pessoais este ano", [])
+
+        assert mock_agent.llm_manager.routes[-1] == "answer"
+        assert mock_agent.llm_manager.tools[-1] is None
+
+    def test_ferramentas_desligadas(self, mock_data_manager, mock_validator, mock_llm_manager, monkeypatch):
+        import config
+        from agent import FinancialAgent
+        monkeypatch.setattr(config, "CALC_TOOLS_ENABLED", False)
+
+        agent = FinancialAgent(
+            data_manager=mock_data_manager,
+            validator=mock_validator,
+            llm_manager=mock_llm_manager
+        )
+        agent.process_message("Vale a pena parcelar ou pagar à vista?", [])
+
+        assert mock_llm_manager.tools[-1] is None
+
+
+class TestDegradedMode:
+    """Testes para as respostas locais com o circuit breaker aberto"""
+
+    def _degrade(self, agent):
+        def degraded(messages_prompt, **kwargs):
+            return {"resposta": "indisponível", "degraded": True}
+        agent.llm_manager.generate_answer = degraded
+
+    def test_resposta_local(self, mock_agent):
+        from agent import DEGRADED_NOTICE
+        self._degrade(mock_agent)
+
+        resposta = mock_agent.process_message("quanto devo guardar?", [])
+
+        assert resposta.startswith(DEGRADED_NOTICE)
+        assert "nome" in resposta
+
+    def test_inclui_resumo_do_perfil(self, mock_agent, mock_usuario):
+        mock_agent.user = mock_usuario
+        self._degrade(mock_agent)
+
+        resposta = mock_agent.process_message("oi", [])
+
+        assert mock_agent.obter_resumo_perfil() in resposta
+
+    def test_turno_degradado_nao_e_salvo(self, mock_agent):
+        self._degrade(mock_agent)
+
+        mock_agent.process_message("minha renda é 5000", [])
+
+        assert mock_agent.data_manager.load_user().get("renda_mensal") is None
+
+    def test_stream_degradado(self, mock_agent):
+        from agent import DEGRADED_NOTICE
+        mock_agent.llm_manager.stream_answer = lambda messages_prompt, **kwargs: iter(
+            [{"resposta": "indisponível", "degraded": True}]
+        )
+
+        partes = list(mock_agent.stream_message("oi", []))
+
+        assert len(partes) == 1
+        assert partes[0].startswith(DEGRADED_NOTICE)
+
+
+class TestTurnDeadline:
+    """Testes para o prazo de ponta a ponta de cada turno"""
+
+    def _history(self, size=8):
+        return [
+            {"role": "user" if i % 2 == 0 else "assistant", "content": f"msg{i}"}
+            for i in range(size)
+        ]
+
+    def test_resposta_recebe_prazo_do_turno(self, mock_agent, monkeypatch):
+        import config
+        monkeypatch.setattr(config, "TURN_TIMEOUT", 30)
+
+        mock_agent.process_message("oi", [])
+
+        deadline = mock_agent.llm_manager.deadlines[-1]
+        assert deadline is not None
+        assert 0 < deadline.remaining() <= 30
+
+    def test_resumo_usa_o_que_sobra_da_reserva(self, mock_agent, monkeypatch):
+        import config
+        from resilience import Deadline
+        monkeypatch.setattr(config, "TURN_ANSWER_RESERVE", 20)
+        monkeypatch.setattr(config, "TURN_SQUASH_TIMEOUT", 10)
+
+        mock_agent._squash_history(self._history(), deadline=Deadline(25))
+
+        assert mock_agent.llm_manager.deadlines[-1].remaining() <= 5
+
+    def test_sem_tempo_trunca_em_vez_de_resumir(self, mock_agent, monkeypatch):
+        import config
+        from resilience import Deadline
+        monkeypatch.setattr(config, "TURN_ANSWER_RESERVE", 1000)
+
+        result = mock_agent._squash_history(self._history(), deadline=Deadline(30))
+
+        assert mock_agent.llm_manager.routes == []
+        assert [m["content"] for m in result] == [f"msg{i}" for i in range(3, 8)]
+
+    def test_resumo_com_erro_trunca(self, mock_agent):
+        from resilience import Deadline
+        mock_agent.llm_manager.generate_answer = lambda messages_prompt, **kwargs: {
+            "resposta": "tempo esgotado", "error": True
+        }
+
+        result = mock_agent._squash_history(self._history(), deadline=Deadline(60))
+
+        assert len(result) == 5
+        assert result[-1]["content"] == "msg7"
+
+    def test_gravacao_adiada_no_fim_do_prazo(self, mock_agent_with_extraction, monkeypatch):
+        import config
+        monkeypatch.setattr(config, "TURN_SAVE_MIN", 10_000)
+        agent = mock_agent_with_extraction
+
+        agent.process_message("minha renda é 5000", [])
+
+        assert agent.wait_extractions(timeout=5)
+        assert agent.data_manager.load_user()["renda_mensal"] == 5000.0
+
+
 class TestObterResumoPerfil:
     """Testes para resumo do perfil"""
 
@@ -0,0 +1,87 @@
+"""
+Testes para o cache de respostas do LLM
+"""
+import pytest
+import time
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src" / "app"))
+
+from cache import ResponseCache, prompt_hash
+
+
+class TestPromptHash:
+    """Testes para o hash canônico do prompt"""
+
+    def test_hash_estavel(self):
+        """Testa que prompts iguais geram o mesmo hash"""
+        a = [{"role": "user", "content": "oi"}]
+        b = [{"content": "oi", "role": "user"}]
+        assert prompt_hash(a, "modelo") == prompt_hash(b, "modelo")
+
+    def test_hash_depende_do_modelo(self):
+        """Testa que o modelo faz parte da chave"""
+        messages = [{"role": "user", "content": "oi"}]
+        assert prompt_hash(messages, "a") != prompt_hash(messages, "b")
+
+    def test_hash_depende_do_conteudo(self):
+        """Testa que conteúdos diferentes geram hashes diferentes"""
+        assert prompt_hash([{"role": "user", "content": "oi"}]) != prompt_hash([{"role": "user", "content": "olá"}])
+
+
+class TestResponseCache:
+    """Testes para o ResponseCache"""
+
+    def test_get_miss_e_hit(self):
+        """Testa contadores de miss e hit"""
+        cache = ResponseCache(max_size=10, ttl=None)
+
+        assert cache.get("chave") is None
+        cache.set("chave", {"resposta": "ok"})
+        assert cache.get("chave") == {"resposta": "ok"}
+
+        stats = cache.stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["hit_rate"] == 0.5
+
+    def test_retorna_copia(self):
+        """Testa que alterar o resultado não altera o cache"""
+        cache = ResponseCache(max_size=10, ttl=None)
+        cache.set("chave", {"resposta": "ok", "dados_extraidos": {"metas": []}})
+
+        valor = cache.get("chave")
+        valor["dados_extraidos"]["metas"].append({"meta": "x"})
+
+        assert cache.get("chave")["dados_extraidos"]["metas"] == []
+
+    def test_lru_remove_mais_antigo(self):
+        """Testa remoção da entrada menos usada"""
+        cache = ResponseCache(max_size=2, ttl=None)
+        cache.set("a", {"resposta": "a"})
+        cache.set("b", {"resposta": "b"})
+        cache.get("a")
+        cache.set("c", {"resposta": "c"})
+
+        assert cache.get("b") is None
+        assert cache.get("a") is not None
+        assert cache.stats()["evictions"] == 1
+
+    def test_ttl_expira(self):
+        """Testa que entradas expiram após o TTL"""
+        cache = ResponseCache(max_size=10, ttl=0.01)
+        cache.set("chave", {"resposta": "ok"})
+        time.sleep(0.02)
+
+        assert cache.get("chave") is None
+
+    def test_nivel_em_disco(self, temp_dir):
+        """Testa que o nível em disco sobrevive a uma nova instância"""
+        cache = ResponseCache(max_size=10, ttl=60, disk_path=temp_dir / "cache")
+        cache.set("abcdef", {"resposta": "persistida"})
+
+        novo = ResponseCache(max_size=10, ttl=60, disk_path=temp_dir / "cache")
+
+        assert novo.get("abcdef") == {"resposta": "persistida"}
+        assert novo.stats()["disk_hits"] == 1
@@ -0,0 +1,171 @@
+"""
+Testes para os cálculos financeiros e as ferramentas do LLM
+"""
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src" / "app"))
+
+from calculations import (
+    CALCULATION_TOOLS,
+    compare_cash_vs_installments,
+    compound_growth,
+    emergency_reserve,
+    price_schedule,
+    required_monthly_saving,
+    sac_schedule,
+)
+from exceptions import ValidationError
+from metrics import LLM_TOOL_CALLS
+from tools import ToolCallAccumulator
+
+
+class TestAmortizacao:
+    """Testes para Price e SAC"""
+
+    def test_price(self):
+        result = price_schedule(10000, 1, 12)
+
+        assert result["parcela"] == 888.49
+        assert result["total_pago"] == 10661.85
+        assert result["total_juros"] == 661.85
+
+    def test_price_sem_juros(self):
+        assert price_schedule(3000, 0, 10)["parcela"] == 300.0
+
+    def test_sac(self):
+        result = sac_schedule(12000, 1, 12)
+
+        assert result["amortizacao"] == 1000.0
+        assert result["primeira_parcela"] == 1120.0
+        assert result["ultima_parcela"] == 1010.0
+        assert result["total_juros"] == 780.0
+
+    def test_sac_paga_menos_juros_que_price(self):
+        assert sac_schedule(10000, 1, 12)["total_juros"] < price_schedule(10000, 1, 12)["total_juros"]
+
+    def test_parametros_invalidos(self):
+        with pytest.raises(ValidationError):
+            price_schedule(-100, 1, 12)
+        with pytest.raises(ValidationError):
+            price_schedule(100, 1, 0)
+        with pytest.raises(ValidationError):
+            sac_schedule(100, -1, 12)
+
+
+class TestComparacaoAVista:
+    """Testes para a comparação à vista x parcelado"""
+
+    def test_a_vista_compensa(self):
+        result = compare_cash_vs_installments(1000, 110, 10, rendimento_mensal=1)
+
+        assert result["melhor_opcao"] == "a_vista"
+        assert result["valor_presente_parcelado"] == 1041.84
+        assert result["juros_embutidos_mensal"] > 1
+
+    def test_parcelado_sem_juros_compensa_com_rendimento(self):
+        result = compare_cash_vs_installments(1000, 100, 10, rendimento_mensal=1)
+
+        assert result["melhor_opcao"] == "parcelado"
+        assert result["juros_embutidos_mensal"] == 0.0
+
+    def test_indiferente_sem_rendimento(self):
+        assert compare_cash_vs_installments(1000, 100, 10)["melhor_opcao"] == "indiferente"
+
+
+class TestCrescimentoEReserva:
+    """Testes para juros compostos, aporte necessário e reserva"""
+
+    def test_juros_compostos(self):
+        assert compound_growth(1000, 1, 12)["valor_final"] == 1126.83
+
+    def test_juros_compostos_com_aporte(self):
+        result = compound_growth(0, 0, 10, aporte_mensal=100)
+
+        assert result["valor_final"] == 1000.0
+        assert result["rendimento"] == 0.0
+
+    def test_aporte_necessario_e_inverso_dos_juros_compostos(self):
+        saving = required_monthly_saving(50000, 60, taxa_mensal=0.8)["aporte_mensal"]
+
+        assert compound_growth(0, 0.8, 60, aporte_mensal=saving)["valor_final"] == pytest.approx(50000, abs=1)
+
+    def test_aporte_necessario_meta_ja_atingida(self):
+        assert required_monthly_saving(1000, 12, valor_inicial=2000)["aporte_mensal"] == 0.0
+
+    def test_reserva_emergencia(self):
+        result = emergency_reserve(3000, reserva_atual=6000, aporte_mensal=1000)
+
+        assert result["meta"] == 18000.0
+        assert result["falta"] == 12000.0
+        assert result["meses_para_atingir"] == 12
+
+    def test_reserva_sem_aporte_nao_atinge(self):
+        assert emergency_reserve(3000)["meses_para_atingir"] is None
+
+
+class TestCalculationTools:
+    """Testes para as ferramentas oferecidas ao LLM"""
+
+    def test_esquemas(self):
+        names = [schema["function"]["name"] for schema in CALCULATION_TOOLS.schemas]
+
+        assert names == CALCULATION_TOOLS.names
+        assert "tabela_price" in names
+        assert all(schema["type"] == "function" for schema in CALCULATION_TOOLS.schemas)
+
+    def test_executa_com_argumentos_json(self):
+        before = LLM_TOOL_CALLS.value(tool="tabela_price", status="ok")
+
+        result = json.loads(CALCULATION_TOOLS.run(
+            "tabela_price", '{"valor": 10000, "taxa_mensal": 1, "parcelas": 12}'
+        ))
+
+        assert result["parcela"] == 888.49
+        assert LLM_TOOL_CALLS.value(tool="tabela_price", status="ok") == before + 1
+
+    def test_opcionais_nulos_usam_padrao(self):
+        result = json.loads(CALCULATION_TOOLS.run(
+            "reserva_emergencia", {"despesa_mensal": 2000, "meses_cobertura": None}
+        ))
+
+        assert result["meta"] == 12000.0
+
+    def test_erros_voltam_ao_modelo(self):
+        assert "erro" in json.loads(CALCULATION_TOOLS.run("tabela_price", '{"valor": -1, "taxa_mensal": 1, "parcelas": 2}'))
+        assert "erro" in json.loads(CALCULATION_TOOLS.run("tabela_price", "{json quebrado"))
+        assert "erro" in json.loads(CALCULATION_TOOLS.run("tabela_price", '{"valor": 1, "x": 2}'))
+        assert "erro" in json.loads(CALCULATION_TOOLS.run("inexistente", "{}"))
+
+    def test_mensagens_de_ferramenta(self):
+        calls = [{"id": "c1", "name": "juros_compostos", "arguments": '{"valor_inicial": 1000, "taxa_mensal": 1, "meses": 12}'}]
+
+        assistant, tool = CALCULATION_TOOLS.tool_messages(calls)
+
+        assert assistant["tool_calls"][0]["function"]["name"] == "juros_compostos"
+        assert tool["role"] == "tool"
+        assert tool["tool_call_id"] == "c1"
+        assert json.loads(tool["content"])["valor_final"] == 1126.83
+
+
+class TestToolCallAccumulator:
+    """Testes para a montagem das chamadas que chegam em pedaços"""
+
+    def test_junta_argumentos(self):
+        def delta(index, id=None, name=None, arguments=None):
+            function = type("Function", (), {"name": name, "arguments": arguments})
+            return type("Delta", (), {"index": index, "id": id, "function": function})
+
+        pending = ToolCallAccumulator()
+        pending.add([delta(0, "c1", "tabela_price", '{"valor": 100')])
+        pending.add([delta(0, arguments=', "taxa_mensal": 1, "parcelas": 2}')])
+        pending.add(None)
+
+        assert pending.calls() == [{
+            "id": "c1",
+            "name": "tabela_price",
+            "arguments": '{"valor": 100, "taxa_mensal": 1, "parcelas": 2}',
+        }]
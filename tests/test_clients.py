@@ -0,0 +1,90 @@
+"""
+Testes para o registro de clientes HTTP compartilhados
+"""
+import asyncio
+import pytest
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src" / "app"))
+
+from clients import ClientRegistry
+
+
+class _HeadHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_HEAD(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def servidor_local():
+    """Servidor HTTP local que substitui a API no aquecimento"""
+    server = HTTPServer(("127.0.0.1", 0), _HeadHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}/"
+    server.shutdown()
+    server.server_close()
+
+
+class TestClientRegistry:
+    """Testes para o ClientRegistry"""
+
+    def test_mesmo_cliente_para_mesma_key(self):
+        """Testa que o cliente é reaproveitado"""
+        registry = ClientRegistry()
+        assert registry.get_client("key") is registry.get_client("key")
+
+    def test_keys_diferentes_compartilham_pool(self):
+        """Testa que clientes distintos usam o mesmo pool HTTP"""
+        registry = ClientRegistry()
+        a = registry.get_client("key-a")
+        b = registry.get_client("key-b")
+
+        assert a is not b
+        assert a._client is b._client
+        assert registry.stats()["clients"] == 2
+
+    def test_warm_up_abre_conexao(self, servidor_local):
+        """Testa que o aquecimento deixa uma conexão ociosa no pool"""
+        registry = ClientRegistry(pool_size=4)
+
+        assert registry.warm_up("key", url=servidor_local)
+
+        stats = registry.stats()
+        assert stats["warmups"] == 1
+        assert stats["requests"] == 1
+        assert stats["open_connections"] == 1
+        assert stats["idle_connections"] == 1
+        registry.close()
+
+    def test_awarm_up_abre_conexao_no_pool_assincrono(self, servidor_local):
+        """Testa que o aquecimento assíncrono deixa a conexão no pool do AsyncGroq"""
+        registry = ClientRegistry(pool_size=4)
+
+        async def aquece():
+            assert await registry.awarm_up("key", url=servidor_local)
+            stats = registry.stats()
+            await registry.aclose()
+            return stats
+
+        stats = asyncio.run(aquece())
+        assert stats["warmups"] == 1
+        assert stats["async_open_connections"] == 1
+        assert stats["open_connections"] == 1
+
+    def test_warm_up_falha_nao_levanta(self):
+        """Testa que falha no aquecimento apenas é contabilizada"""
+        registry = ClientRegistry()
+
+        assert not registry.warm_up("key", url="http://127.0.0.1:9/")
+        assert registry.stats()["warmup_errors"] == 1
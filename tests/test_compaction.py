@@ -0,0 +1,65 @@
+"""
+Testes para a fila de compactação do histórico em segundo plano
+"""
+import threading
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src" / "app"))
+
+from compaction import CompactionWorker
+from metrics import COMPACTION_JOBS
+
+
+class TestCompactionWorker:
+    """Testes para o CompactionWorker"""
+
+    def test_executa_a_compactacao(self):
+        worker = CompactionWorker(max_pending=4, workers=1)
+        feitos = []
+
+        worker.submit("s1", feitos.append, "resumo").result(timeout=5)
+
+        assert feitos == ["resumo"]
+        assert worker.pending() == 0
+
+    def test_uma_pendente_por_sessao(self):
+        """Testa que a sessão com compactação em andamento não agenda outra"""
+        worker = CompactionWorker(max_pending=4, workers=1)
+        liberar = threading.Event()
+        antes = COMPACTION_JOBS.value(status="in_flight")
+
+        primeira = worker.submit("s1", liberar.wait, 5)
+        assert worker.submit("s1", lambda: None) is None
+        outra = worker.submit("s2", lambda: None)
+
+        liberar.set()
+        primeira.result(timeout=5)
+        outra.result(timeout=5)
+        assert COMPACTION_JOBS.value(status="in_flight") == antes + 1
+        assert worker.submit("s1", lambda: None) is not None
+
+    def test_fila_limitada(self):
+        """Testa que, com a fila cheia, a compactação é descartada"""
+        worker = CompactionWorker(max_pending=1, workers=1)
+        liberar = threading.Event()
+        antes = COMPACTION_JOBS.value(status="queue_full")
+
+        primeira = worker.submit("s1", liberar.wait, 5)
+        assert worker.submit("s2", lambda: None) is None
+
+        liberar.set()
+        primeira.result(timeout=5)
+        assert COMPACTION_JOBS.value(status="queue_full") == antes + 1
+
+    def test_falha_libera_a_sessao(self):
+        worker = CompactionWorker(max_pending=4, workers=1)
+        antes = COMPACTION_JOBS.value(status="error")
+
+        def falha():
+            raise RuntimeError("provider fora do ar")
+
+        worker.submit("s1", falha).result(timeout=5)
+
+        assert COMPACTION_JOBS.value(status="error") == antes + 1
+        assert worker.pending() == 0
@@ -52,6 +52,13 @@ class TestLoadUser:
         assert usuario["renda_mensal"] is None
         assert mock_data_manager.user_file.exists()
 
+    def test_load_user_antigo_ganha_versao(self, temp_user_file):
+        """Testa que perfil gravado sem versão é carregado com versão 0"""
+        with open(temp_user_file, "w") as f:
+            f.write('{"nome": "Ana"}')
+
+        assert DataManager(user_file=temp_user_file).load_user()["versao"] == 0
+
     def test_load_user_json_invalido(self, temp_user_file):
         """Testa erro ao carregar JSON inválido"""
         temp_user_file.parent.mkdir(exist_ok=True)
@@ -114,6 +121,17 @@ class TestUpdateUser:
         
         assert usuario["renda_mensal"] == 6500.00
 
+    def test_update_user_incrementa_versao(self, mock_data_manager, mock_usuario_basico):
+        """Testa que a versão do perfil só muda quando algum dado muda"""
+        usuario = mock_data_manager.update_user(mock_usuario_basico, {"renda_mensal": 6500.00})
+        versao = usuario["versao"]
+
+        usuario = mock_data_manager.update_user(usuario, {"renda_mensal": None, "idade": None})
+        assert usuario["versao"] == versao
+
+        usuario = mock_data_manager.update_user(usuario, {"idade": 35})
+        assert usuario["versao"] == versao + 1
+
     def test_update_user_idade(self, mock_data_manager, mock_usuario_basico):
         """Testa atualização de idade"""
         extracted = {"idade": 35}
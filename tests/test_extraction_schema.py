@@ -0,0 +1,61 @@
+"""
+Testes para o esquema delta dos dados extraídos
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src" / "app"))
+
+from extraction_schema import FULL_FIELDS, compact_extracted, expand_delta, normalize_answer
+
+
+class TestExpandDelta:
+    """Testes para expand_delta"""
+
+    def test_expande_chaves_curtas(self):
+        """Testa a conversão para o formato completo"""
+        dados = expand_delta({"r": 5000, "i": 30, "p": "moderado"})
+
+        assert dados["renda_mensal"] == 5000
+        assert dados["idade"] == 30
+        assert dados["perfil_investidor"] == "moderado"
+        assert set(dados) == set(FULL_FIELDS)
+        assert dados["nome"] is None
+
+    def test_expande_metas(self):
+        """Testa as chaves curtas das metas"""
+        dados = expand_delta({"m": [{"m": "Carro", "v": 30000, "pz": "2027"}, "inválida"]})
+
+        assert dados["metas"] == [{"meta": "Carro", "valor_necessario": 30000, "prazo": "2027"}]
+
+    def test_delta_vazio_ou_invalido(self):
+        """Testa que delta vazio não traz dados"""
+        assert not any(expand_delta({}).values())
+        assert not any(expand_delta(None).values())
+        assert not any(expand_delta({"xyz": 1}).values())
+
+    def test_ida_e_volta(self):
+        """Testa que compact_extracted é o inverso de expand_delta"""
+        delta = {"n": "Ana", "r": 5000, "m": [{"m": "Casa", "v": 100000}]}
+
+        assert compact_extracted(expand_delta(delta)) == delta
+
+
+class TestNormalizeAnswer:
+    """Testes para normalize_answer"""
+
+    def test_converte_resposta_delta(self):
+        """Testa que "d" vira dados_extraidos"""
+        resposta = normalize_answer({"resposta": "Ok", "d": {"i": 40}})
+
+        assert resposta["resposta"] == "Ok"
+        assert resposta["dados_extraidos"]["idade"] == 40
+        assert "d" not in resposta
+
+    def test_resposta_sem_delta_fica_igual(self):
+        """Testa que erros e respostas completas não são alterados"""
+        erro = {"resposta": "Erro Groq"}
+        completa = {"resposta": "Ok", "dados_extraidos": {"idade": 40}}
+
+        assert normalize_answer(erro) == erro
+        assert normalize_answer(completa) == completa
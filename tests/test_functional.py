@@ -189,6 +189,7 @@ class TestPersistencia:
         """Testa persistência entre sessões"""
         from agent import FinancialAgent
         from data import DataManager
+        from interaction_log import InteractionLog
         
         provider = MockLLMProvider(response_data={
             "resposta": "Renda salva!",
@@ -205,7 +206,10 @@ class TestPersistencia:
         })
         
         # Sessão 1
-        dm1 = DataManager(user_file=temp_user_file)
+        dm1 = DataManager(
+            user_file=temp_user_file,
+            interactions=InteractionLog(temp_user_file.parent / "interacoes"),
+        )
         agent1 = FinancialAgent(
             data_manager=dm1,
             validator=mock_validator,
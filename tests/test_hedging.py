@@ -0,0 +1,140 @@
+"""
+Testes para hedge e failover entre providers
+"""
+import pytest
+import asyncio
+import time
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src" / "app"))
+
+from hedging import HedgedCaller, LatencyTracker
+from exceptions import LLMError
+
+
+class SlowProvider:
+    """Provider que demora `delay` segundos e pode falhar"""
+
+    def __init__(self, answer: str, delay: float = 0.0, fail: bool = False):
+        self.answer = answer
+        self.delay = delay
+        self.fail = fail
+        self.calls = 0
+        self.model = answer
+
+    def generate_answer(self, messages_prompt: list[dict]) -> str:
+        self.calls += 1
+        time.sleep(self.delay)
+        if self.fail:
+            raise LLMError(f"falha {self.answer}")
+        return self.answer
+
+
+class AsyncSlowProvider(SlowProvider):
+    """Versão assíncrona do SlowProvider"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.cancelled = False
+
+    async def generate_answer(self, messages_prompt: list[dict]) -> str:
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        if self.fail:
+            raise LLMError(f"falha {self.answer}")
+        return self.answer
+
+
+MESSAGES = [{"role": "user", "content": "oi"}]
+
+
+class TestLatencyTracker:
+    """Testes para o LatencyTracker"""
+
+    def test_percentis(self):
+        """Testa cálculo de percentis"""
+        tracker = LatencyTracker()
+        for i in range(1, 101):
+            tracker.record(i / 100)
+
+        assert tracker.percentile(0.5) == pytest.approx(0.51)
+        assert tracker.percentile(0.9) == pytest.approx(0.91)
+
+    def test_sem_amostras(self):
+        """Testa que sem amostras não há percentil"""
+        assert LatencyTracker().percentile(0.9) is None
+
+
+class TestHedgedCaller:
+    """Testes para o HedgedCaller"""
+
+    def test_primario_rapido_sem_hedge(self):
+        """Testa que o secundário não é chamado quando o primário é rápido"""
+        primario = SlowProvider("primario")
+        secundario = SlowProvider("secundario")
+        caller = HedgedCaller([primario, secundario], default_delay=0.5)
+
+        assert caller.call(MESSAGES) == "primario"
+        assert secundario.calls == 0
+        assert caller.stats()["hedges"] == 0
+
+    def test_primario_lento_dispara_hedge(self):
+        """Testa que o secundário responde quando o primário demora"""
+        primario = SlowProvider("primario", delay=0.5)
+        secundario = SlowProvider("secundario")
+        caller = HedgedCaller([primario, secundario], default_delay=0.05)
+
+        inicio = time.monotonic()
+        assert caller.call(MESSAGES) == "secundario"
+        assert time.monotonic() - inicio < 0.4
+
+        stats = caller.stats()
+        assert stats["hedges"] == 1
+        assert stats["hedge_wins"] == 1
+
+    def test_failover_em_erro(self):
+        """Testa failover imediato quando o primário falha"""
+        primario = SlowProvider("primario", fail=True)
+        secundario = SlowProvider("secundario")
+        caller = HedgedCaller([primario, secundario], default_delay=10)
+
+        assert caller.call(MESSAGES) == "secundario"
+        assert caller.stats()["failovers"] == 1
+
+    def test_todos_falham(self):
+        """Testa que o último erro é propagado"""
+        caller = HedgedCaller([
+            SlowProvider("a", fail=True),
+            SlowProvider("b", fail=True),
+        ])
+
+        with pytest.raises(LLMError):
+            caller.call(MESSAGES)
+
+    def test_limiar_usa_percentil(self):
+        """Testa que o limiar de hedge vem das latências do primário"""
+        caller = HedgedCaller([SlowProvider("a"), SlowProvider("b")], min_samples=10, percentile=0.9)
+        assert caller.hedge_delay() == caller.default_delay
+
+        for i in range(10):
+            caller.trackers[0].record(i / 10)
+        assert caller.hedge_delay() == pytest.approx(0.9)
+
+    def test_acall_cancela_perdedor(self):
+        """Testa que no modo assíncrono o provider perdedor é cancelado"""
+        primario = AsyncSlowProvider("primario", delay=1)
+        secundario = AsyncSlowProvider("secundario")
+        caller = HedgedCaller([primario, secundario], default_delay=0.05)
+
+        async def executar():
+            resposta = await caller.acall(MESSAGES)
+            await asyncio.sleep(0)
+            return resposta
+
+        assert asyncio.run(executar()) == "secundario"
+        assert primario.cancelled
@@ -0,0 +1,154 @@
+"""
+Testes para o log de interações em segmentos JSONL
+"""
+import json
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src" / "app"))
+
+from interaction_log import InteractionLog, interaction_log, migrate
+from metrics import INTERACTION_LOG_FSYNCS, INTERACTION_LOG_RECORDS
+
+INICIO = datetime(2026, 1, 1, 12, 0, 0)
+
+
+def registro(minuto: int) -> dict:
+    return {
+        "timestamp": (INICIO + timedelta(minutes=minuto)).isoformat(),
+        "mensagem": f"mensagem {minuto}",
+        "resposta": "ok",
+        "dados_extraidos": {},
+    }
+
+
+def novo_log(diretorio: Path, **kwargs) -> InteractionLog:
+    opcoes = {
+        "segment_bytes": 1024 * 1024,
+        "segment_seconds": 3600,
+        "fsync_every": 32,
+        "fsync_interval": 60,
+        "index_every": 4,
+        "compress": True,
+        "retention_days": 0,
+    }
+    opcoes.update(kwargs)
+    return InteractionLog(diretorio, **opcoes)
+
+
+class TestInteractionLog:
+    """Testes para a gravação e leitura do InteractionLog"""
+
+    def test_grava_e_le_na_ordem(self, temp_dir):
+        """Testa que os registros voltam na ordem em que foram gravados"""
+        log = novo_log(temp_dir)
+        for minuto in range(10):
+            log.append(registro(minuto))
+
+        assert [r["mensagem"] for r in log.scan()] == [f"mensagem {m}" for m in range(10)]
+
+    def test_mesmo_segundo_nao_sobrescreve(self, temp_dir):
+        log = novo_log(temp_dir)
+        log.append(registro(0))
+        log.append(registro(0))
+
+        assert len(list(log.scan())) == 2
+
+    def test_troca_e_comprime_segmentos(self, temp_dir):
+        log = novo_log(temp_dir, segment_bytes=300)
+        for minuto in range(10):
+            log.append(registro(minuto))
+
+        segmentos = log.segments()
+        assert len(segmentos) > 1
+        assert all(s.name.endswith(".jsonl.gz") for s in segmentos[:-1])
+        assert segmentos[-1].name.endswith(".jsonl")
+        assert len(list(log.scan())) == 10
+
+    def test_leitura_por_intervalo(self, temp_dir):
+        log = novo_log(temp_dir, segment_bytes=500)
+        for minuto in range(40):
+            log.append(registro(minuto))
+
+        registros = list(log.scan(INICIO + timedelta(minutes=13), INICIO + timedelta(minutes=27)))
+
+        assert [r["mensagem"] for r in registros] == [f"mensagem {m}" for m in range(13, 27)]
+
+    def test_retencao_apaga_segmentos_antigos(self, temp_dir):
+        log = novo_log(temp_dir, segment_bytes=300, retention_days=1)
+        for minuto in range(6):
+            log.append(registro(minuto))
+        recente = {**registro(0), "timestamp": datetime.now().isoformat()}
+        log.append(recente)
+        log.append(recente)
+
+        registros = list(log.scan())
+        assert registros[-1] == recente
+        assert len(registros) < 8
+        indices = {p.name[:-len(".idx")] for p in temp_dir.glob("*.idx")}
+        assert indices == {s.name.split(".")[0] for s in log.segments()}
+
+    def test_fsync_em_lote(self, temp_dir):
+        log = novo_log(temp_dir, fsync_every=5)
+        antes = INTERACTION_LOG_FSYNCS.value()
+
+        for minuto in range(10):
+            log.append(registro(minuto))
+
+        assert INTERACTION_LOG_FSYNCS.value() == antes + 2
+
+    def test_ignora_linha_cortada(self, temp_dir):
+        log = novo_log(temp_dir)
+        log.append(registro(0))
+        log.close()
+        with open(log.segments()[-1], "ab") as f:
+            f.write(b'{"timestamp": "2026-01-01T12:0')
+
+        reaberto = novo_log(temp_dir)
+        reaberto.append(registro(1))
+
+        assert [r["mensagem"] for r in reaberto.scan()] == ["mensagem 0", "mensagem 1"]
+        assert len(reaberto.segments()) == 2
+
+    def test_falha_na_gravacao_vira_metrica(self, temp_dir):
+        log = novo_log(temp_dir)
+        antes = INTERACTION_LOG_RECORDS.value(status="error")
+
+        try:
+            log.append({"sem": "timestamp"})
+        except KeyError:
+            pass
+
+        assert INTERACTION_LOG_RECORDS.value(status="error") == antes + 1
+
+    def test_log_compartilhado_por_diretorio(self, temp_dir):
+        assert interaction_log(temp_dir) is interaction_log(temp_dir / ".")
+
+
+class TestMigrate:
+    """Testes para a migração dos arquivos .json por interação"""
+
+    def test_migra_na_ordem_e_apaga(self, temp_dir):
+        for minuto in (2, 0, 1):
+            r = registro(minuto)
+            nome = datetime.fromisoformat(r["timestamp"]).strftime("%Y-%m-%d_%H%M%S")
+            with open(temp_dir / f"{nome}.json", "w", encoding="utf-8") as f:
+                json.dump(r, f)
+        (temp_dir / "2026-01-01_999999.json").write_text("{quebrado", encoding="utf-8")
+
+        log = novo_log(temp_dir)
+        migrados, ignorados = migrate(temp_dir, log)
+
+        assert (migrados, ignorados) == (3, 1)
+        assert [r["mensagem"] for r in log.scan()] == ["mensagem 0", "mensagem 1", "mensagem 2"]
+        assert [p.name for p in temp_dir.glob("*.json")] == ["2026-01-01_999999.json"]
+
+    def test_timestamp_pelo_nome_do_arquivo(self, temp_dir):
+        (temp_dir / "2026-01-01_120500.json").write_text('{"mensagem": "antiga"}', encoding="utf-8")
+
+        log = novo_log(temp_dir)
+        migrate(temp_dir, log, remove=False)
+
+        assert list(log.scan())[0]["timestamp"] == "2026-01-01T12:05:00"
+        assert (temp_dir / "2026-01-01_120500.json").exists()
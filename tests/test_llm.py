@@ -2,14 +2,36 @@
 Testes para módulo LLM
 """
 import pytest
+import asyncio
 import json
 import sys
+import time
 from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).parent.parent / "src" / "app"))
 
-from llm import LLMManager
-from exceptions import LLMError
+import groq
+import httpx
+
+import config
+
+from llm import GroqProvider, LLMManager, extract_partial_answer
+from cache import ResponseCache
+from resilience import RateLimiter, RetryPolicy
+from metrics import (
+    LLM_CASCADE,
+    LLM_ERRORS,
+    LLM_PARSE_FAILURES,
+    LLM_REQUESTS,
+    LLM_RETRIES,
+    LLM_ROUTES,
+    LLM_TOKENS,
+    default_registry,
+)
+from routing import ROUTE_ANSWER, ROUTE_SUMMARY, ModelRouter, Route
+from calculations import CALCULATION_TOOLS
+from exceptions import LLMError, LLMTimeoutError, RateLimitError
+from resilience import CircuitBreaker, Deadline
 
 
 class MockProvider:
@@ -36,6 +58,19 @@ class MockProvider:
         return self.response
 
 
+class MockStreamingProvider(MockProvider):
+    """Provider mock que entrega a resposta em pedaços"""
+
+    def __init__(self, response: str = None, chunk_size: int = 7):
+        super().__init__(response)
+        self.chunk_size = chunk_size
+
+    def stream_answer(self, messages_prompt: list[dict]):
+        self.last_prompt = messages_prompt
+        for i in range(0, len(self.response), self.chunk_size):
+            yield self.response[i:i + self.chunk_size]
+
+
 class TestLLMManager:
     """Testes para LLMManager"""
 
@@ -80,15 +115,37 @@ class TestLLMManager:
         assert "5.000" in result["resposta"]
         assert result["dados_extraidos"]["renda_mensal"] == 5000.0
 
-    def test_generate_answer_json_invalido(self):
-        """Testa erro com JSON inválido"""
+    def test_generate_answer_texto_sem_json_vira_resposta(self):
+        """Testa que texto sem JSON é aproveitado como resposta"""
         provider = MockProvider("isso não é json válido")
         manager = LLMManager(provider=provider)
         
         messages = [{"role": "user", "content": "teste"}]
         
-        with pytest.raises(LLMError):
-            manager.generate_answer(messages)
+        result = manager.generate_answer(messages)
+
+        assert result == {"resposta": "isso não é json válido"}
+        assert manager.parse_stats() == {"plain_text": 1}
+
+    def test_generate_answer_json_em_bloco_de_codigo(self):
+        """Testa resposta JSON dentro de bloco ```json"""
+        provider = MockProvider('```json\n{"resposta": "Olá!"}\n```')
+        manager = LLMManager(provider=provider)
+
+        result = manager.generate_answer([{"role": "user", "content": "teste"}])
+
+        assert result["resposta"] == "Olá!"
+        assert manager.parse_stats() == {"code_fence": 1}
+
+    def test_generate_answer_texto_puro_nao_vai_para_cache(self):
+        """Testa que texto puro não é guardado no cache"""
+        provider = MockProvider("resposta solta")
+        manager = LLMManager(provider=provider, cache=ResponseCache(max_size=8, ttl=60))
+        messages = [{"role": "user", "content": "teste"}]
+
+        manager.generate_answer(messages)
+
+        assert manager.cache.get(manager._prompt_key(messages)) is None
 
     def test_generate_answer_resposta_vazia_usa_padrao(self):
         """Testa que resposta vazia usa padrão"""
@@ -115,6 +172,589 @@ class TestLLMManager:
         assert "Desculpe" in resposta or "dificuldade" in resposta
 
 
+class CountingProvider(MockProvider):
+    """Provider mock que conta as chamadas"""
+
+    def __init__(self, response: str = None):
+        super().__init__(response)
+        self.calls = 0
+
+    def generate_answer(self, messages_prompt: list[dict]) -> str:
+        self.calls += 1
+        return super().generate_answer(messages_prompt)
+
+
+class TestLLMManagerCache:
+    """Testes para o cache de respostas no LLMManager"""
+
+    def test_prompt_identico_usa_cache(self):
+        """Testa que o segundo prompt idêntico não chama o provider"""
+        provider = CountingProvider()
+        manager = LLMManager(provider=provider, cache=ResponseCache(max_size=10))
+        messages = [{"role": "user", "content": "teste"}]
+
+        primeira = manager.generate_answer(messages)
+        segunda = manager.generate_answer(messages)
+
+        assert primeira == segunda
+        assert provider.calls == 1
+        assert manager.cache_stats()["hits"] == 1
+
+    def test_resposta_invalida_nao_vai_para_cache(self):
+        """Testa que falhas de parse não são armazenadas"""
+        provider = CountingProvider("sem json")
+        manager = LLMManager(provider=provider, cache=ResponseCache(max_size=10))
+        messages = [{"role": "user", "content": "teste"}]
+
+        manager.generate_answer(messages)
+        manager.generate_answer(messages)
+
+        assert provider.calls == 2
+
+
+class TestLLMManagerSingleFlight:
+    """Testes para coalescência de prompts idênticos no LLMManager"""
+
+    def test_prompts_simultaneos_uma_chamada(self):
+        """Testa que chamadas concorrentes idênticas fazem uma só chamada"""
+        import threading
+        import time
+
+        class SlowProvider(CountingProvider):
+            def generate_answer(self, messages_prompt):
+                time.sleep(0.1)
+                return super().generate_answer(messages_prompt)
+
+        provider = SlowProvider()
+        manager = LLMManager(provider=provider, cache=ResponseCache(max_size=0))
+        messages = [{"role": "user", "content": "teste"}]
+        resultados = []
+
+        threads = [
+            threading.Thread(target=lambda: resultados.append(manager.generate_answer(messages)))
+            for _ in range(3)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert provider.calls == 1
+        assert all(r["resposta"] == "Resposta de teste" for r in resultados)
+        # cada chamador recebe seu próprio dicionário
+        assert len({id(r) for r in resultados}) == 3
+        assert manager.singleflight_stats()["coalesced"] == 2
+
+
+class TestLLMManagerFailover:
+    """Testes para múltiplos providers no LLMManager"""
+
+    def test_failover_para_segundo_provider(self):
+        """Testa que falha do primário usa o provider seguinte"""
+
+        class FailingProvider(MockProvider):
+            def generate_answer(self, messages_prompt):
+                raise LLMError("fora do ar")
+
+        manager = LLMManager(providers=[FailingProvider(), MockProvider()], cache=ResponseCache())
+        result = manager.generate_answer([{"role": "user", "content": "teste"}])
+
+        assert result["resposta"] == "Resposta de teste"
+        assert manager.hedge_stats()["failovers"] == 1
+
+
+class TestStreamAnswer:
+    """Testes para geração de resposta em streaming"""
+
+    def test_stream_produz_parciais_crescentes(self):
+        """Testa que o texto parcial cresce a cada pedaço"""
+        provider = MockStreamingProvider()
+        manager = LLMManager(provider=provider)
+
+        items = list(manager.stream_answer([{"role": "user", "content": "teste"}]))
+        parciais = [item["resposta"] for item in items[:-1]]
+
+        assert len(parciais) > 1
+        for anterior, atual in zip(parciais, parciais[1:]):
+            assert atual.startswith(anterior)
+
+    def test_stream_ultimo_item_completo(self):
+        """Testa que o último item traz a resposta completa parseada"""
+        provider = MockStreamingProvider()
+        manager = LLMManager(provider=provider)
+
+        items = list(manager.stream_answer([{"role": "user", "content": "teste"}]))
+
+        assert items[-1]["resposta"] == "Resposta de teste"
+        assert "dados_extraidos" in items[-1]
+
+    def test_stream_sem_suporte_no_provider(self):
+        """Testa fallback para chamada única quando o provider não faz streaming"""
+        manager = LLMManager(provider=MockProvider())
+
+        items = list(manager.stream_answer([{"role": "user", "content": "teste"}]))
+
+        assert len(items) == 1
+        assert items[0]["resposta"] == "Resposta de teste"
+
+
+class MockAsyncProvider(MockProvider):
+    """Provider assíncrono mock"""
+
+    async def generate_answer(self, messages_prompt: list[dict]) -> str:
+        self.last_prompt = messages_prompt
+        return self.response
+
+    async def stream_answer(self, messages_prompt: list[dict]):
+        self.last_prompt = messages_prompt
+        for i in range(0, len(self.response), 5):
+            yield self.response[i:i + 5]
+
+
+class TestAsyncLLMManager:
+    """Testes para a API assíncrona do LLMManager"""
+
+    def test_agenerate_answer_com_provider_async(self):
+        """Testa geração usando o provider assíncrono"""
+        async_provider = MockAsyncProvider()
+        manager = LLMManager(provider=MockProvider(), async_provider=async_provider)
+
+        result = asyncio.run(manager.agenerate_answer([{"role": "user", "content": "teste"}]))
+
+        assert result["resposta"] == "Resposta de teste"
+        assert async_provider.last_prompt is not None
+
+    def test_agenerate_answer_sem_provider_async(self):
+        """Testa que o provider síncrono roda em thread quando não há async"""
+        provider = MockProvider()
+        manager = LLMManager(provider=provider)
+
+        result = asyncio.run(manager.agenerate_answer([{"role": "user", "content": "teste"}]))
+
+        assert result["resposta"] == "Resposta de teste"
+        assert provider.last_prompt is not None
+
+    def test_astream_answer(self):
+        """Testa streaming assíncrono"""
+        manager = LLMManager(provider=MockProvider(), async_provider=MockAsyncProvider())
+
+        async def coletar():
+            return [item async for item in manager.astream_answer([{"role": "user", "content": "t"}])]
+
+        items = asyncio.run(coletar())
+
+        assert len(items) > 1
+        assert items[-1]["resposta"] == "Resposta de teste"
+        assert "dados_extraidos" in items[-1]
+
+
+class TestExtractPartialAnswer:
+    """Testes para extração do campo resposta de JSON parcial"""
+
+    def test_campo_ainda_nao_chegou(self):
+        """Testa que retorna None antes do campo resposta"""
+        assert extract_partial_answer('{"resp') is None
+
+    def test_resposta_incompleta(self):
+        """Testa extração de string ainda aberta"""
+        assert extract_partial_answer('{"resposta": "Olá, tudo') == "Olá, tudo"
+
+    def test_escapes(self):
+        """Testa decodificação de escapes, inclusive incompletos"""
+        assert extract_partial_answer('{"resposta": "linha\\nnova \\"x\\"') == 'linha\nnova "x"'
+        assert extract_partial_answer('{"resposta": "ol\\u00e1') == "olá"
+        assert extract_partial_answer('{"resposta": "ol\\u00') == "ol"
+
+
+def _erro_groq(classe, status: int, headers: dict = None):
+    request = httpx.Request("POST", "https://api.groq.com/openai/v1/chat/completions")
+    response = httpx.Response(status, headers=headers or {}, request=request)
+    return classe("erro", response=response, body=None)
+
+
+class FakeCompletions:
+    """Simula client.chat.completions com falhas programadas"""
+
+    def __init__(self, falhas: list):
+        self.falhas = list(falhas)
+        self.calls = []
+
+    def create(self, **kwargs):
+        self.calls.append(kwargs)
+        if self.falhas:
+            raise self.falhas.pop(0)
+        message = type("Message", (), {"content": " ok "})
+        choice = type("Choice", (), {"message": message})
+        details = type("Details", (), {"cached_tokens": 8})
+        usage = type("Usage", (), {
+            "prompt_tokens": 12, "completion_tokens": 3, "total_tokens": 15,
+            "prompt_tokens_details": details,
+        })
+        return type("Completion", (), {"choices": [choice], "usage": usage})
+
+
+class FakeClient:
+    def __init__(self, falhas: list):
+        self.completions = FakeCompletions(falhas)
+        self.chat = self
+
+
+class TestGroqProviderResiliencia:
+    """Testes para retentativas no GroqProvider"""
+
+    def _provider(self, falhas, max_attempts=3):
+        return GroqProvider(
+            model="teste",
+            client=FakeClient(falhas),
+            rate_limiter=RateLimiter(requests_per_minute=1000, tokens_per_minute=100000),
+            retry_policy=RetryPolicy(max_attempts=max_attempts, base_delay=0, max_delay=0),
+        )
+
+    def test_retenta_rate_limit(self):
+        """Testa que 429 transitório é retentado"""
+        provider = self._provider([_erro_groq(groq.RateLimitError, 429, {"retry-after": "0"})])
+
+        assert provider.generate_answer([{"role": "user", "content": "oi"}]) == "ok"
+        assert len(provider.client.completions.calls) == 2
+
+    def test_esgota_tentativas(self):
+        """Testa que após as tentativas o erro vira RateLimitError"""
+        provider = self._provider([
+            _erro_groq(groq.RateLimitError, 429) for _ in range(3)
+        ])
+
+        with pytest.raises(RateLimitError):
+            provider.generate_answer([{"role": "user", "content": "oi"}])
+        assert len(provider.client.completions.calls) == 3
+
+    def test_nao_retenta_autenticacao(self):
+        """Testa que erro de autenticação não é retentado"""
+        provider = self._provider([_erro_groq(groq.AuthenticationError, 401)])
+
+        with pytest.raises(LLMError, match="API key"):
+            provider.generate_answer([{"role": "user", "content": "oi"}])
+        assert len(provider.client.completions.calls) == 1
+
+    def test_timeout_vem_do_prazo(self):
+        """Testa que o timeout enviado nunca passa do prazo configurado"""
+        provider = self._provider([])
+        provider.generate_answer([{"role": "user", "content": "oi"}])
+
+        timeout = provider.client.completions.calls[0]["timeout"]
+        assert 0 < timeout <= config.GROQ_LLM_TIMEOUT
+
+    def test_timeout_encolhe_com_o_prazo_do_turno(self):
+        """Testa que o timeout da chamada respeita o que sobra do turno"""
+        provider = self._provider([])
+        provider.generate_answer([{"role": "user", "content": "oi"}], deadline=Deadline(2))
+
+        assert 0 < provider.client.completions.calls[0]["timeout"] <= 2
+
+    def test_prazo_do_turno_esgotado_nao_chama_api(self):
+        """Testa que prazo de turno vencido vira erro sem ir ao provider"""
+        provider = self._provider([])
+        manager = LLMManager(provider=provider)
+
+        result = manager.generate_answer([{"role": "user", "content": "oi"}], deadline=Deadline(0))
+
+        assert result["error"] is True
+        assert provider.client.completions.calls == []
+
+
+class TestGroqProviderMetricas:
+    """Testes para a instrumentação das chamadas ao Groq"""
+
+    def _provider(self, model, falhas=(), max_attempts=3):
+        return GroqProvider(
+            model=model,
+            client=FakeClient(list(falhas)),
+            rate_limiter=RateLimiter(requests_per_minute=1000, tokens_per_minute=100000),
+            retry_policy=RetryPolicy(max_attempts=max_attempts, base_delay=0, max_delay=0),
+        )
+
+    def test_registra_tokens_e_duracao(self):
+        """Testa tokens do campo usage, status e registro da chamada"""
+        provider = self._provider("metricas-ok")
+
+        provider.generate_answer([{"role": "user", "content": "oi"}])
+
+        assert provider.last_usage == {
+            "prompt_tokens": 12, "completion_tokens": 3, "total_tokens": 15, "cached_tokens": 8,
+        }
+        assert LLM_REQUESTS.value(model="metricas-ok", status="ok") == 1
+        assert LLM_TOKENS.value(model="metricas-ok", kind="prompt") == 12
+        assert LLM_TOKENS.value(model="metricas-ok", kind="completion") == 3
+        assert LLM_TOKENS.value(model="metricas-ok", kind="cached") == 8
+
+        record = default_registry.recent_calls(1)[0]
+        assert record["model"] == "metricas-ok"
+        assert record["status"] == "ok"
+        assert record["tokens_request"] == 12
+        assert record["tokens_response"] == 3
+        assert record["tokens_cached"] == 8
+        assert record["duration_ms"] >= 0
+        assert len(record["request_id"]) == 32
+
+    def test_registra_erro_por_tipo_e_retentativas(self):
+        """Testa contadores de erro e de retentativas"""
+        provider = self._provider("metricas-erro", [
+            _erro_groq(groq.RateLimitError, 429) for _ in range(2)
+        ], max_attempts=2)
+
+        with pytest.raises(RateLimitError):
+            provider.generate_answer([{"role": "user", "content": "oi"}])
+
+        assert LLM_REQUESTS.value(model="metricas-erro", status="error") == 1
+        assert LLM_ERRORS.value(model="metricas-erro", type="RateLimitError") == 1
+        assert LLM_RETRIES.value(model="metricas-erro") == 1
+        assert provider.last_usage is None
+
+    def test_conta_falha_de_parse(self):
+        """Testa o contador de respostas sem JSON"""
+        before = LLM_PARSE_FAILURES.value()
+        manager = LLMManager(provider=MockProvider("sem json"))
+
+        manager.generate_answer([{"role": "user", "content": "teste"}])
+
+        assert LLM_PARSE_FAILURES.value() == before + 1
+
+
+def _tool_call(id, name, arguments):
+    function = type("Function", (), {"name": name, "arguments": arguments})
+    return type("ToolCall", (), {"index": 0, "id": id, "function": function})
+
+
+class ToolCallingCompletions:
+    """Simula um modelo que pede uma ferramenta e depois responde com o resultado"""
+
+    ARGS = '{"valor": 10000, "taxa_mensal": 1, "parcelas": 12}'
+
+    def __init__(self):
+        self.calls = []
+
+    def create(self, **kwargs):
+        self.calls.append(kwargs)
+        tool_result = next((m for m in kwargs["messages"] if m.get("role") == "tool"), None)
+        if tool_result is None:
+            content, tool_calls = None, [_tool_call("c1", "tabela_price", self.ARGS)]
+        else:
+            parcela = json.loads(tool_result["content"])["parcela"]
+            content, tool_calls = json.dumps({"resposta": f"A parcela fica em R$ {parcela}"}), None
+
+        if kwargs.get("stream"):
+            delta = type("Delta", (), {"content": content, "tool_calls": tool_calls})
+            chunk = type("Chunk", (), {"choices": [type("Choice", (), {"delta": delta})], "usage": None})
+            return iter([chunk])
+        message = type("Message", (), {"content": content, "tool_calls": tool_calls})
+        return type("Completion", (), {"choices": [type("Choice", (), {"message": message})], "usage": None})
+
+
+class TestGroqProviderTools:
+    """Testes para o laço de function calling no GroqProvider"""
+
+    def _provider(self):
+        client = FakeClient([])
+        client.completions = ToolCallingCompletions()
+        return GroqProvider(
+            model="teste",
+            client=client,
+            rate_limiter=RateLimiter(requests_per_minute=1000, tokens_per_minute=100000),
+        )
+
+    def test_executa_ferramenta_e_responde(self):
+        provider = self._provider()
+
+        answer = provider.generate_answer([{"role": "user", "content": "parcela?"}], tools=CALCULATION_TOOLS)
+
+        assert json.loads(answer)["resposta"] == "A parcela fica em R$ 888.49"
+        first, second = provider.client.completions.calls
+        assert first["tools"] == CALCULATION_TOOLS.schemas
+        assert second["messages"][-1]["role"] == "tool"
+
+    def test_stream_executa_ferramenta(self):
+        provider = self._provider()
+
+        chunks = list(provider.stream_answer([{"role": "user", "content": "parcela?"}], tools=CALCULATION_TOOLS))
+
+        assert json.loads("".join(chunks))["resposta"] == "A parcela fica em R$ 888.49"
+
+    def test_ultima_rodada_sem_ferramentas(self, monkeypatch):
+        """Testa que, esgotadas as rodadas, a chamada final não oferece ferramentas"""
+        monkeypatch.setattr(config, "LLM_TOOLS_MAX_ROUNDS", 0)
+        provider = self._provider()
+
+        provider.generate_answer([{"role": "user", "content": "parcela?"}], tools=CALCULATION_TOOLS)
+
+        assert "tools" not in provider.client.completions.calls[0]
+
+    def test_manager_so_repassa_a_quem_suporta(self):
+        """Testa que providers sem function calling recebem a chamada sem ferramentas"""
+        manager = LLMManager(provider=MockProvider())
+        result = manager.generate_answer([{"role": "user", "content": "t"}], tools=CALCULATION_TOOLS)
+        assert result["resposta"] == "Resposta de teste"
+
+        manager = LLMManager(provider=self._provider())
+        result = manager.generate_answer([{"role": "user", "content": "t"}], tools=CALCULATION_TOOLS)
+        assert result["resposta"] == "A parcela fica em R$ 888.49"
+
+
+class TestLLMManagerRouting:
+    """Testes para o roteamento de modelos e a cascata"""
+
+    LONGA = json.dumps({"resposta": "Guarde seis meses de despesas numa aplicação com liquidez diária."})
+    CURTA = json.dumps({"resposta": "Não sei."})
+
+    def _manager(self, routes, respostas):
+        providers = {}
+
+        def factory(model, max_tokens):
+            provider = providers[model] = MockProvider(respostas[model])
+            provider.max_tokens = max_tokens
+            return provider
+
+        manager = LLMManager(provider=MockProvider(), router=ModelRouter(routes=routes, provider_factory=factory))
+        return manager, providers
+
+    def test_rota_escolhe_modelo_e_max_tokens(self):
+        before = LLM_ROUTES.value(route=ROUTE_SUMMARY, model="pequeno")
+        manager, providers = self._manager(
+            {ROUTE_SUMMARY: Route(ROUTE_SUMMARY, "pequeno", max_tokens=300)},
+            {"pequeno": self.LONGA},
+        )
+
+        manager.generate_answer([{"role": "user", "content": "resuma"}], route=ROUTE_SUMMARY)
+
+        assert providers["pequeno"].last_prompt is not None
+        assert providers["pequeno"].max_tokens == 300
+        assert manager.provider.last_prompt is None
+        assert LLM_ROUTES.value(route=ROUTE_SUMMARY, model="pequeno") == before + 1
+
+    def test_sem_rota_usa_provider_padrao(self):
+        manager, providers = self._manager({}, {})
+
+        manager.generate_answer([{"role": "user", "content": "teste"}])
+
+        assert manager.provider.last_prompt is not None
+        assert providers == {}
+
+    def test_cascata_aceita_modelo_pequeno(self):
+        before = LLM_CASCADE.value(route=ROUTE_ANSWER, outcome="accepted")
+        manager, providers = self._manager(
+            {ROUTE_ANSWER: Route(ROUTE_ANSWER, "pequeno", cascade_model="grande")},
+            {"pequeno": self.LONGA, "grande": self.LONGA},
+        )
+
+        result = manager.generate_answer([{"role": "user", "content": "reserva"}], route=ROUTE_ANSWER)
+
+        assert result["resposta"].startswith("Guarde")
+        assert "grande" not in providers
+        assert LLM_CASCADE.value(route=ROUTE_ANSWER, outcome="accepted") == before + 1
+
+    def test_cascata_escala_para_modelo_grande(self):
+        before = LLM_CASCADE.value(route=ROUTE_ANSWER, outcome="escalated")
+        manager, providers = self._manager(
+            {ROUTE_ANSWER: Route(ROUTE_ANSWER, "pequeno", cascade_model="grande")},
+            {"pequeno": self.CURTA, "grande": self.LONGA},
+        )
+
+        result = manager.generate_answer([{"role": "user", "content": "reserva"}], route=ROUTE_ANSWER)
+
+        assert result["resposta"].startswith("Guarde")
+        assert providers["grande"].last_prompt is not None
+        assert LLM_CASCADE.value(route=ROUTE_ANSWER, outcome="escalated") == before + 1
+
+    def test_cascata_no_stream_transmite_modelo_grande(self):
+        manager, providers = self._manager(
+            {ROUTE_ANSWER: Route(ROUTE_ANSWER, "pequeno", cascade_model="grande")},
+            {"pequeno": self.CURTA, "grande": self.LONGA},
+        )
+
+        items = list(manager.stream_answer([{"role": "user", "content": "reserva"}], route=ROUTE_ANSWER))
+
+        assert items[-1]["resposta"].startswith("Guarde")
+
+    def test_cascata_assincrona_sem_provider_async(self):
+        manager, providers = self._manager(
+            {ROUTE_ANSWER: Route(ROUTE_ANSWER, "pequeno", cascade_model="grande")},
+            {"pequeno": self.CURTA, "grande": self.LONGA},
+        )
+
+        result = asyncio.run(manager.agenerate_answer([{"role": "user", "content": "r"}], route=ROUTE_ANSWER))
+
+        assert result["resposta"].startswith("Guarde")
+
+
+class FailingProvider(MockProvider):
+    """Provider fora do ar"""
+
+    def __init__(self):
+        super().__init__()
+        self.calls = 0
+
+    def generate_answer(self, messages_prompt: list[dict]) -> str:
+        self.calls += 1
+        raise LLMTimeoutError("Tempo limite de resposta do LLM esgotado.")
+
+    def stream_answer(self, messages_prompt: list[dict]):
+        self.calls += 1
+        raise LLMTimeoutError("Tempo limite de resposta do LLM esgotado.")
+        yield
+
+
+class TestLLMManagerBreaker:
+    """Testes para o circuit breaker no LLMManager"""
+
+    def _manager(self, provider):
+        breaker = CircuitBreaker(name="teste", min_calls=2, error_rate=0.5, open_seconds=60)
+        return LLMManager(provider=provider, breaker=breaker)
+
+    def test_abre_e_responde_na_hora(self):
+        provider = FailingProvider()
+        manager = self._manager(provider)
+
+        for i in range(2):
+            result = manager.generate_answer([{"role": "user", "content": f"t{i}"}])
+            assert "degraded" not in result
+
+        result = manager.generate_answer([{"role": "user", "content": "t3"}])
+
+        assert result["degraded"] is True
+        assert provider.calls == 2
+        assert manager.breaker_stats()["state"] == "open"
+
+    def test_stream_degradado(self):
+        provider = FailingProvider()
+        manager = self._manager(provider)
+        for i in range(2):
+            list(manager.stream_answer([{"role": "user", "content": f"t{i}"}]))
+
+        items = list(manager.stream_answer([{"role": "user", "content": "t3"}]))
+
+        assert len(items) == 1
+        assert items[0]["degraded"] is True
+        assert provider.calls == 2
+
+    def test_cache_responde_com_circuito_aberto(self):
+        """Testa que respostas em cache continuam sendo servidas"""
+        provider = MockProvider()
+        manager = self._manager(provider)
+        prompt = [{"role": "user", "content": "teste"}]
+        manager.generate_answer(prompt)
+
+        manager.breaker._transition(CircuitBreaker.OPEN, time.monotonic())
+
+        assert manager.generate_answer(prompt)["resposta"] == "Resposta de teste"
+        assert manager.generate_answer([{"role": "user", "content": "outra"}])["degraded"] is True
+
+    def test_agenerate_degradado(self):
+        manager = self._manager(MockProvider())
+        manager.breaker._transition(CircuitBreaker.OPEN, time.monotonic())
+
+        result = asyncio.run(manager.agenerate_answer([{"role": "user", "content": "t"}]))
+
+        assert result["degraded"] is True
+
+
 class TestLLMManagerIntegration:
     """Testes de integração (requerem provider real)"""
 
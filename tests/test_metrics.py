@@ -0,0 +1,121 @@
+"""
+Testes para as métricas no formato do Prometheus
+"""
+import pytest
+import sys
+import urllib.request
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src" / "app"))
+
+from metrics import LLMCall, MetricsRegistry, default_registry, start_metrics_server
+
+
+class TestMetricsRegistry:
+    """Testes para contadores, histogramas e renderização"""
+
+    def test_contador_por_labels(self):
+        """Testa incremento separado por combinação de labels"""
+        registry = MetricsRegistry()
+        counter = registry.counter("chamadas_total", "Chamadas", ("status",))
+
+        counter.inc(status="ok")
+        counter.inc(2, status="ok")
+        counter.inc(status="error")
+
+        assert counter.value(status="ok") == 3
+        assert registry.snapshot() == {"chamadas_total": {"ok": 3, "error": 1}}
+
+    def test_gauge_sobe_e_desce(self):
+        registry = MetricsRegistry()
+        gauge = registry.gauge("sessoes", "Sessões")
+
+        gauge.inc(3)
+        gauge.dec()
+        assert gauge.value() == 2
+        gauge.set(7)
+        assert "# TYPE sessoes gauge\nsessoes 7" in registry.render()
+
+    def test_labels_invalidos(self):
+        """Testa que labels diferentes dos declarados são rejeitados"""
+        counter = MetricsRegistry().counter("x_total", "X", ("model",))
+
+        with pytest.raises(ValueError):
+            counter.inc(status="ok")
+
+    def test_mesma_metrica_reutilizada(self):
+        """Testa que pedir a mesma métrica devolve a mesma instância"""
+        registry = MetricsRegistry()
+
+        assert registry.counter("a_total", "A") is registry.counter("a_total", "A")
+        with pytest.raises(ValueError):
+            registry.histogram("a_total", "A")
+
+    def test_renderiza_formato_prometheus(self):
+        """Testa HELP/TYPE, buckets cumulativos, soma e contagem"""
+        registry = MetricsRegistry()
+        registry.counter("req_total", "Requisições", ("model",)).inc(model='m"1')
+        histogram = registry.histogram("dur_seconds", "Duração", ("model",), buckets=(0.5, 1))
+        histogram.observe(0.2, model="m")
+        histogram.observe(0.7, model="m")
+        histogram.observe(3, model="m")
+
+        text = registry.render()
+
+        assert "# TYPE req_total counter" in text
+        assert 'req_total{model="m\\"1"} 1' in text
+        assert "# TYPE dur_seconds histogram" in text
+        assert 'dur_seconds_bucket{model="m",le="0.5"} 1' in text
+        assert 'dur_seconds_bucket{model="m",le="1"} 2' in text
+        assert 'dur_seconds_bucket{model="m",le="+Inf"} 3' in text
+        assert 'dur_seconds_sum{model="m"} 3.9' in text
+        assert 'dur_seconds_count{model="m"} 3' in text
+
+    def test_chamadas_recentes_limitadas(self):
+        """Testa que só os últimos registros são mantidos"""
+        registry = MetricsRegistry(recent_calls=2)
+        for i in range(3):
+            registry.record_call({"i": i})
+
+        assert [c["i"] for c in registry.recent_calls()] == [1, 2]
+
+
+class TestLLMCall:
+    """Testes para a instrumentação de uma chamada"""
+
+    def test_stream_interrompido_conta_como_cancelado(self):
+        """Testa que GeneratorExit não é contado como erro"""
+        def stream():
+            with LLMCall("metricas-cancel", stream=True):
+                yield "a"
+                yield "b"
+
+        gen = stream()
+        next(gen)
+        gen.close()
+
+        record = default_registry.recent_calls(1)[0]
+        assert record["status"] == "cancelled"
+        assert record["stream"] is True
+        assert record["error"] is None
+
+
+class TestMetricsServer:
+    """Testes para o endpoint HTTP"""
+
+    def test_endpoint_metrics(self):
+        """Testa que /metrics responde no formato de texto"""
+        registry = MetricsRegistry()
+        registry.counter("servidor_total", "Teste").inc()
+        server = start_metrics_server(port=0, host="127.0.0.1", registry=registry)
+        try:
+            port = server.server_address[1]
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=5) as resp:
+                body = resp.read().decode()
+                content_type = resp.headers["Content-Type"]
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        assert content_type.startswith("text/plain")
+        assert "servidor_total 1" in body
@@ -0,0 +1,158 @@
+"""
+Testes para o parser tolerante das respostas do LLM
+"""
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src" / "app"))
+
+from parsing import (
+    REPAIR_CODE_FENCE,
+    REPAIR_DIRECT,
+    REPAIR_EXTRACTED,
+    REPAIR_FAILED,
+    REPAIR_PLAIN_TEXT,
+    REPAIR_TRAILING_COMMA,
+    REPAIR_TRUNCATED,
+    IncrementalAnswerParser,
+    parse_llm_json,
+)
+
+
+class TestParseLLMJson:
+    """Testes para parse_llm_json"""
+
+    def test_json_puro(self):
+        """Testa JSON válido sem reparo"""
+        result = parse_llm_json('{"resposta": "Olá", "dados_extraidos": {}}')
+
+        assert result.repair == REPAIR_DIRECT
+        assert result.data == {"resposta": "Olá", "dados_extraidos": {}}
+
+    def test_bloco_de_codigo(self):
+        """Testa JSON dentro de bloco ```json"""
+        result = parse_llm_json('```json\n{"resposta": "Olá"}\n```')
+
+        assert result.repair == REPAIR_CODE_FENCE
+        assert result.data == {"resposta": "Olá"}
+
+    def test_texto_antes_e_depois(self):
+        """Testa JSON cercado de texto"""
+        result = parse_llm_json('Aqui está:\n{"resposta": "Olá"}\nEspero ter ajudado.')
+
+        assert result.repair == REPAIR_EXTRACTED
+        assert result.data == {"resposta": "Olá"}
+
+    def test_prosa_vira_resposta_quando_json_nao_traz(self):
+        """Testa que o texto antes do JSON preenche resposta vazia"""
+        result = parse_llm_json('Sua renda foi registrada. {"resposta": "", "dados_extraidos": {"idade": 30}}')
+
+        assert result.data["resposta"] == "Sua renda foi registrada."
+        assert result.data["dados_extraidos"] == {"idade": 30}
+
+    def test_chaves_na_prosa_sao_ignoradas(self):
+        """Testa que chaves soltas no texto não confundem a extração"""
+        text = 'Use o formato {nome}. {"resposta": "valor com } dentro"}'
+
+        result = parse_llm_json(text)
+
+        assert result.data["resposta"] == "valor com } dentro"
+
+    def test_virgula_sobrando(self):
+        """Testa remoção de vírgulas antes de } e ]"""
+        result = parse_llm_json('{"resposta": "Olá, tudo bem?", "metas": ["casa",],}')
+
+        assert result.repair == REPAIR_TRAILING_COMMA
+        assert result.data == {"resposta": "Olá, tudo bem?", "metas": ["casa"]}
+
+    def test_saida_truncada_no_meio_da_string(self):
+        """Testa fechamento de string e objetos abertos"""
+        result = parse_llm_json('{"resposta": "Você pode guardar')
+
+        assert result.repair == REPAIR_TRUNCATED
+        assert result.data == {"resposta": "Você pode guardar"}
+
+    def test_saida_truncada_no_meio_de_um_item(self):
+        """Testa que o item incompleto é descartado"""
+        text = '{"resposta": "Ok", "dados_extraidos": {"idade": 30, "renda_mensal": 50'
+
+        result = parse_llm_json(text)
+
+        assert result.repair == REPAIR_TRUNCATED
+        assert result.data["resposta"] == "Ok"
+        assert result.data["dados_extraidos"]["idade"] == 30
+
+    def test_saida_truncada_apos_dois_pontos(self):
+        """Testa chave sem valor no final"""
+        result = parse_llm_json('{"resposta": "Ok", "dados_extraidos":')
+
+        assert result.data == {"resposta": "Ok", "dados_extraidos": None}
+
+    def test_texto_sem_json(self):
+        """Testa que texto puro vira a resposta"""
+        result = parse_llm_json("Olá! Como posso ajudar?")
+
+        assert result.repair == REPAIR_PLAIN_TEXT
+        assert result.data == {"resposta": "Olá! Como posso ajudar?"}
+
+    def test_texto_vazio_falha(self):
+        """Testa que texto vazio não gera dados"""
+        result = parse_llm_json("   ")
+
+        assert result.repair == REPAIR_FAILED
+        assert not result.ok
+
+    def test_json_que_nao_e_objeto(self):
+        """Testa que listas não são aceitas como resposta"""
+        result = parse_llm_json('["a", "b"]')
+
+        assert result.repair == REPAIR_PLAIN_TEXT
+
+
+class TestIncrementalAnswerParser:
+    """Testes para o parser incremental do stream"""
+
+    def _feed_all(self, text: str, size: int) -> tuple[IncrementalAnswerParser, list]:
+        parser = IncrementalAnswerParser()
+        partials = []
+        for i in range(0, len(text), size):
+            partial = parser.feed(text[i:i + size])
+            if partial:
+                partials.append(partial)
+        return parser, partials
+
+    def test_resposta_cresce_a_cada_pedaco(self):
+        """Testa que a resposta parcial só cresce"""
+        text = json.dumps({"resposta": "Você pode investir em renda fixa", "dados_extraidos": {}})
+
+        parser, partials = self._feed_all(text, 5)
+
+        assert partials[-1] == "Você pode investir em renda fixa"
+        assert all(b.startswith(a) for a, b in zip(partials, partials[1:]))
+        assert parser.finish().data["resposta"] == "Você pode investir em renda fixa"
+
+    def test_chave_dividida_entre_pedacos(self):
+        """Testa a chave "resposta" quebrada entre pedaços"""
+        parser = IncrementalAnswerParser()
+
+        assert parser.feed('{"respo') is None
+        assert parser.feed('sta": "Ol') == "Ol"
+        assert parser.feed('á"}') == "Olá"
+
+    def test_escape_dividido_entre_pedacos(self):
+        """Testa escapes quebrados entre pedaços"""
+        text = json.dumps({"resposta": 'linha 1\nlinha "2" é'})
+
+        for size in (1, 2, 3):
+            parser, partials = self._feed_all(text, size)
+            assert partials[-1] == 'linha 1\nlinha "2" é'
+
+    def test_texto_apos_resposta_e_ignorado(self):
+        """Testa que o parcial para no fim da string"""
+        parser = IncrementalAnswerParser()
+
+        parser.feed('{"resposta": "Oi", "dados_extraidos": {"idade": 3')
+
+        assert parser.answer == "Oi"
+        assert parser.finish().data == {"resposta": "Oi", "dados_extraidos": {"idade": 3}}
@@ -0,0 +1,130 @@
+"""
+Testes para a gravação write-behind do perfil e das interações
+"""
+import json
+import time
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src" / "app"))
+
+import config
+from data import DataManager
+from interaction_log import InteractionLog
+from metrics import PERSISTENCE_BACKPRESSURE, PERSISTENCE_COALESCED, PERSISTENCE_WRITES
+from persistence import PersistenceQueue
+
+
+class TestPersistenceQueue:
+    """Testes para a PersistenceQueue"""
+
+    def test_une_gravacoes_da_mesma_chave(self):
+        """Testa que só a última versão de uma chave é gravada"""
+        queue = PersistenceQueue(max_pending=100, flush_interval=60)
+        gravados = []
+        antes = PERSISTENCE_COALESCED.value(kind="user")
+
+        for versao in range(3):
+            queue.put("user", gravados.append, {"versao": versao}, key="perfil")
+
+        assert queue.pending("perfil") == {"versao": 2}
+        assert queue.flush() == 1
+        assert gravados == [{"versao": 2}]
+        assert PERSISTENCE_COALESCED.value(kind="user") == antes + 2
+        assert queue.pending("perfil") is None
+
+    def test_interacoes_em_ordem(self):
+        queue = PersistenceQueue(max_pending=100, flush_interval=60)
+        gravados = []
+
+        for i in range(3):
+            queue.put("interaction", gravados.append, i)
+
+        assert queue.depth() == 3
+        queue.flush()
+        assert gravados == [0, 1, 2]
+
+    def test_fila_cheia_grava_na_hora(self):
+        queue = PersistenceQueue(max_pending=2, flush_interval=60)
+        gravados = []
+        antes = PERSISTENCE_BACKPRESSURE.value()
+
+        queue.put("interaction", gravados.append, 1)
+        queue.put("interaction", gravados.append, 2)
+
+        assert gravados == [1, 2]
+        assert queue.depth() == 0
+        assert PERSISTENCE_BACKPRESSURE.value() == antes + 1
+
+    def test_grava_pelo_timer(self):
+        queue = PersistenceQueue(max_pending=100, flush_interval=0.01)
+        gravados = []
+
+        queue.put("interaction", gravados.append, 1)
+        for _ in range(100):
+            if gravados:
+                break
+            time.sleep(0.01)
+
+        assert gravados == [1]
+        queue.close()
+
+    def test_fechamento_grava_e_passa_a_ser_sincrono(self):
+        queue = PersistenceQueue(max_pending=100, flush_interval=60)
+        gravados = []
+        queue.put("user", gravados.append, "antigo", key="perfil")
+
+        queue.close()
+        assert gravados == ["antigo"]
+
+        queue.put("user", gravados.append, "novo", key="perfil")
+        assert gravados == ["antigo", "novo"]
+
+    def test_falha_na_gravacao_vira_metrica(self):
+        queue = PersistenceQueue(max_pending=100, flush_interval=60)
+        antes = PERSISTENCE_WRITES.value(kind="user", status="error")
+
+        def falha(payload):
+            raise OSError("disco cheio")
+
+        queue.put("user", falha, {}, key="perfil")
+        queue.flush()
+
+        assert PERSISTENCE_WRITES.value(kind="user", status="error") == antes + 1
+
+
+class TestDataManagerWriteBehind:
+    """Testes para o DataManager com a fila write-behind"""
+
+    def test_perfil_lido_da_fila_antes_do_disco(self, temp_user_file):
+        queue = PersistenceQueue(max_pending=100, flush_interval=60)
+        dm = DataManager(user_file=temp_user_file, persistence=queue)
+        usuario = dm.default_user()
+        usuario["nome"] = "Ana"
+
+        dm.save_user(usuario)
+        usuario["nome"] = "alterado depois de salvar"
+
+        assert not temp_user_file.exists()
+        assert dm.load_user()["nome"] == "Ana"
+
+        queue.flush()
+        with open(temp_user_file, encoding="utf-8") as f:
+            assert json.load(f)["nome"] == "Ana"
+
+    def test_interacao_gravada_no_flush(self, temp_user_file):
+        queue = PersistenceQueue(max_pending=100, flush_interval=60)
+        log = InteractionLog(temp_user_file.parent / "interacoes")
+        dm = DataManager(user_file=temp_user_file, persistence=queue, interactions=log)
+
+        dm.save_interaction("oi", "olá", {"renda_mensal": None})
+        assert list(log.scan()) == []
+
+        queue.flush()
+        registros = list(log.scan())
+        assert len(registros) == 1
+        assert registros[0]["mensagem"] == "oi"
+
+    def test_modo_sincrono_por_padrao(self, mock_data_manager):
+        assert config.PERSISTENCE_MODE == "sync"
+        assert mock_data_manager.persistence is None
@@ -0,0 +1,70 @@
+"""
+Testes para a medida de estabilidade do prefixo dos prompts
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src" / "app"))
+
+from prompt_prefix import PrefixTracker, shared_prefix
+from tokens import estimate_message_tokens
+
+
+FIXO = [
+    {"role": "system", "content": "Responda em JSON."},
+    {"role": "system", "content": "Você é a BIA."},
+]
+
+
+class TestSharedPrefix:
+    """Testes para shared_prefix"""
+
+    def test_prompts_iguais(self):
+        """Testa que prompts idênticos compartilham tudo"""
+        messages, tokens = shared_prefix(FIXO, FIXO)
+
+        assert messages == 2
+        assert tokens == sum(estimate_message_tokens(m) for m in FIXO)
+
+    def test_para_na_primeira_diferenca(self):
+        """Testa que nada depois da primeira diferença é contado"""
+        a = [FIXO[0], {"role": "system", "content": "fatos A"}, FIXO[1]]
+        b = [FIXO[0], {"role": "user", "content": "outra"}, FIXO[1]]
+
+        messages, tokens = shared_prefix(a, b)
+
+        assert messages == 1
+        assert tokens == estimate_message_tokens(FIXO[0])
+
+    def test_inicio_comum_da_mensagem_diferente(self):
+        """Testa que o trecho inicial igual da mensagem diferente conta"""
+        a = [{"role": "user", "content": "texto comum e final A"}]
+        b = [{"role": "user", "content": "texto comum e final B"}]
+
+        messages, tokens = shared_prefix(a, b)
+
+        assert messages == 0
+        assert tokens > 0
+
+
+class TestPrefixTracker:
+    """Testes para PrefixTracker"""
+
+    def test_primeiro_prompt_sem_prefixo(self):
+        """Testa que o primeiro prompt não tem com o que comparar"""
+        report = PrefixTracker().observe(FIXO)
+
+        assert report["prefix_shared_tokens"] == 0
+        assert report["prefix_ratio"] == 0
+
+    def test_acumula_estatisticas(self):
+        """Testa a fração acumulada de tokens reaproveitados"""
+        tracker = PrefixTracker()
+        tracker.observe(FIXO + [{"role": "user", "content": "um"}])
+        report = tracker.observe(FIXO + [{"role": "user", "content": "dois"}])
+
+        stats = tracker.stats()
+        assert report["prefix_shared_messages"] == 2
+        assert stats["prompts"] == 2
+        assert stats["shared_tokens"] == report["prefix_shared_tokens"]
+        assert 0 < stats["prefix_ratio"] < 0.5
@@ -0,0 +1,204 @@
+"""
+Testes para limite de taxa, retentativas e prazos
+"""
+import pytest
+import time
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src" / "app"))
+
+from resilience import (
+    CircuitBreaker,
+    Deadline,
+    RateLimiter,
+    RetryPolicy,
+    TokenBucket,
+    retry_after_seconds,
+)
+from exceptions import CircuitOpenError, DeadlineExceededError, LLMError, RateLimitError
+
+
+class TestDeadline:
+    """Testes para o Deadline"""
+
+    def test_remaining_diminui(self):
+        """Testa que o tempo restante diminui e nunca fica negativo"""
+        deadline = Deadline(0.01)
+        assert 0 < deadline.remaining() <= 0.01
+        time.sleep(0.02)
+        assert deadline.remaining() == 0
+        assert deadline.expired()
+
+    def test_cap_nunca_passa_do_prazo(self):
+        """Testa que o sub-prazo fica limitado ao menor dos dois"""
+        deadline = Deadline(10)
+
+        assert deadline.cap(2).remaining() <= 2
+        assert 5 < deadline.cap(60).remaining() <= 10
+        assert deadline.elapsed() >= 0
+
+
+class TestTokenBucket:
+    """Testes para o TokenBucket"""
+
+    def test_dentro_da_capacidade_nao_espera(self):
+        """Testa que há saldo inicial de um minuto de cota"""
+        bucket = TokenBucket(rate_per_minute=60)
+        assert bucket.reserve(60) == 0
+
+    def test_sem_saldo_espera_proporcional(self):
+        """Testa a espera quando o saldo acaba"""
+        bucket = TokenBucket(rate_per_minute=60)
+        bucket.reserve(60)
+        assert bucket.reserve(1) == pytest.approx(1.0, abs=0.05)
+        # a segunda reserva ficou na fila: a próxima espera o dobro
+        assert bucket.wait_time(1) == pytest.approx(2.0, abs=0.05)
+
+
+class TestRateLimiter:
+    """Testes para o RateLimiter"""
+
+    def test_usa_o_limite_mais_restritivo(self):
+        """Testa que a cota de tokens também limita"""
+        limiter = RateLimiter(requests_per_minute=100, tokens_per_minute=600)
+        assert limiter.acquire(600) == 0
+        assert limiter.acquire(60) == pytest.approx(6.0, abs=0.1)
+
+    def test_espera_maior_que_prazo_levanta(self):
+        """Testa que a espera além do prazo vira RateLimitError sem reservar"""
+        limiter = RateLimiter(requests_per_minute=1, tokens_per_minute=1000)
+        limiter.acquire(1)
+
+        with pytest.raises(RateLimitError):
+            limiter.acquire(1, Deadline(1))
+        assert limiter.requests.wait_time(1) == pytest.approx(60, abs=0.5)
+
+
+class TestRetryPolicy:
+    """Testes para o RetryPolicy"""
+
+    def test_backoff_limitado(self):
+        """Testa que a espera respeita o teto exponencial"""
+        policy = RetryPolicy(max_attempts=10, base_delay=1, max_delay=4)
+        for attempt in range(6):
+            delay = policy.next_delay(attempt, Deadline(60))
+            assert 0 <= delay <= min(4, 2 ** attempt)
+
+    def test_respeita_retry_after(self):
+        """Testa que a espera sugerida pelo servidor é respeitada"""
+        policy = RetryPolicy(max_attempts=3, base_delay=0.01, max_delay=0.01)
+        assert policy.next_delay(0, Deadline(60), retry_after=2) == 2
+
+    def test_desiste_apos_tentativas(self):
+        """Testa o limite de tentativas"""
+        policy = RetryPolicy(max_attempts=2)
+        assert policy.next_delay(1, Deadline(60)) is None
+
+    def test_desiste_se_passar_do_prazo(self):
+        """Testa que nenhuma espera ultrapassa o prazo"""
+        policy = RetryPolicy(max_attempts=5)
+        assert policy.next_delay(0, Deadline(1), retry_after=5) is None
+
+
+class TestRetryAfterSeconds:
+    """Testes para leitura do retry-after"""
+
+    def test_cabecalhos(self):
+        """Testa os formatos suportados"""
+        assert retry_after_seconds({"retry-after": "3"}) == 3
+        assert retry_after_seconds({"retry-after-ms": "250"}) == 0.25
+        assert retry_after_seconds({"retry-after": "Wed, 21 Oct 2015"}) is None
+        assert retry_after_seconds(None) is None
+
+
+class TestCircuitBreaker:
+    """Testes para o CircuitBreaker"""
+
+    def _breaker(self, **kwargs):
+        params = dict(
+            name="teste", window=60, min_calls=4, error_rate=0.5,
+            slow_call=1.0, slow_rate=0.8, open_seconds=0.05, half_open_calls=1,
+        )
+        params.update(kwargs)
+        return CircuitBreaker(**params)
+
+    def test_abre_pela_taxa_de_erros(self):
+        breaker = self._breaker()
+        for failed in (False, True, False, True):
+            breaker.record_failure() if failed else breaker.record_success()
+
+        assert breaker.state == CircuitBreaker.OPEN
+        assert not breaker.allow()
+        assert breaker.stats()["rejected"] == 1
+
+    def test_nao_abre_com_poucas_chamadas(self):
+        breaker = self._breaker()
+        breaker.record_failure()
+        breaker.record_failure()
+
+        assert breaker.state == CircuitBreaker.CLOSED
+
+    def test_abre_por_lentidao(self):
+        breaker = self._breaker()
+        for _ in range(4):
+            breaker.record_success(duration=2.0)
+
+        assert breaker.state == CircuitBreaker.OPEN
+
+    def test_meio_aberto_fecha_com_sucesso(self):
+        breaker = self._breaker()
+        for _ in range(4):
+            breaker.record_failure()
+        time.sleep(0.06)
+
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        assert breaker.allow()
+        assert not breaker.allow()  # só uma chamada de teste por vez
+        breaker.record_success()
+        assert breaker.state == CircuitBreaker.CLOSED
+
+    def test_meio_aberto_reabre_com_falha(self):
+        breaker = self._breaker()
+        for _ in range(4):
+            breaker.record_failure()
+        time.sleep(0.06)
+
+        assert breaker.allow()
+        breaker.record_failure()
+        assert breaker.state == CircuitBreaker.OPEN
+
+    def test_guard(self):
+        breaker = self._breaker(min_calls=1)
+
+        with pytest.raises(LLMError):
+            with breaker.guard():
+                raise LLMError("fora do ar")
+
+        with pytest.raises(CircuitOpenError):
+            with breaker.guard():
+                pass
+
+    def test_guard_cancelamento_libera_vaga(self):
+        """Testa que chamada cancelada não conta como falha e devolve a vaga de teste"""
+        breaker = self._breaker(min_calls=1)
+        breaker.record_failure()
+        time.sleep(0.06)
+
+        with pytest.raises(KeyboardInterrupt):
+            with breaker.guard():
+                raise KeyboardInterrupt
+
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        assert breaker.allow()
+
+    def test_prazo_do_turno_nao_conta_como_falha(self):
+        """Testa que o prazo esgotado pelo turno não abre o circuito"""
+        breaker = self._breaker(min_calls=1)
+
+        with pytest.raises(DeadlineExceededError):
+            with breaker.guard():
+                raise DeadlineExceededError("sem tempo")
+
+        assert breaker.state == CircuitBreaker.CLOSED
+        assert breaker.allow()
@@ -0,0 +1,109 @@
+"""
+Testes para o roteamento de modelos
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src" / "app"))
+
+import config
+from parsing import parse_llm_json
+from routing import (
+    ROUTE_ANSWER,
+    ROUTE_EXTRACTION,
+    ROUTE_GREETING,
+    ROUTE_SIMULATION,
+    ROUTE_SUMMARY,
+    ModelRouter,
+    Route,
+    classify_message,
+    default_routes,
+    is_confident,
+)
+
+
+class TestClassifyMessage:
+    """Testes para a classificação da mensagem do usuário"""
+
+    def test_saudacao(self):
+        assert classify_message("Oi!") == ROUTE_GREETING
+        assert classify_message("Bom dia, tudo bem?") == ROUTE_GREETING
+        assert classify_message("obrigado") == ROUTE_GREETING
+
+    def test_simulacao(self):
+        assert classify_message("Quanto fica a parcela de um financiamento de 200 mil?") == ROUTE_SIMULATION
+        assert classify_message("Qual a taxa de juros do SAC?") == ROUTE_SIMULATION
+        assert classify_message("Quanto preciso guardar por mês para ter 1 milhão?") == ROUTE_SIMULATION
+
+    def test_pergunta_geral(self):
+        assert classify_message("Oi, quero organizar minhas finanças e montar uma reserva de emergência") == ROUTE_ANSWER
+        assert classify_message("Minha renda é 5000") == ROUTE_ANSWER
+
+    def test_acentos_nao_importam(self):
+        """Testa que 'prestação' e 'olá' são reconhecidos sem depender de acento"""
+        assert classify_message("Qual o valor da prestação?") == ROUTE_SIMULATION
+        assert classify_message("Olá") == ROUTE_GREETING
+
+
+class TestIsConfident:
+    """Testes para a aceitação da resposta do modelo pequeno"""
+
+    def test_resposta_completa(self):
+        result = parse_llm_json('{"resposta": "Uma reserva de seis meses de despesas é um bom começo."}')
+        assert is_confident(result)
+
+    def test_texto_puro(self):
+        assert not is_confident(parse_llm_json("Uma reserva de seis meses de despesas é um bom começo."))
+
+    def test_resposta_curta(self):
+        assert not is_confident(parse_llm_json('{"resposta": "Sim."}'))
+
+    def test_admite_nao_saber(self):
+        result = parse_llm_json('{"resposta": "Desculpe, não consigo calcular isso com os dados informados."}')
+        assert not is_confident(result)
+
+
+class TestDefaultRoutes:
+    """Testes para as rotas vindas da configuração"""
+
+    def test_sem_cascata(self, monkeypatch):
+        monkeypatch.setattr(config, "LLM_CASCADE_ENABLED", False)
+        routes = default_routes()
+
+        assert routes[ROUTE_SUMMARY].model == config.ROUTE_MODELS[ROUTE_SUMMARY]
+        assert routes[ROUTE_EXTRACTION].max_tokens == config.ROUTE_MAX_TOKENS[ROUTE_EXTRACTION]
+        assert routes[ROUTE_ANSWER].cascade_model is None
+
+    def test_cascata_comeca_no_modelo_pequeno(self, monkeypatch):
+        monkeypatch.setattr(config, "LLM_CASCADE_ENABLED", True)
+        monkeypatch.setattr(config, "GROQ_SMALL_MODEL", "pequeno")
+        monkeypatch.setattr(config, "ROUTE_MODELS", {ROUTE_ANSWER: "grande"})
+        routes = default_routes()
+
+        assert routes[ROUTE_ANSWER].model == "pequeno"
+        assert routes[ROUTE_ANSWER].cascade_model == "grande"
+        assert routes[ROUTE_ANSWER].escalated().model == "grande"
+        assert routes[ROUTE_SUMMARY].cascade_model is None
+
+
+class TestModelRouter:
+    """Testes para o ModelRouter"""
+
+    def test_rota_desconhecida_usa_answer(self):
+        router = ModelRouter(routes={ROUTE_ANSWER: Route(ROUTE_ANSWER, "m")})
+        assert router.route("outra").name == ROUTE_ANSWER
+        assert router.route(None) is None
+
+    def test_provider_reaproveitado(self):
+        criados = []
+
+        def factory(model, max_tokens):
+            criados.append((model, max_tokens))
+            return object()
+
+        router = ModelRouter(routes={}, provider_factory=factory)
+
+        assert router.provider("a", 100) is router.provider("a", 100)
+        assert router.provider("a", 200) is not router.provider("a", 100)
+        assert criados == [("a", 100), ("a", 200)]
+        assert router.async_provider("a", 100) is None
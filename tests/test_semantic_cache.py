@@ -0,0 +1,67 @@
+"""
+Testes para o cache semântico de perguntas
+"""
+import pytest
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src" / "app"))
+
+from semantic_cache import SemanticCache, normalize_text
+
+
+class TestNormalizeText:
+    """Testes para normalização de texto"""
+
+    def test_remove_acentos_e_stopwords(self):
+        """Testa remoção de acentos, pontuação e stopwords"""
+        assert normalize_text("Como funcionam os juros do cartão?") == ["funcionam", "juro", "cartao"]
+
+    def test_aplica_sinonimos(self):
+        """Testa que variações equivalentes viram o mesmo termo"""
+        assert set(normalize_text("Vale mais pagar à vista ou parcelar?")) == \
+            set(normalize_text("compensa parcelar ou pagar à vista?"))
+
+
+class TestSemanticCache:
+    """Testes para o SemanticCache"""
+
+    def test_pergunta_reescrita_encontra_resposta(self):
+        """Testa hit para a mesma pergunta com outra redação"""
+        cache = SemanticCache()
+        cache.store("Vale mais pagar à vista ou parcelar?", [], {"resposta": "depende"})
+
+        assert cache.lookup("compensa parcelar ou pagar à vista?", []) == {"resposta": "depende"}
+        assert cache.stats()["hits"] == 1
+
+    def test_pergunta_diferente_nao_encontra(self):
+        """Testa miss para pergunta de outro assunto"""
+        cache = SemanticCache()
+        cache.store("Como funcionam os juros do cartão de crédito?", [], {"resposta": "juros"})
+
+        assert cache.lookup("Quais investimentos existem para quem ganha um salário mínimo?", []) is None
+
+    def test_escopo_por_fatos(self):
+        """Testa que respostas não vazam entre conjuntos de fatos diferentes"""
+        cache = SemanticCache()
+        cache.store("Como funcionam os juros do cartão?", ["Nome: Ana"], {"resposta": "r"})
+
+        assert cache.lookup("Como funcionam os juros do cartão?", ["Nome: Bruno"]) is None
+        assert cache.lookup("Como funcionam os juros do cartão?", ["Nome: Ana"]) is not None
+
+    def test_mensagens_curtas_ignoradas(self):
+        """Testa que mensagens curtas (dependentes de contexto) não usam o cache"""
+        cache = SemanticCache()
+        cache.store("sim", [], {"resposta": "r"})
+
+        assert cache.stats()["size"] == 0
+        assert cache.lookup("sim", []) is None
+
+    def test_lru(self):
+        """Testa remoção da entrada menos usada"""
+        cache = SemanticCache(max_size=1)
+        cache.store("Como funcionam os juros do cartão?", [], {"resposta": "a"})
+        cache.store("Quanto devo guardar para aposentadoria?", [], {"resposta": "b"})
+
+        assert cache.stats()["evictions"] == 1
+        assert cache.lookup("Como funcionam os juros do cartão?", []) is None
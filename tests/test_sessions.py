@@ -0,0 +1,114 @@
+"""
+Testes para o pool de agentes por sessão
+"""
+import pytest
+import time
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src" / "app"))
+
+from agent import FinancialAgent
+from data import DataManager
+from metrics import SESSION_EVICTIONS, SESSIONS_LIVE
+from sessions import AgentPool, approx_size, session_file
+from conftest import MockLLMManager
+
+
+@pytest.fixture
+def factory(temp_dir, summaries):
+    def create(session_id):
+        return FinancialAgent(
+            data_manager=DataManager(user_file=temp_dir / f"{session_id}.json"),
+            llm_manager=MockLLMManager(),
+            summaries=summaries,
+            session_id=session_id,
+        )
+    return create
+
+
+class TestAgentPool:
+    """Testes para o AgentPool"""
+
+    def test_agente_por_sessao(self, factory):
+        """Testa que cada sessão tem o próprio agente, criado uma vez"""
+        pool = AgentPool(factory, max_sessions=10, idle_ttl=None)
+
+        a = pool.get("a")
+
+        assert pool.get("a") is a
+        assert pool.get("b") is not a
+        assert a.session_id == "a"
+        assert len(pool) == 2
+        assert SESSIONS_LIVE.value() == 2
+
+    def test_perfis_separados(self, factory):
+        pool = AgentPool(factory, max_sessions=10, idle_ttl=None)
+
+        pool.get("a").user["nome"] = "Ana"
+
+        assert pool.get("b").user["nome"] is None
+
+    def test_lru_grava_perfil_ao_sair(self, factory, temp_dir):
+        """Testa que a sessão menos usada sai da memória com o perfil gravado"""
+        pool = AgentPool(factory, max_sessions=2, idle_ttl=None)
+        antes = SESSION_EVICTIONS.value(reason="lru")
+        pool.get("a").user["nome"] = "Ana"
+        pool.get("b")
+
+        pool.get("c")
+
+        assert "a" not in pool
+        assert SESSION_EVICTIONS.value(reason="lru") == antes + 1
+        assert DataManager(user_file=temp_dir / "a.json").load_user()["nome"] == "Ana"
+
+    def test_uso_recente_protege_a_sessao(self, factory):
+        pool = AgentPool(factory, max_sessions=2, idle_ttl=None)
+        pool.get("a")
+        pool.get("b")
+        pool.get("a")
+
+        pool.get("c")
+
+        assert "a" in pool and "b" not in pool
+
+    def test_sessao_recriada_do_disco(self, factory):
+        pool = AgentPool(factory, max_sessions=1, idle_ttl=None)
+        pool.get("a").user["nome"] = "Ana"
+        pool.get("b")
+
+        assert pool.get("a").user["nome"] == "Ana"
+
+    def test_sessao_parada_sai_da_memoria(self, factory):
+        pool = AgentPool(factory, max_sessions=10, idle_ttl=0.01)
+        antes = SESSION_EVICTIONS.value(reason="idle")
+        pool.get("a")
+        time.sleep(0.02)
+
+        assert pool.evict_idle() == 1
+        assert len(pool) == 0
+        assert SESSION_EVICTIONS.value(reason="idle") == antes + 1
+
+    def test_contabiliza_memoria(self, factory):
+        pool = AgentPool(factory, max_sessions=10, idle_ttl=None)
+        agent = pool.get("a")
+        vazio = pool.account("a")
+
+        agent.user["metas"] = [{"meta": "viagem " * 100, "valor_necessario": 5000}]
+
+        assert pool.account("a") > vazio
+        assert pool.stats()["bytes"] == pool.account("a")
+        assert pool.account("desconhecida") == 0
+
+
+class TestSessionHelpers:
+    """Testes para as funções auxiliares de sessão"""
+
+    def test_arquivo_da_sessao_saneado(self):
+        assert session_file("../../etc/passwd").name == "______etc_passwd.json"
+        assert session_file("abc123").parent == session_file("x").parent
+
+    def test_approx_size_conta_conteudo(self):
+        assert approx_size({"a": "x" * 1000}) > approx_size({"a": "x"})
+        compartilhado = "y" * 1000
+        assert approx_size([compartilhado, compartilhado]) < 2 * approx_size(compartilhado)
@@ -0,0 +1,88 @@
+"""
+Testes para coalescência de chamadas idênticas (single-flight)
+"""
+import pytest
+import asyncio
+import threading
+import time
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src" / "app"))
+
+from singleflight import SingleFlight
+
+
+class TestSingleFlight:
+    """Testes para o SingleFlight"""
+
+    def test_chamadas_concorrentes_coalescem(self):
+        """Testa que threads com a mesma chave compartilham a execução"""
+        flight = SingleFlight()
+        execucoes = []
+        barreira = threading.Barrier(5)
+
+        def chamada():
+            execucoes.append(1)
+            time.sleep(0.1)
+            return "resultado"
+
+        resultados = []
+
+        def worker():
+            barreira.wait()
+            resultados.append(flight.do("chave", chamada))
+
+        threads = [threading.Thread(target=worker) for _ in range(5)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert resultados == ["resultado"] * 5
+        assert len(execucoes) == 1
+        assert flight.stats()["coalesced"] == 4
+        assert flight.stats()["in_flight"] == 0
+
+    def test_chaves_diferentes_nao_coalescem(self):
+        """Testa que chaves distintas executam separadamente"""
+        flight = SingleFlight()
+        assert flight.do("a", lambda: 1) == 1
+        assert flight.do("b", lambda: 2) == 2
+        assert flight.stats()["calls"] == 2
+
+    def test_sem_cache_apos_terminar(self):
+        """Testa que chamadas sequenciais executam de novo"""
+        flight = SingleFlight()
+        contador = []
+        flight.do("a", lambda: contador.append(1))
+        flight.do("a", lambda: contador.append(1))
+        assert len(contador) == 2
+
+    def test_erro_propagado(self):
+        """Testa que a exceção do líder é propagada"""
+        flight = SingleFlight()
+
+        def falha():
+            raise ValueError("erro")
+
+        with pytest.raises(ValueError):
+            flight.do("a", falha)
+        assert flight.stats()["in_flight"] == 0
+
+    def test_ado_coalesce(self):
+        """Testa coalescência no modo assíncrono"""
+        flight = SingleFlight()
+        execucoes = []
+
+        async def chamada():
+            execucoes.append(1)
+            await asyncio.sleep(0.05)
+            return "ok"
+
+        async def executar():
+            return await asyncio.gather(*(flight.ado("chave", chamada) for _ in range(4)))
+
+        assert asyncio.run(executar()) == ["ok"] * 4
+        assert len(execucoes) == 1
+        assert flight.stats()["coalesced"] == 3
@@ -0,0 +1,167 @@
+"""
+Testes para os armazenamentos do perfil e das interações
+"""
+import sqlite3
+import sys
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src" / "app"))
+
+from data import DataManager
+from interaction_log import InteractionLog
+from metrics import STORAGE_BATCHES
+from persistence import PersistenceQueue
+from storage import JsonStorage, SqliteStorage
+
+INICIO = datetime(2026, 1, 1, 12, 0, 0)
+
+
+def interacao(minuto: int) -> dict:
+    return {
+        "timestamp": (INICIO + timedelta(minutes=minuto)).isoformat(),
+        "mensagem": f"mensagem {minuto}",
+        "resposta": "ok",
+        "dados_extraidos": {"renda_mensal": minuto},
+    }
+
+
+class TestSqliteStorage:
+    """Testes para o SqliteStorage"""
+
+    def test_modo_wal(self, temp_dir):
+        """Testa que o banco é aberto em modo WAL"""
+        storage = SqliteStorage(temp_dir / "agente.db")
+
+        modo = storage._connection().execute("PRAGMA journal_mode").fetchone()[0]
+
+        assert modo == "wal"
+        storage.close()
+
+    def test_perfil_ida_e_volta(self, temp_dir, mock_usuario):
+        storage = SqliteStorage(temp_dir / "agente.db")
+
+        assert storage.load_user("ana") is None
+        storage.save_user("ana", mock_usuario)
+
+        assert storage.load_user("ana") == mock_usuario
+        storage.close()
+
+    def test_campos_quentes_em_colunas(self, temp_dir, mock_usuario):
+        storage = SqliteStorage(temp_dir / "agente.db")
+        storage.save_user("ana", mock_usuario)
+        storage.close()
+
+        with sqlite3.connect(temp_dir / "agente.db") as conexao:
+            linha = conexao.execute(
+                "SELECT renda_mensal, perfil_investidor FROM usuarios WHERE id = 'ana'"
+            ).fetchone()
+            plano = conexao.execute(
+                "EXPLAIN QUERY PLAN SELECT id FROM usuarios WHERE perfil_investidor = 'moderado'"
+            ).fetchall()
+
+        assert linha == (5000.0, "moderado")
+        assert "usuarios_perfil_investidor" in str(plano)
+
+    def test_interacoes_em_lote(self, temp_dir):
+        storage = SqliteStorage(temp_dir / "agente.db", batch_size=4, batch_interval=60)
+        antes = STORAGE_BATCHES.value()["count"]
+
+        for minuto in range(6):
+            storage.append_interaction("ana", interacao(minuto))
+
+        assert STORAGE_BATCHES.value()["count"] == antes + 1
+        assert len(storage._pending) == 2
+
+        registros = list(storage.scan_interactions())
+        assert [r["mensagem"] for r in registros] == [f"mensagem {m}" for m in range(6)]
+        assert registros[3]["dados_extraidos"] == {"renda_mensal": 3}
+        storage.close()
+
+    def test_leitura_por_intervalo(self, temp_dir):
+        storage = SqliteStorage(temp_dir / "agente.db")
+        for minuto in range(10):
+            storage.append_interaction("ana", interacao(minuto))
+
+        registros = storage.scan_interactions(INICIO + timedelta(minutes=3), INICIO + timedelta(minutes=6))
+
+        assert [r["mensagem"] for r in registros] == ["mensagem 3", "mensagem 4", "mensagem 5"]
+        storage.close()
+
+    def test_conexao_por_thread(self, temp_dir):
+        storage = SqliteStorage(temp_dir / "agente.db")
+        conexoes = []
+
+        def grava(usuario_id):
+            storage.save_user(usuario_id, {"nome": usuario_id, "metas": []})
+            conexoes.append(storage._connection())
+
+        threads = [threading.Thread(target=grava, args=(f"u{i}",)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len({id(c) for c in conexoes}) == 4
+        assert all(storage.load_user(f"u{i}")["nome"] == f"u{i}" for i in range(4))
+        storage.close()
+
+    def test_close_grava_o_lote_pendente(self, temp_dir):
+        storage = SqliteStorage(temp_dir / "agente.db", batch_size=100, batch_interval=60)
+        storage.append_interaction("ana", interacao(0))
+        storage.close()
+
+        reaberto = SqliteStorage(temp_dir / "agente.db")
+        assert len(list(reaberto.scan_interactions())) == 1
+        reaberto.close()
+
+
+class TestDataManagerStorage:
+    """Testes para o DataManager com armazenamentos diferentes"""
+
+    def test_json_por_padrao(self, mock_data_manager):
+        assert isinstance(mock_data_manager.storage, JsonStorage)
+        assert mock_data_manager.user_id == "usuario"
+
+    def test_sqlite(self, temp_dir):
+        storage = SqliteStorage(temp_dir / "agente.db")
+        dm = DataManager(user_file=temp_dir / "ana.json", storage=storage)
+
+        usuario = dm.load_user()
+        usuario["nome"] = "Ana"
+        dm.save_user(usuario)
+        dm.save_interaction("oi", "olá", {})
+
+        assert DataManager(user_file=temp_dir / "ana.json", storage=storage).load_user()["nome"] == "Ana"
+        assert not (temp_dir / "ana.json").exists()
+        assert [r["mensagem"] for r in storage.scan_interactions()] == ["oi"]
+        storage.close()
+
+    def test_sqlite_com_write_behind(self, temp_dir):
+        storage = SqliteStorage(temp_dir / "agente.db")
+        queue = PersistenceQueue(max_pending=100, flush_interval=60)
+        dm = DataManager(user_file=temp_dir / "ana.json", storage=storage, persistence=queue)
+
+        usuario = dm.default_user()
+        usuario["nome"] = "Ana"
+        dm.save_user(usuario)
+
+        assert storage.load_user("ana") is None
+        assert dm.load_user()["nome"] == "Ana"
+        queue.flush()
+        assert storage.load_user("ana")["nome"] == "Ana"
+        storage.close()
+
+    def test_mesma_interface_nos_dois(self, temp_dir):
+        armazenamentos = [
+            JsonStorage(temp_dir / "ana.json", InteractionLog(temp_dir / "interacoes")),
+            SqliteStorage(temp_dir / "agente.db"),
+        ]
+        for storage in armazenamentos:
+            storage.save_user("ana", {"nome": "Ana", "metas": [{"meta": "casa"}]})
+            storage.append_interaction("ana", interacao(0))
+
+            assert storage.load_user("ana") == {"nome": "Ana", "metas": [{"meta": "casa"}]}
+            assert [r["mensagem"] for r in storage.scan_interactions()] == ["mensagem 0"]
+            storage.close()
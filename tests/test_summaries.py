@@ -0,0 +1,67 @@
+"""
+Testes para o resumo incremental do histórico
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src" / "app"))
+
+from cache import ResponseCache
+from summaries import RollingSummary, prefix_keys
+
+
+def _messages(n: int) -> list[dict]:
+    return [
+        {"role": "user" if i % 2 == 0 else "assistant", "content": f"msg{i}"}
+        for i in range(n)
+    ]
+
+
+class TestPrefixKeys:
+    """Testes para as chaves encadeadas dos prefixos"""
+
+    def test_prefixo_comum_tem_mesma_chave(self):
+        """Testa que históricos que começam igual compartilham as chaves"""
+        curto, longo = prefix_keys(_messages(3)), prefix_keys(_messages(6))
+
+        assert longo[:3] == curto
+        assert len(set(longo)) == 6
+
+    def test_ignora_campos_extras(self):
+        com_extras = [{**m, "metadata": {"x": 1}} for m in _messages(2)]
+        assert prefix_keys(com_extras) == prefix_keys(_messages(2))
+
+    def test_seed_muda_as_chaves(self):
+        assert prefix_keys(_messages(2), "a") != prefix_keys(_messages(2), "b")
+
+
+class TestRollingSummary:
+    """Testes para os resumos memorizados por prefixo"""
+
+    def _summaries(self, disk_path=None):
+        return RollingSummary(ResponseCache(ttl=None, disk_path=disk_path))
+
+    def test_sem_resumo(self):
+        assert self._summaries().lookup(_messages(4)) == (0, None)
+
+    def test_encontra_maior_prefixo(self):
+        """Testa que o resumo mais longo que cobre o início do histórico é o escolhido"""
+        summaries = self._summaries()
+        summaries.store(_messages(2), "curto")
+        summaries.store(_messages(4), "longo")
+
+        assert summaries.lookup(_messages(7)) == (4, "longo")
+        assert summaries.lookup(_messages(3)) == (2, "curto")
+
+    def test_historico_diferente_nao_reaproveita(self):
+        summaries = self._summaries()
+        summaries.store(_messages(4), "resumo")
+
+        outro = [{"role": "user", "content": "outra conversa"}] + _messages(4)
+        assert summaries.lookup(outro) == (0, None)
+
+    def test_sobrevive_a_reinicio(self, temp_dir):
+        """Testa que o resumo gravado em disco é achado por outra instância"""
+        self._summaries(temp_dir).store(_messages(4), "resumo")
+
+        assert self._summaries(temp_dir).lookup(_messages(6)) == (4, "resumo")
@@ -0,0 +1,56 @@
+"""
+Testes para estimativa local de tokens
+"""
+import pytest
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src" / "app"))
+
+from tokens import (
+    TRUNCATION_MARKER,
+    estimate_messages_tokens,
+    estimate_tokens,
+    truncate_to_tokens,
+)
+
+
+class TestEstimateTokens:
+    """Testes para estimate_tokens"""
+
+    def test_texto_vazio(self):
+        """Testa que texto vazio não tem tokens"""
+        assert estimate_tokens("") == 0
+
+    def test_palavras_e_pontuacao(self):
+        """Testa a contagem de palavras curtas, longas e pontuação"""
+        assert estimate_tokens("oi") == 1
+        assert estimate_tokens("oi, tudo bem?") == 5
+        assert estimate_tokens("financeiramente") == 4
+
+    def test_cresce_com_o_texto(self):
+        """Testa que textos maiores estimam mais tokens"""
+        assert estimate_tokens("renda " * 100) > estimate_tokens("renda " * 10)
+
+    def test_mensagens_incluem_custo_fixo(self):
+        """Testa que cada mensagem soma um custo fixo"""
+        mensagens = [{"role": "user", "content": "oi"}, {"role": "assistant", "content": "oi"}]
+        assert estimate_messages_tokens(mensagens) > 2 * estimate_tokens("oi")
+
+
+class TestTruncateToTokens:
+    """Testes para truncate_to_tokens"""
+
+    def test_texto_que_cabe_nao_muda(self):
+        """Testa que texto dentro do limite é mantido"""
+        assert truncate_to_tokens("texto curto", 100) == "texto curto"
+
+    def test_trunca_preservando_inicio_e_fim(self):
+        """Testa truncamento respeitando o limite"""
+        texto = "inicio " + "lancamento R$ 10,00 " * 500 + "final"
+        truncado = truncate_to_tokens(texto, 200)
+
+        assert estimate_tokens(truncado) <= 200
+        assert truncado.startswith("inicio")
+        assert truncado.endswith("final")
+        assert TRUNCATION_MARKER in truncado